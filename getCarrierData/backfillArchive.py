@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+  rebuild the partitioned workbooks (see loadJSONtoExcel -p) or the sqlite database
+  from the JSON archives, using all the cores.
+
+  Each archive is split into line-aligned chunks of about --chunk bytes; a compressed monthly
+  segment (e.g. CarrierRealTimeData.2025-09.json.gz, see jsonLinesWriter.py) is one chunk.
+  Worker processes do the json decoding and str2num conversions for a chunk,
+  and the results are merged into the target in file order.
+  The rows a deadband recording held back (see deadband.py) are put back in the workers, each chunk
+  starting from the line before it, or the last row of the file before, so none are lost at a chunk edge.
+
+  Progress is saved in a state file after each checkpoint, so an interrupted
+  backfill picks up where it left off when run again with the same arguments.
+  For a full rebuild, start without a state file and without existing partition
+  workbooks (or tables), since rows are appended to whatever is already there.
+
+  Without files, the archive, its monthly segments and the working file in the current directory are
+  loaded, oldest first (see jsonLinesWriter.archiveFiles).
+
+  Usage:
+    python3 backfillArchive.py [-d] --RealTime --excel month
+    python3 backfillArchive.py [-d] --RealTime --excel month OldCarrierRealTimeData.json CarrierRealTimeData.json
+    python3 backfillArchive.py [-d] --Daily --sqlite ../CarrierData.sqlite OldCarrierDailyData.json
+"""
+import argparse
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from sys import exit
+from typing import Any, Dict, Iterator, List
+
+from carrierDataSQLite import openDB, writeRows
+from deadband import reconstructRows
+from jsonLinesWriter import readJsonLines
+from loadJSONtoExcel import (PartitionKeys, PartitionWriter, SampleRows, compileConverters, convertRow,
+    partitionFileName, readSheetLayout, sheetArchiveFiles)
+
+ChunkSize = 4 * 1024 * 1024
+
+def chunkOffsets(jsonFile: str, chunk_size: int, start: int = 0) -> Iterator[List[int]]:
+    """ yield [start, end) byte offsets, each ending just after a newline; a compressed segment is one chunk """
+    size = os.path.getsize(jsonFile)
+    if jsonFile.endswith(".gz"):
+        # the offsets of a gzip file aren't those of its lines
+        if start < size:
+            yield [0, size]
+        return
+    with open(jsonFile, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            if f.tell() < size:
+                f.readline() # finish the partial line
+            end = f.tell()
+            yield [start, end]
+            start = end
+
+def _readChunk(jsonFile: str, start: int, end: int) -> List[Dict[str, Any]]:
+    if jsonFile.endswith(".gz"):
+        return list(readJsonLines([jsonFile]))
+    with open(jsonFile, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+def _lineBefore(jsonFile: str, start: int) -> Dict[str, Any] | None:
+    """ the row on the line that ends at byte start of a working file or archive """
+    with open(jsonFile, 'rb') as f:
+        # a row is a few KB at most
+        begin = max(0, start - 64 * 1024)
+        f.seek(begin)
+        line = f.read(start - begin).rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    return json.loads(line) if line.strip() else None
+
+def lastRow(jsonFile: str) -> Dict[str, Any] | None:
+    if jsonFile.endswith(".gz"):
+        row = None
+        for row in readJsonLines([jsonFile]):
+            pass
+        return row
+    return _lineBefore(jsonFile, os.path.getsize(jsonFile))
+
+def _rebuiltChunk(jsonFile: str, start: int, end: int, previous: Dict[str, Any] | None) -> List[Dict[str, Any]]:
+    """ the rows of the chunk, with the rows a deadband recording held back put back """
+    if previous is None and start > 0:
+        previous = _lineBefore(jsonFile, start)
+    return list(reconstructRows(_readChunk(jsonFile, start, end), previous))
+
+# these run in the worker processes, so must be module level functions
+def decodeChunk(job: List) -> List[Dict[str, Any]]:
+    jsonFile, start, end, previous = job
+    return _rebuiltChunk(jsonFile, start, end, previous)
+
+def convertChunk(job: List) -> List[List]:
+    jsonFile, start, end, previous, compiled, num_fields = job
+    # line numbers in any missing field errors are relative to the chunk
+    return [convertRow(compiled, row, num_fields, i + 1) for i, row in enumerate(_rebuiltChunk(jsonFile, start, end, previous))]
+
+class SqliteSink:
+    """
+    rows stay as dicts; each chunk is one transaction, committed at the checkpoint just before the
+    resume offset is saved, so an interruption never leaves part of a chunk behind to be inserted again
+    """
+    checkpoint_every = 1
+
+    def __init__(self, dbFile: str, table: str):
+        self.db = openDB(dbFile)
+        self.table = table
+
+    def prepare(self, jsonFile: str):
+        return decodeChunk, lambda start, end, previous: [jsonFile, start, end, previous]
+
+    def write(self, rows: List):
+        writeRows(self.db, self.table, rows, commit=False)
+
+    def checkpoint(self):
+        self.db.commit()
+
+    def close(self):
+        # anything not checkpointed is rolled back, and written again on the resume
+        self.db.close()
+
+class ExcelSink:
+    """ rows are converted in the workers, and appended to the month or year partition workbooks """
+    # saving re-reads the open partitions, so don't do it for every chunk
+    checkpoint_every = 10
+
+    def __init__(self, sheet_name: str, partition: str):
+        self.sheet_name = sheet_name
+        self.partition_key = PartitionKeys[partition]
+        self.field_list, self.formulas = readSheetLayout(sheet_name)
+        self.date_index = self.field_list.index("DATE")
+        self.writers = {}
+
+    def prepare(self, jsonFile: str):
+        sample_rows = list(islice(readJsonLines([jsonFile]), SampleRows))
+        compiled = compileConverters(self.field_list, sample_rows)
+        num_fields = len(self.field_list)
+        return convertChunk, lambda start, end, previous: [jsonFile, start, end, previous, compiled, num_fields]
+
+    def write(self, rows: List):
+        for new_row in rows:
+            key = self.partition_key(new_row[self.date_index])
+            writer = self.writers.get(key)
+            if writer is None:
+                writer = PartitionWriter(partitionFileName(self.sheet_name, key), self.sheet_name, self.field_list, self.formulas)
+                self.writers[key] = writer
+            writer.append(new_row)
+
+    def checkpoint(self):
+        # a write-only workbook can't be saved twice, so the next write re-opens the partition
+        for writer in self.writers.values():
+            writer.save()
+        self.writers = {}
+
+    def close(self):
+        self.checkpoint()
+
+def loadState(stateFile: str) -> Dict[str, Any]:
+    if os.path.exists(stateFile):
+        with open(stateFile, 'r') as f:
+            return json.load(f)
+    return {}
+
+def saveState(stateFile: str, state: Dict[str, Any]):
+    tmp_name = stateFile + ".tmp"
+    with open(tmp_name, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_name, stateFile)
+
+def inOrder(executor, worker, jobs: List, window: int) -> Iterator:
+    """ the results of the jobs in order, with at most window of them running or waiting to be taken,
+        so the memory stays the same however far the workers could run ahead of the sink """
+    jobs = iter(jobs)
+    pending = deque(executor.submit(worker, job) for job in islice(jobs, window))
+    while pending:
+        result = pending.popleft().result()
+        for job in islice(jobs, 1):
+            pending.append(executor.submit(worker, job))
+        yield result
+
+def backfill(sink, jsonFiles: List[str], stateFile: str, chunk_size: int = ChunkSize,
+             workers: int | None = None):
+    state = loadState(stateFile)
+    checkpoint_every = sink.checkpoint_every
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, jsonFile in enumerate(jsonFiles):
+            size = os.path.getsize(jsonFile)
+            done = state.get(jsonFile, 0)
+            if done >= size:
+                logging.info("%s already done" % jsonFile)
+                continue
+            if done > 0:
+                logging.info("resuming %s at byte %d of %d" % (jsonFile, done, size))
+
+            worker, job = sink.prepare(jsonFile)
+            offsets = list(chunkOffsets(jsonFile, chunk_size, done))
+            # the rows held back at the start of the file copy the last row of the file before
+            first_previous = lastRow(jsonFiles[index - 1]) if index > 0 and offsets[0][0] == 0 else None
+            row_count = 0
+            # in file order, while the workers run at most a window ahead
+            results = inOrder(executor, worker, (job(start, end, first_previous if n == 0 else None)
+                                                 for n, (start, end) in enumerate(offsets)), window)
+            for n, (rows, (start, end)) in enumerate(zip(results, offsets), start=1):
+                sink.write(rows)
+                row_count += len(rows)
+                if n % checkpoint_every == 0 or n == len(offsets):
+                    sink.checkpoint()
+                    state[jsonFile] = end
+                    saveState(stateFile, state)
+                logging.info("%s: %d rows, %.1f%%" % (jsonFile, row_count, 100.0 * end / size))
+    sink.close()
+    logging.info("backfill complete")
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the partitioned workbooks or sqlite database from the JSON archives"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-R", "--RealTime", action="store_true", help="the files are RealTime data" )
+    parser.add_argument( "-D", "--Daily", action="store_true", help="the files are Daily data" )
+    parser.add_argument( "-e", "--excel", choices=PartitionKeys.keys(), help="write per-month or per-year workbooks" )
+    parser.add_argument( "-s", "--sqlite", help="write to this sqlite database" )
+    parser.add_argument( "-j", "--jobs", type=int, default=None, help="number of worker processes (default: all cores)" )
+    parser.add_argument( "--chunk", type=int, default=ChunkSize, help="chunk size in bytes (default %d)" % ChunkSize )
+    parser.add_argument( "--state", help="resume state file (default: ./backfill-<target>.state)" )
+    parser.add_argument( 'file', nargs='*', help="JSON file(s) or .json.gz segments to load, oldest first (default: all of them, see above)" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.RealTime and args.Daily:
+        logging.error ("You must specify only ONE of RealTime and Daily")
+        exit(1)
+    elif args.RealTime:
+        name = 'RealTime'
+    elif args.Daily:
+        name = 'Daily'
+    else:
+        logging.error ("You must specify either --RealTime or --Daily")
+        exit(1)
+
+    if bool(args.excel) == bool(args.sqlite):
+        logging.error ("You must specify exactly one of --excel and --sqlite")
+        exit(1)
+    elif args.excel:
+        sink = ExcelSink(name, args.excel)
+        stateFile = args.state or "backfill-%s-excel-%s.state" % (name, args.excel)
+    else:
+        sink = SqliteSink(args.sqlite, name)
+        stateFile = args.state or "backfill-%s-sqlite.state" % name
+
+    files = args.file or sheetArchiveFiles(name)
+    if not files:
+        logging.error ("no %s JSON files here" % name)
+        exit(1)
+    logging.info ("loading %s" % files)
+    backfill(sink, files, stateFile, args.chunk, args.jobs)
+    exit(0)
+
+if __name__ == "__main__":
+    main()
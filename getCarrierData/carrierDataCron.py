@@ -7,6 +7,11 @@
     writes the data to CarrierRealTimeData.json (unless debugging)
   Use with -D for daily use, to capture stats that only occur daily
     writes the data to CarrierDailyData.json (unless debugging)
+  each month's data is rotated into e.g. CarrierRealTimeData.2025-09.json.gz, see jsonLinesWriter.py
+  Add -s [dbfile] to also write the data to the sqlite database
+  Add -b with -R to only write a row when something moved past its deadband, see deadband.py
+  Add -S with -R to keep running min/max/mean/variance of every field, see runningStats.py,
+    and with -D to add the day to the degree day regression, see degreeDayRegression.py
 """
 import argparse
 import asyncio
@@ -19,7 +24,22 @@ import datetime
 
 
 from getArduinoData import getArduinoData
-from getCarrierData import getCarrierData, selectRealTimeData, selectDailyData
+from getCarrierData import getCarrierData, selectAllRealTimeData, selectAllDailyData
+from jsonLinesWriter import appendRows
+
+def updateStatistics(args, row):
+    """ add the row to the running statistics (-R) or the degree day regression (-D); a failure is only logged """
+    if not args.stats:
+        return
+    try:
+        if args.realtime:
+            from runningStats import updateStats
+            updateStats(row)
+        else:
+            from degreeDayRegression import updateRegression
+            updateRegression(row)
+    except Exception as error:
+        logging.exception("the statistics weren't updated: %s" % error)
 
 async def main():
     parser = argparse.ArgumentParser(
@@ -30,6 +50,12 @@ async def main():
     parser.add_argument( "-n", "--numeric", action="store_true", help="force numbers in output dict" )
     parser.add_argument( "-R", "--realtime", action="store_true", help="get the realtime fields" )
     parser.add_argument( "-D", "--daily", action="store_true", help="get the Daily Fields" )
+    parser.add_argument( "-s", "--sqlite", nargs="?", const=True, default=None,
+        help="also write the data to the sqlite database (default ../CarrierData.sqlite)" )
+    parser.add_argument( "-b", "--deadband", action="store_true",
+        help="with -R, only write the row when a field moved past its deadband, or after the heartbeat" )
+    parser.add_argument( "-S", "--stats", action="store_true",
+        help="also add the row to the running statistics (-R), or the degree day regression (-D)" )
     args = parser.parse_args()
 
     if args.debug:
@@ -52,17 +78,19 @@ async def main():
     elif args.realtime:
         logging.info("running Carrier Realtime Data collection")
         output_file = "../CarrierRealTimeData.json"
+        table = "RealTime"
         # since the Carrier login is async, I can do the arduino collection while waiting
         getDataTask = asyncio.create_task (getCarrierData(args))
         carrier_data = await getDataTask
-        if len(carrier_data) != 1:
-            logging.error("Carrier returned %d systems\n" % len(carrier_data))
+        if len(carrier_data) == 0:
+            logging.error("Carrier returned no systems\n")
             exit(1)
 
-        carrier_data = selectRealTimeData(carrier_data[0].__repr__())
+        carrier_data = selectAllRealTimeData(carrier_data)
     elif args.daily:
         logging.info("running Carrier Daily Data collection")
         output_file = "../CarrierDailyData.json"
+        table = "Daily"
 
         # wait until just past midnight
         now = datetime.datetime.now()
@@ -75,11 +103,11 @@ async def main():
 
         getDataTask = asyncio.create_task (getCarrierData(args))
         carrier_data = await getDataTask
-        if len(carrier_data) != 1:
-            logging.error("Carrier returned %d systems\n" % len(carrier_data))
+        if len(carrier_data) == 0:
+            logging.error("Carrier returned no systems\n")
             exit(1)
 
-        carrier_data = selectDailyData(carrier_data[0].__repr__())
+        carrier_data = selectAllDailyData(carrier_data)
         del carrier_data['DATE'] #we want yesterday's date!
     else:
         logging.error ("You must specify either --realtime or --daily")
@@ -92,11 +120,28 @@ async def main():
     collected_data = {**arduino_data, **carrier_data}
     logging.debug ("combined data: " + json.dumps(collected_data))
 
-    # write the collected data to a file for comparison
-    f = open(output_file, "a")
-    f.write (json.dumps(collected_data) + '\n')
-    f.close ()
+    # every collection counts in the statistics, including the ones the deadband holds back
+    stats_data = collected_data
+
+    if args.deadband and args.realtime:
+        from deadband import filterRow
+        collected_data = filterRow(collected_data)
+        if collected_data is None:
+            updateStatistics(args, stats_data)
+            exit(0)
+
+    # locked, so an overlapping -R and -D don't interleave, and rotated monthly into compressed segments
+    appendRows(output_file, [collected_data])
+
+    if args.sqlite:
+        # only loaded when it's used, to keep the startup of every cron run small
+        from carrierDataSQLite import DBFile, openDB, writeRows
+        db = openDB(DBFile if args.sqlite is True else args.sqlite)
+        writeRows(db, table, [collected_data])
+        db.close()
 
+    # only once the row is saved
+    updateStatistics(args, stats_data)
     exit(0)
 
 
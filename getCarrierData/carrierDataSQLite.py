@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+  optional SQLite sink for the collected carrier + arduino data.
+
+  Each collector run appends one row to the RealTime or Daily table.
+  The tables are typed, and indexed on (DATE, TIME) so that the loaders and
+  any analysis can do indexed lookups instead of re-parsing the JSON files.
+  The index is unique, and a row whose DATE and TIME are already there is skipped, so importing
+  a file again, or one whose rows carrierDataCron -s already wrote, adds nothing twice.
+  Any field not in the known column list is kept in the "extra" column as JSON,
+  so nothing is lost when a new field is added to the collector.
+
+  The database uses WAL mode, so the loader can read while the cron job writes.
+
+  Usage (as library):
+    db = openDB("../CarrierData.sqlite")
+    writeRows(db, "RealTime", [collected_data])
+
+  Usage (CLI), one-time bulk import of the existing JSON files:
+    python3 carrierDataSQLite.py [-d] [--db FILE] --RealTime OldCarrierRealTimeData.json CarrierRealTimeData.json
+    python3 carrierDataSQLite.py [-d] [--db FILE] --Daily OldCarrierDailyData.json CarrierDailyData.json
+"""
+import argparse
+import json
+import logging
+import sqlite3
+from sys import exit
+from typing import Any, Dict, Iterable, Iterator, List
+
+from jsonLinesWriter import readJsonLines
+
+DBFile = "../CarrierData.sqlite"
+
+# column name and sqlite type for each table, in the order the collector writes them
+# see CarrierDataSchema.txt
+RealTimeColumns = [
+    [ 'DATE', 'TEXT' ],
+    [ 'TIME', 'TEXT' ],
+    [ 'TItemp', 'REAL' ],
+    [ 'Thumidity', 'REAL' ],
+    [ 'LItemp', 'REAL' ],
+    [ 'LOtemp', 'REAL' ],
+    [ 'Lhumidity', 'REAL' ],
+    [ 'out_temp', 'REAL' ],
+    [ 'airflow_cfm', 'INTEGER' ],
+    [ 'blower_rpm', 'INTEGER' ],
+    [ 'humidifier', 'TEXT' ],
+    [ 'outdoor_status', 'TEXT' ],
+    [ 'indoor_status', 'TEXT' ],
+    [ 'hp_profile', 'TEXT' ],
+    [ 'conditioning', 'TEXT' ],
+    [ 'in_temp', 'REAL' ],
+    [ 'humidity', 'INTEGER' ],
+    [ 'fan', 'TEXT' ],
+]
+DailyColumns = [
+    [ 'DATE', 'TEXT' ],
+    [ 'TIME', 'TEXT' ],
+    [ 'TItempAvg', 'REAL' ],
+    [ 'TItempMinMax', 'TEXT' ],
+    [ 'ThumidityAvg', 'REAL' ],
+    [ 'ThumidityMinMax', 'TEXT' ],
+    [ 'LItempAvg', 'REAL' ],
+    [ 'LItempMinMax', 'TEXT' ],
+    [ 'LOtempAvg', 'REAL' ],
+    [ 'LOtempMinMax', 'TEXT' ],
+    [ 'LhumidityAvg', 'REAL' ],
+    [ 'LhumidityMinMax', 'TEXT' ],
+    [ 'hp_filter%', 'INTEGER' ],
+    [ 'humid_filter%', 'INTEGER' ],
+    [ 'id', 'TEXT' ],
+    [ 'cool_btu', 'INTEGER' ],
+    [ 'heat_kWh', 'INTEGER' ],
+    [ 'hp_fan', 'INTEGER' ],
+    [ 'furnace_gal', 'INTEGER' ],
+    [ 'furnace_fan', 'INTEGER' ],
+    [ 'loop_pump', 'INTEGER' ],
+]
+Tables = {
+    'RealTime': RealTimeColumns,
+    'Daily': DailyColumns,
+}
+
+# rows are committed in batches of this size during a bulk import
+BatchSize = 1000
+
+def _quote(name: str) -> str:
+    # some field names (hp_filter%) are not valid bare identifiers
+    return '"' + name.replace('"', '""') + '"'
+
+def _uniqueDateTime(db: sqlite3.Connection, table: str):
+    """ the unique (DATE, TIME) index; a database from before it has its duplicates dropped first, the first row kept """
+    if any(index[1] == "%s_date_time_unique" % table for index in db.execute("PRAGMA index_list(%s)" % table)):
+        return
+    removed = db.execute("DELETE FROM %s WHERE rowid NOT IN (SELECT MIN(rowid) FROM %s GROUP BY DATE, TIME)" % (table, table)).rowcount
+    if removed:
+        logging.warning("dropped %d duplicate (DATE, TIME) rows from %s" % (removed, table))
+    db.execute("CREATE UNIQUE INDEX %s_date_time_unique ON %s (DATE, TIME)" % (table, table))
+    db.execute("DROP INDEX IF EXISTS %s_date_time" % table)
+
+def openDB(dbFile: str = DBFile) -> sqlite3.Connection:
+    """open (and create if needed) the database, in WAL mode"""
+    db = sqlite3.connect(dbFile)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    with db:
+        for table, columns in Tables.items():
+            column_defs = ", ".join("%s %s" % (_quote(c[0]), c[1]) for c in columns)
+            db.execute("CREATE TABLE IF NOT EXISTS %s (%s, extra TEXT)" % (table, column_defs))
+            _uniqueDateTime(db, table)
+    logging.debug("opened sqlite db %s" % dbFile)
+    return db
+
+def _toRow(columns: List, row_dict: Dict[str, Any]) -> List:
+    row = [row_dict.get(c[0]) for c in columns]
+    known = set(c[0] for c in columns)
+    extra = {k: v for k, v in row_dict.items() if k not in known}
+    row.append(json.dumps(extra) if extra else None)
+    return row
+
+def _toDict(columns: List, row: tuple) -> Dict[str, Any]:
+    row_dict = {}
+    for i, column in enumerate(columns):
+        if row[i] is not None:
+            row_dict[column[0]] = row[i]
+    if row[-1] is not None:
+        row_dict.update(json.loads(row[-1]))
+    return row_dict
+
+def writeRows(db: sqlite3.Connection, table: str, rows: Iterable[Dict[str, Any]], commit: bool = True) -> int:
+    """
+    insert rows (dicts, as written to the JSON files) in batched transactions, skipping those whose
+    DATE and TIME are already there; returns how many were inserted.
+    commit=False leaves them all in one open transaction, for the caller to commit; on an error
+    it's rolled back, so none of them are left behind
+    """
+    columns = Tables[table]
+    sql = "INSERT OR IGNORE INTO %s (%s, extra) VALUES (%s)" % (
+        table, ", ".join(_quote(c[0]) for c in columns), ", ".join("?" * (len(columns) + 1)))
+    count = 0
+    inserted = 0
+
+    def insert(batch):
+        if commit:
+            with db:
+                return db.executemany(sql, batch).rowcount
+        return db.executemany(sql, batch).rowcount
+
+    try:
+        batch = []
+        for row_dict in rows:
+            batch.append(_toRow(columns, row_dict))
+            if len(batch) >= BatchSize:
+                inserted += insert(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            inserted += insert(batch)
+            count += len(batch)
+    except Exception:
+        if not commit:
+            db.rollback()
+        raise
+    if inserted < count:
+        logging.info("skipped %d rows already in %s" % (count - inserted, table))
+    logging.debug("wrote %d rows to %s" % (inserted, table))
+    return inserted
+
+def readRows(db: sqlite3.Connection, table: str, since: str | None = None, until: str | None = None) -> Iterator[Dict[str, Any]]:
+    """yield rows as dicts, in (DATE, TIME) order, optionally limited to since <= DATE <= until"""
+    columns = Tables[table]
+    where = []
+    params = []
+    if since is not None:
+        where.append("DATE >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("DATE <= ?")
+        params.append(until)
+    sql = "SELECT %s, extra FROM %s" % (", ".join(_quote(c[0]) for c in columns), table)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY DATE, TIME"
+    for row in db.execute(sql, params):
+        yield _toDict(columns, row)
+
+def previousRow(db: sqlite3.Connection, table: str, before: str) -> Dict[str, Any] | None:
+    """the last row dated before DATE before, or None"""
+    columns = Tables[table]
+    sql = "SELECT %s, extra FROM %s WHERE DATE < ? ORDER BY DATE DESC, TIME DESC LIMIT 1" % (
+        ", ".join(_quote(c[0]) for c in columns), table)
+    for row in db.execute(sql, [before]):
+        return _toDict(columns, row)
+    return None
+
+def importJsonFile(db: sqlite3.Connection, table: str, jsonFile: str) -> int:
+    """one-time bulk import of an existing Carrier*Data.json or OldCarrier*Data.json"""
+    count = writeRows(db, table, readJsonLines([jsonFile]))
+    logging.info("imported %d rows from %s into %s" % (count, jsonFile, table))
+    return count
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk import collected JSON into the SQLite database"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "--db", default=DBFile, help="sqlite database file (default %s)" % DBFile )
+    parser.add_argument( "-R", "--RealTime", action="store_true", help="Import JSON RealTime data" )
+    parser.add_argument( "-D", "--Daily", action="store_true", help="Import JSON Daily data" )
+    parser.add_argument( 'file', nargs='+', help="JSON file(s) to import, oldest first" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.RealTime and args.Daily:
+        logging.error ("You must specify only ONE of RealTime and Daily")
+        exit(1)
+    elif args.RealTime:
+        table = 'RealTime'
+    elif args.Daily:
+        table = 'Daily'
+    else:
+        logging.error ("You must specify either --RealTime or --Daily")
+        exit(1)
+
+    db = openDB(args.db)
+    for jsonFile in args.file:
+        importJsonFile(db, table, jsonFile)
+    db.close()
+    exit(0)
+
+if __name__ == "__main__":
+    main()
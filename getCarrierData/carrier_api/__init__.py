@@ -1,10 +1,38 @@
-from .errors import BaseError, AuthError
-from .const import FanModes, ActivityTypes, SystemModes, TemperatureUnits
-from .api_connection_graphql import ApiConnectionGraphql
-from .config import Config, ConfigZone, ConfigZoneActivity
-from .profile import Profile
-from .status import Status, StatusZone
-from .system import System
-from .energy import Energy
-from .api_websocket_data_updater import WebsocketDataUpdater
-from .api_websocket import ApiWebsocket
+from importlib import import_module
+
+# the submodules are only imported when one of their names is first used, so e.g. a
+# sampling run that only needs ApiConnectionGraphql never loads the websocket or deepmerge code
+_EXPORTS = {
+    "BaseError": ".errors",
+    "AuthError": ".errors",
+    "FanModes": ".const",
+    "ActivityTypes": ".const",
+    "SystemModes": ".const",
+    "TemperatureUnits": ".const",
+    "ApiConnectionGraphql": ".api_connection_graphql",
+    "TokenManager": ".token_manager",
+    "Config": ".config",
+    "ConfigZone": ".config",
+    "ConfigZoneActivity": ".config",
+    "Profile": ".profile",
+    "Status": ".status",
+    "StatusZone": ".status",
+    "System": ".system",
+    "Energy": ".energy",
+    "WebsocketDataUpdater": ".api_websocket_data_updater",
+    "ApiWebsocket": ".api_websocket",
+    "WebsocketRecorder": ".api_websocket_recorder",
+    "read_recording": ".api_websocket_recorder",
+    "StatusLog": ".status_log",
+    "state_at": ".status_log",
+    "read_status_log": ".status_log",
+}
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,17 @@
+from asyncio import gather
 from datetime import datetime, timedelta
 from logging import getLogger
-from typing import Any, Literal
+from typing import Any, Literal, TYPE_CHECKING
 
 from aiohttp import ClientSession
 from gql import Client, gql, GraphQLRequest
 from gql.transport.aiohttp import AIOHTTPTransport
 
 from .const import (
+    GRAPHQL_NO_AUTH_URL,
+    GRAPHQL_URL,
+    TOKEN_URL,
+    WEBSOCKET_URL,
     FanModes,
     ActivityTypes,
     HeatSourceTypes,
@@ -18,36 +23,248 @@ from .status import Status
 from .config import Config
 from .errors import AuthError
 from .system import System
-from .api_websocket import ApiWebsocket
+if TYPE_CHECKING:
+    # imported in login(), so a run that never listens doesn't load the websocket code
+    from .api_websocket import ApiWebsocket
+from .token_manager import TokenManager
 
 _LOGGER = getLogger(__name__)
 #_LOGGER.setLevel(logging.DEBUG)
 
+# the selection sets of getInfinitySystems and getInfinityEnergy, shared with the batched queries
+INFINITY_SYSTEM_FIELDS = """
+  {
+    profile {
+      serial
+      name
+      firmware
+      model
+      brand
+      indoorModel
+      indoorSerial
+      idutype
+      idusource
+      outdoorModel
+      outdoorSerial
+      odutype
+    }
+    status {
+      localTime
+      localTimeOffset
+      utcTime
+      wcTime
+      isDisconnected
+      cfgem
+      mode
+      vacatrunning
+      oat
+      odu {
+        type
+        opstat
+      }
+      filtrlvl
+      idu {
+        type
+        opstat
+        cfm
+        statpress
+        blwrpm
+      }
+      vent
+      ventlvl
+      humid
+      humlvl
+      uvlvl
+      zones {
+        id
+        rt
+        rh
+        fan
+        htsp
+        clsp
+        hold
+        enabled
+        currentActivity
+        zoneconditioning
+      }
+    }
+    config {
+      etag
+      mode
+      cfgem
+      cfgdead
+      cfgvent
+      cfghumid
+      cfguv
+      cfgfan
+      heatsource
+      vacat
+      vacstart
+      vacend
+      vacmint
+      vacmaxt
+      vacfan
+      fueltype
+      gasunit
+      vacat
+      filtertype
+      filterinterval
+      humidityVacation {
+        rclgovercool
+        ventspdclg
+        ventclg
+        rhtg
+        humidifier
+        humid
+        venthtg
+        rclg
+        ventspdhtg
+      }
+      zones {
+        id
+        name
+        enabled
+        hold
+        holdActivity
+        otmr
+        occEnabled
+        program {
+          id
+          day {
+            id
+            zoneId
+            period {
+              id
+              zoneId
+              dayId
+              activity
+              time
+              enabled
+            }
+          }
+        }
+        activities {
+          id
+          zoneId
+          type
+          fan
+          htsp
+          clsp
+        }
+      }
+      humidityAway {
+        humid
+        humidifier
+        rhtg
+        rclg
+        rclgovercool
+      }
+      humidityHome {
+        humid
+        humidifier
+        rhtg
+        rclg
+        rclgovercool
+      }
+    }
+  }
+"""
+
+INFINITY_ENERGY_FIELDS = """
+  {
+    energyConfig {
+      cooling {
+        display
+        enabled
+      }
+      eheat {
+        display
+        enabled
+      }
+      fan {
+        display
+        enabled
+      }
+      fangas {
+        display
+        enabled
+      }
+      gas {
+        display
+        enabled
+      }
+      hpheat {
+        display
+        enabled
+      }
+      looppump {
+        display
+        enabled
+      }
+      reheat {
+        display
+        enabled
+      }
+      hspf
+      seer
+    }
+    energyPeriods {
+      energyPeriodType
+      eHeatKwh
+      coolingKwh
+      fanGasKwh
+      fanKwh
+      hPHeatKwh
+      loopPumpKwh
+      gasKwh
+      reheatKwh
+    }
+  }
+"""
+
 class ApiConnectionGraphql:
     expires_at: datetime = datetime.now()
     refresh_token: str | None = None
     token_type: str | None = None
     access_token: str | None = None
-    api_websocket: ApiWebsocket | None = None
+    api_websocket: "ApiWebsocket | None" = None
+    graphql_no_auth_url: str = GRAPHQL_NO_AUTH_URL
+    graphql_url: str = GRAPHQL_URL
+    token_url: str = TOKEN_URL
+    websocket_url: str = WEBSOCKET_URL
 
     def __init__(
             self,
             username: str,
             password: str,
             client_session: ClientSession | None = None,
+            base_url: str | None = None,
+            token_refresh_margin: timedelta = timedelta(minutes=5),
+            serials: list[str] | None = None,
     ):
         self.username = username
         self.password = password
+        # the system serials, e.g. cached from an earlier run, so load_data(batched=True) can fetch everything at once
+        self.known_serials: list[str] = list(serials or [])
+        self.token_manager = TokenManager(self, refresh_margin=token_refresh_margin)
+        if base_url is not None:
+            # e.g. a local stand-in service, see getCarrierData/fakeCarrierServer.py
+            base_url = base_url.rstrip("/")
+            self.graphql_no_auth_url = f"{base_url}/graphql-no-auth"
+            self.graphql_url = f"{base_url}/graphql"
+            self.token_url = f"{base_url}/oauth2/default/v1/token"
+            self.websocket_url = "ws" + base_url.removeprefix("http") + "/"
         if client_session is None:
             self.api_session = ClientSession(raise_for_status=False)
         else:
             self.api_session = client_session
 
     async def cleanup(self) -> None:
+        self.token_manager.cancel()
         await self.api_session.close()
 
     async def login(self) -> None:
-        transport = AIOHTTPTransport(url="https://dataservice.infinity.iot.carrier.com/graphql-no-auth", ssl=True)
+        transport = AIOHTTPTransport(url=self.graphql_no_auth_url, ssl=self.graphql_no_auth_url.startswith("https"))
         async with Client(
                 transport=transport,
                 fetch_schema_from_transport=False,
@@ -82,18 +299,17 @@ class ApiConnectionGraphql:
                 self.access_token = result["assistedLogin"]["data"]["access_token"]
                 self.refresh_token = result["assistedLogin"]["data"]["refresh_token"]
                 if self.api_websocket is None:
+                    from .api_websocket import ApiWebsocket
                     self.api_websocket = ApiWebsocket(self)
             else:
                 raise AuthError(result)
 
     async def check_auth_expiration(self) -> None:
-        if self.refresh_token is None:
-            await self.login()
-        if self.expires_at < datetime.now():
-            await self.refresh_auth_token()
+        # normally a no-op: the token manager renews the token in the background before it expires
+        await self.token_manager.ensure_valid()
 
     async def refresh_auth_token(self) -> None:
-        url = "https://sso.carrier.com/oauth2/default/v1/token"
+        url = self.token_url
         json_body = {
             "client_id": "0oa1ce7hwjuZbfOMB4x7",
             "grant_type": "refresh_token",
@@ -110,8 +326,9 @@ class ApiConnectionGraphql:
 
     async def authed_query(self, operation_name: str, query: GraphQLRequest, variable_values: dict[str, Any]) -> dict[str, Any]:
         await self.check_auth_expiration()
-        transport = AIOHTTPTransport(url="https://dataservice.infinity.iot.carrier.com/graphql",
-                                     headers={'Authorization': f"{self.token_type} {self.access_token}"}, ssl=True)
+        transport = AIOHTTPTransport(url=self.graphql_url,
+                                     headers={'Authorization': f"{self.token_type} {self.access_token}"},
+                                     ssl=self.graphql_url.startswith("https"))
         async with Client(
                 transport=transport,
                 fetch_schema_from_transport=False,
@@ -175,141 +392,7 @@ class ApiConnectionGraphql:
         query = gql(
             """
             query getInfinitySystems($userName: String!) {
-              infinitySystems(userName: $userName) {
-                profile {
-                  serial
-                  name
-                  firmware
-                  model
-                  brand
-                  indoorModel
-                  indoorSerial
-                  idutype
-                  idusource
-                  outdoorModel
-                  outdoorSerial
-                  odutype
-                }
-                status {
-                  localTime
-                  localTimeOffset
-                  utcTime
-                  wcTime
-                  isDisconnected
-                  cfgem
-                  mode
-                  vacatrunning
-                  oat
-                  odu {
-                    type
-                    opstat
-                  }
-                  filtrlvl
-                  idu {
-                    type
-                    opstat
-                    cfm
-                    statpress
-                    blwrpm
-                  }
-                  vent
-                  ventlvl
-                  humid
-                  humlvl
-                  uvlvl
-                  zones {
-                    id
-                    rt
-                    rh
-                    fan
-                    htsp
-                    clsp
-                    hold
-                    enabled
-                    currentActivity
-                    zoneconditioning
-                  }
-                }
-                config {
-                  etag
-                  mode
-                  cfgem
-                  cfgdead
-                  cfgvent
-                  cfghumid
-                  cfguv
-                  cfgfan
-                  heatsource
-                  vacat
-                  vacstart
-                  vacend
-                  vacmint
-                  vacmaxt
-                  vacfan
-                  fueltype
-                  gasunit
-                  vacat
-                  filtertype
-                  filterinterval
-                  humidityVacation {
-                    rclgovercool
-                    ventspdclg
-                    ventclg
-                    rhtg
-                    humidifier
-                    humid
-                    venthtg
-                    rclg
-                    ventspdhtg
-                  }
-                  zones {
-                    id
-                    name
-                    enabled
-                    hold
-                    holdActivity
-                    otmr
-                    occEnabled
-                    program {
-                      id
-                      day {
-                        id
-                        zoneId
-                        period {
-                          id
-                          zoneId
-                          dayId
-                          activity
-                          time
-                          enabled
-                        }
-                      }
-                    }
-                    activities {
-                      id
-                      zoneId
-                      type
-                      fan
-                      htsp
-                      clsp
-                    }
-                  }
-                  humidityAway {
-                    humid
-                    humidifier
-                    rhtg
-                    rclg
-                    rclgovercool
-                  }
-                  humidityHome {
-                    humid
-                    humidifier
-                    rhtg
-                    rclg
-                    rclgovercool
-                  }
-                }
-              }
+              infinitySystems(userName: $userName) """ + INFINITY_SYSTEM_FIELDS + """
             }
             """
         )
@@ -321,70 +404,77 @@ class ApiConnectionGraphql:
         query = gql(
             """
             query getInfinityEnergy($serial: String!) {
-              infinityEnergy(serial: $serial) {
-                energyConfig {
-                  cooling {
-                    display
-                    enabled
-                  }
-                  eheat {
-                    display
-                    enabled
-                  }
-                  fan {
-                    display
-                    enabled
-                  }
-                  fangas {
-                    display
-                    enabled
-                  }
-                  gas {
-                    display
-                    enabled
-                  }
-                  hpheat {
-                    display
-                    enabled
-                  }
-                  looppump {
-                    display
-                    enabled
-                  }
-                  reheat {
-                    display
-                    enabled
-                  }
-                  hspf
-                  seer
-                }
-                energyPeriods {
-                  energyPeriodType
-                  eHeatKwh
-                  coolingKwh
-                  fanGasKwh
-                  fanKwh
-                  hPHeatKwh
-                  loopPumpKwh
-                  gasKwh
-                  reheatKwh
-                }
-              }
+              infinityEnergy(serial: $serial) """ + INFINITY_ENERGY_FIELDS + """
             }
             """
         )
         variable_values = {"serial": system_serial}
         return await self.authed_query(operation_name=operation_name, query=query, variable_values=variable_values)
 
-    async def load_data(self) -> list[System]:
-        system_response = await self.get_systems()
+    @staticmethod
+    def _energy_selections(serials: list[str]) -> tuple[str, str, dict[str, str]]:
+        """variable definitions, aliased infinityEnergy selections (energy0, energy1, ...) and their variables"""
+        definitions = "".join(f", $serial{index}: String!" for index in range(len(serials)))
+        selections = "".join(
+            f"energy{index}: infinityEnergy(serial: $serial{index}) {INFINITY_ENERGY_FIELDS}\n" for index in range(len(serials))
+        )
+        variable_values = {f"serial{index}": serial for index, serial in enumerate(serials)}
+        return definitions, selections, variable_values
+
+    async def get_energies(self, system_serials: list[str]) -> dict[str, Any]:
+        """the energy of all the serials in one request; returns {serial: infinityEnergy}"""
+        operation_name = "getInfinityEnergies"
+        definitions, selections, variable_values = self._energy_selections(system_serials)
+        query = gql(f"query getInfinityEnergies({definitions.removeprefix(', ')}) {{\n{selections}}}")
+        response = await self.authed_query(operation_name=operation_name, query=query, variable_values=variable_values)
+        return {serial: response[f"energy{index}"] for index, serial in enumerate(system_serials)}
+
+    async def get_systems_and_energy(self, system_serials: list[str]) -> dict[str, Any]:
+        """getInfinitySystems and the energy of the given serials, in one request.
+        returns the infinitySystems response, with an "infinityEnergy" dict of {serial: infinityEnergy} added"""
+        operation_name = "getInfinitySystemsAndEnergy"
+        definitions, selections, variable_values = self._energy_selections(system_serials)
+        variable_values["userName"] = self.username
+        query = gql(
+            f"query getInfinitySystemsAndEnergy($userName: String!{definitions}) {{\n"
+            f"infinitySystems(userName: $userName) {INFINITY_SYSTEM_FIELDS}\n"
+            f"{selections}}}"
+        )
+        response = await self.authed_query(operation_name=operation_name, query=query, variable_values=variable_values)
+        return {
+            "infinitySystems": response["infinitySystems"],
+            "infinityEnergy": {serial: response[f"energy{index}"] for index, serial in enumerate(system_serials)},
+        }
+
+    async def load_data(self, batched: bool = False) -> list[System]:
+        """
+        batched: one round trip when the serials are already known (from the serials passed in, or
+        the previous load_data), otherwise two: the systems, then the energy of all of them at once.
+        Otherwise, one request for the systems, then one per system for the energy.
+        """
+        energy_responses = {}
+        if batched and self.known_serials:
+            response = await self.get_systems_and_energy(self.known_serials)
+            energy_responses = response["infinityEnergy"]
+        else:
+            response = await self.get_systems()
+        system_responses = response["infinitySystems"]
+        serials = [system_response["profile"]["serial"] for system_response in system_responses]
+        # systems added since the serials were cached
+        missing = [serial for serial in serials if serial not in energy_responses]
+        if missing and batched:
+            energy_responses.update(await self.get_energies(missing))
+        elif missing:
+            # fetch the energy for all the systems at once, so many systems take about as long as one
+            responses = await gather(*[self.get_energy(serial) for serial in missing])
+            energy_responses.update({serial: response["infinityEnergy"] for serial, response in zip(missing, responses)})
+        self.known_serials = serials
         systems = []
-        for system_response in system_response["infinitySystems"]:
+        for serial, system_response in zip(serials, system_responses):
             profile = Profile(raw=system_response["profile"])
             status = Status(raw=system_response["status"])
             config = Config(raw=system_response["config"])
-            energy_response = await self.get_energy(profile.serial)
-            energy = Energy(raw=energy_response["infinityEnergy"])
+            energy = Energy(raw=energy_responses[serial])
             systems.append(System(profile=profile, status=status, config=config, energy=energy))
         return systems
 
@@ -2,26 +2,84 @@ import asyncio
 from asyncio import sleep, create_task, CancelledError, get_event_loop, current_task
 from logging import getLogger
 from collections.abc import Callable
-from random import random
+from random import random, uniform
+from time import monotonic
 
 from aiohttp import WSMsgType, ClientWebSocketResponse
 
 _LOGGER = getLogger(__name__)
 
 
+class WebsocketHealth:
+    def __init__(self):
+        self.connected_at: float | None = None
+        self.total_connected: float = 0.0
+        self.connect_count: int = 0
+        self.reconnect_count: int = 0
+        self.failure_count: int = 0
+        self.message_count: int = 0
+        self.last_message_at: float | None = None
+        self.last_error: str | None = None
+        self.next_retry_at: float | None = None
+
+    def connected(self) -> None:
+        if self.connect_count > 0:
+            self.reconnect_count += 1
+        self.connect_count += 1
+        self.connected_at = monotonic()
+        self.next_retry_at = None
+
+    def disconnected(self) -> None:
+        if self.connected_at is not None:
+            self.total_connected += monotonic() - self.connected_at
+        self.connected_at = None
+
+    def message(self) -> None:
+        self.message_count += 1
+        self.last_message_at = monotonic()
+
+    def __repr__(self):
+        now = monotonic()
+        uptime = now - self.connected_at if self.connected_at is not None else 0.0
+        return {
+            "connected": self.connected_at is not None,
+            "uptime": uptime,
+            "total_uptime": self.total_connected + uptime,
+            "reconnect_count": self.reconnect_count,
+            "failure_count": self.failure_count,
+            "message_count": self.message_count,
+            "message_lag": now - self.last_message_at if self.last_message_at is not None else None,
+            "last_error": self.last_error,
+            "next_retry_in": max(0.0, self.next_retry_at - now) if self.next_retry_at is not None else None,
+        }
+
+    def __str__(self):
+        return str(self.__repr__())
+
+
 class ApiWebsocket:
     websocket: ClientWebSocketResponse | None = None
     running = None
-    async_callbacks: list[Callable] = []
     task_heartbeat = None
     task_listener = None
+    heartbeat_interval: float = 55
+    # reconnect delays double from backoff_initial up to backoff_max seconds, with jitter
+    backoff_initial: float = 1
+    backoff_max: float = 300
+    # a connection that lasted this long resets the backoff
+    backoff_reset_after: float = 60
 
     def __init__(
             self,
-            api_connection_graphql
+            api_connection_graphql,
+            heartbeat_interval: float | None = None,
     ):
         self.api_connection_graphql = api_connection_graphql
         self.api_connection_graphql.api_websocket = self
+        self.async_callbacks: list[Callable] = []
+        self.health = WebsocketHealth()
+        if heartbeat_interval is not None:
+            self.heartbeat_interval = heartbeat_interval
 
     def callback_add(self, async_callback):
         self.async_callbacks.append(async_callback)
@@ -42,41 +100,54 @@ class ApiWebsocket:
                     _LOGGER.debug(f"ws: kept alive in {task_name}")
                 else:
                     _LOGGER.debug(f"ws: keep alive skipped as no socket available in {task_name}")
+                await sleep(self.heartbeat_interval)
             except CancelledError:
                 running = False
             except Exception as error:
                 _LOGGER.exception("ws heartbeat error", exc_info=error)
-            await sleep(55)
+                await sleep(self.heartbeat_interval)
 
     async def create_task_heartbeat(self) -> None:
         self.task_heartbeat = get_event_loop().create_task(self.loop_heartbeat(), name=f"carrier_api_ws_heartbeat:{random()}")
 
+    def backoff_delay(self) -> float:
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** max(0, self.health.failure_count - 1))
+        # equal jitter, so reconnecting clients spread out but still wait at least half the delay
+        return delay / 2 + uniform(0, delay / 2)
+
     async def listener(self) -> None:
         await self.api_connection_graphql.check_auth_expiration()
         async with self.api_connection_graphql.api_session.ws_connect(
-                f"wss://realtime.infinity.iot.carrier.com/?Token={self.api_connection_graphql.access_token}") as self.websocket:
+                f"{self.api_connection_graphql.websocket_url}?Token={self.api_connection_graphql.access_token}") as self.websocket:
+            self.health.connected()
             if self.task_heartbeat is None:
                 await self.create_task_heartbeat()
-            if self.websocket is not None:
-                async for msg in self.websocket:
-                    if msg.type == WSMsgType.TEXT:
-                        if msg.data == 'close cmd':
-                            await self.websocket.close()
+            try:
+                if self.websocket is not None:
+                    async for msg in self.websocket:
+                        if msg.type == WSMsgType.TEXT:
+                            self.health.message()
+                            if msg.data == 'close cmd':
+                                await self.websocket.close()
+                                break
+                            else:
+                                for async_callback in self.async_callbacks:
+                                    await async_callback(msg.data)
+                        elif msg.type == WSMsgType.ERROR:
+                            self.health.last_error = str(self.websocket.exception())
                             break
-                        else:
-                            for async_callback in self.async_callbacks:
-                                await async_callback(msg.data)
-                    elif msg.type == WSMsgType.ERROR:
-                        break
-            _LOGGER.debug("ws: closed")
-            self.websocket = None
-            if self.task_heartbeat is not None:
-                self.task_heartbeat.cancel()
-            self.task_heartbeat = None
+            finally:
+                _LOGGER.debug("ws: closed")
+                self.health.disconnected()
+                self.websocket = None
+                if self.task_heartbeat is not None:
+                    self.task_heartbeat.cancel()
+                self.task_heartbeat = None
 
     async def loop_listener(self) -> None:
         self.running = True
         while self.running:
+            started = monotonic()
             try:
                 _LOGGER.debug("websocket task listening")
                 await self.listener()
@@ -84,8 +155,21 @@ class ApiWebsocket:
             except CancelledError:
                 self.running = False
                 _LOGGER.debug("websocket task cancelled")
+                break
             except Exception as websocket_error:
+                self.health.last_error = str(websocket_error)
                 _LOGGER.exception("websocket task exception", exc_info=websocket_error)
+            if monotonic() - started >= self.backoff_reset_after:
+                self.health.failure_count = 0
+            self.health.failure_count += 1
+            delay = self.backoff_delay()
+            self.health.next_retry_at = monotonic() + delay
+            _LOGGER.debug(f"websocket reconnecting in {delay:.1f}s")
+            try:
+                await sleep(delay)
+            except CancelledError:
+                self.running = False
+                _LOGGER.debug("websocket task cancelled")
 
     async def create_task_listener(self) -> None:
         self.task_listener = create_task(self.loop_listener(), name="carrier_api_ws")
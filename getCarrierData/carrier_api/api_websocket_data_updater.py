@@ -2,10 +2,14 @@ from datetime import datetime, UTC
 from json import loads
 from deepmerge import always_merger
 from logging import getLogger
+from typing import TYPE_CHECKING
 from .system import System
 from .status import Status
 from .config import Config
 
+if TYPE_CHECKING:
+    from .status_log import StatusLog
+
 _LOGGER = getLogger(__name__)
 
 
@@ -16,12 +20,47 @@ def find_by_id(collection: list[dict], id: str) -> dict:
     raise ValueError("id: %s not found in list: %s", id, collection)
 
 
+def merge_status(status_raw: dict, delta: dict) -> dict:
+    """merge an InfinityStatus delta into the raw status; returns the merged status"""
+    zones = delta.pop('zones', [])
+    for zone in zones:
+        _timestamp = zone.pop("timestamp", None)
+        stale_zone = find_by_id(status_raw["zones"], zone['id'])
+        always_merger.merge(stale_zone, zone)
+    return always_merger.merge(status_raw, delta)
+
+
+def merge_config(config_raw: dict, delta: dict) -> dict:
+    """merge an InfinityConfig delta into the raw config; returns the merged config"""
+    _message_id = delta.pop("id", None)
+    _config_id = delta.pop("infinitySystemConfigurationId", None)
+    zones = delta.pop('zones', [])
+    for zone in zones:
+        _timestamp = zone.pop("timestamp", None)
+        if "id" in zone:
+            zone_id = zone['id']
+            stale_zone = find_by_id(config_raw["zones"], zone_id)
+            activities = zone.pop('activities', [])
+            for activity in activities:
+                _timestamp = activity.pop("timestamp", None)
+                _zone_configuration_id = activity.pop("zoneConfigurationId", None)
+                _fan_setting_id = activity.pop("fanSettingId", None)
+                stale_activity = find_by_id(stale_zone["activities"], activity["id"])
+                if stale_activity is not None:
+                    always_merger.merge(stale_activity, activity)
+            always_merger.merge(stale_zone, zone)
+    return always_merger.merge(config_raw, delta)
+
+
 class WebsocketDataUpdater:
     def __init__(
             self,
             systems: list[System],
+            status_log: "StatusLog | None" = None,
     ):
         self.systems = systems
+        # an append-only log of the deltas applied, see status_log.py
+        self.status_log = status_log
 
     def carrier_system(self, serial_id: str) -> System:
         for system in self.systems:
@@ -38,37 +77,19 @@ class WebsocketDataUpdater:
         system = self.carrier_system(serial_id=serial_id)
         if system is None:
             return
+        if self.status_log is not None and message_type in ("InfinityStatus", "InfinityConfig"):
+            # the snapshot, when one is due, is of the state before this delta
+            self.status_log.maybe_snapshot(self.systems)
+            self.status_log.append(serial_id, message_type, websocket_message_json)
         match message_type:
             case "InfinityStatus":
                 _LOGGER.debug("InfinityStatus received: %s", websocket_message)
-                zones = websocket_message_json.pop('zones', [])
-                for zone in zones:
-                    _timestamp = zone.pop("timestamp", None)
-                    stale_zone = find_by_id(system.status.raw["zones"], zone['id'])
-                    always_merger.merge(stale_zone, zone)
-                merged_status = always_merger.merge(system.status.raw, websocket_message_json)
+                merged_status = merge_status(system.status.raw, websocket_message_json)
                 merged_status.update({"utcTime": datetime.now(UTC).isoformat()})
                 system.status = Status(merged_status)
             case "InfinityConfig":
-                _message_id = websocket_message_json.pop("id", None)
-                _config_id = websocket_message_json.pop("infinitySystemConfigurationId", None)
                 _LOGGER.debug("InfinityConfig received: %s", websocket_message)
-                zones = websocket_message_json.pop('zones', [])
-                for zone in zones:
-                    _timestamp = zone.pop("timestamp", None)
-                    if "id" in zone:
-                        zone_id = zone['id']
-                        stale_zone = find_by_id(system.config.raw["zones"], zone_id)
-                        activities = zone.pop('activities', [])
-                        for activity in activities:
-                            _timestamp = activity.pop("timestamp", None)
-                            _zone_configuration_id = activity.pop("zoneConfigurationId", None)
-                            _fan_setting_id = activity.pop("fanSettingId", None)
-                            stale_activity = find_by_id(stale_zone["activities"], activity["id"])
-                            if stale_activity is not None:
-                                always_merger.merge(stale_activity, activity)
-                        always_merger.merge(stale_zone, zone)
-                always_merger.merge(system.config.raw, websocket_message_json)
+                merge_config(system.config.raw, websocket_message_json)
                 system.config = Config(system.config.raw)
             case _:
                 _LOGGER.error("Received unknown message: %s", websocket_message)
@@ -0,0 +1,76 @@
+import gzip
+from collections.abc import Iterator
+from json import dumps, loads
+from logging import getLogger
+from time import time
+from typing import Any, TextIO
+
+from .system import System
+
+_LOGGER = getLogger(__name__)
+
+SYSTEMS_PREFIX = "#systems\t"
+
+
+def _open(path: str, mode: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class WebsocketRecorder:
+    """
+    websocket callback that writes each raw frame as "<epoch seconds>\t<frame>" on its own line,
+    gzipped if the path ends in .gz. The first line holds the raw systems the frames apply to,
+    so a recording can be replayed through WebsocketDataUpdater.
+    """
+    def __init__(
+            self,
+            path: str,
+            systems: list[System] | None = None,
+    ):
+        self.path = path
+        self.frame_count = 0
+        self.file = _open(path, "w")
+        if systems is not None:
+            raw_systems = [
+                {
+                    "profile": system.profile.raw,
+                    "status": system.status.raw,
+                    "config": system.config.raw,
+                    "energy": system.energy.raw,
+                } for system in systems
+            ]
+            self.file.write(SYSTEMS_PREFIX + dumps(raw_systems) + "\n")
+
+    async def __call__(self, websocket_message: str) -> None:
+        # a frame is one json document, so any newlines in it are whitespace
+        self.file.write(f"{time():.3f}\t{websocket_message.replace(chr(10), ' ')}\n")
+        self.frame_count += 1
+
+    def close(self) -> None:
+        self.file.close()
+        _LOGGER.debug(f"recorded {self.frame_count} frames to {self.path}")
+
+
+def read_recording(path: str) -> tuple[list[dict[str, Any]] | None, Iterator[tuple[float, str]]]:
+    """return the raw systems (or None), and an iterator of (timestamp, frame)"""
+    file = _open(path, "r")
+    first = file.readline()
+    raw_systems = None
+    pending = None
+    if first.startswith(SYSTEMS_PREFIX):
+        raw_systems = loads(first[len(SYSTEMS_PREFIX):])
+    elif first:
+        pending = first
+
+    def frames() -> Iterator[tuple[float, str]]:
+        with file:
+            if pending is not None:
+                timestamp, frame = pending.rstrip("\n").split("\t", 1)
+                yield float(timestamp), frame
+            for line in file:
+                timestamp, frame = line.rstrip("\n").split("\t", 1)
+                yield float(timestamp), frame
+
+    return raw_systems, frames()
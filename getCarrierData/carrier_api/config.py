@@ -2,7 +2,7 @@ from logging import getLogger
 from datetime import datetime
 
 from .const import FanModes, ActivityTypes
-from .util import safely_get_json_value
+from .util import project, safely_get_json_value
 
 _LOGGER = getLogger(__name__)
 
@@ -19,14 +19,18 @@ class ConfigZoneActivity:
         self.heat_set_point: float = safely_get_json_value(zone_activity_json, "htsp", float)
         self.cool_set_point: float = safely_get_json_value(zone_activity_json, "clsp", float)
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "api_id": lambda _: self.api_id,
+            "type": lambda _: self.type.value,
+            "fan": lambda _: self.fan.value,
+            "heat_set_point": lambda _: self.heat_set_point,
+            "cool_set_point": lambda _: self.cool_set_point,
+        })
+
     def __repr__(self):
-        return {
-            "api_id": self.api_id,
-            "type": self.type.value,
-            "fan": self.fan.value,
-            "heat_set_point": self.heat_set_point,
-            "cool_set_point": self.cool_set_point,
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -98,20 +102,26 @@ class ConfigZone:
         else:
             return None
 
+    def _current_activity_dict(self, fields: list[str] | dict | None) -> dict | None:
+        activity = self.current_activity()
+        return activity.to_dict(fields) if activity is not None else None
+
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project); the schedule
+        is only evaluated when current_activity is asked for"""
+        return project(fields, {
+            "api_id": lambda _: self.api_id,
+            "name": lambda _: self.name,
+            "current_activity": self._current_activity_dict,
+            "hold_activity": lambda _: self.hold_activity.value if self.hold_activity is not None else None,
+            "hold": lambda _: self.hold,
+            "hold_until": lambda _: self.hold_until,
+            "occupancy_enabled": lambda _: self.occupancy_enabled,
+            "activities": lambda sub: [activity.to_dict(sub) for activity in self.activities],
+        })
+
     def __repr__(self):
-        builder = {
-            "api_id": self.api_id,
-            "name": self.name,
-            "current_activity": self.current_activity().__repr__(),
-            "hold_activity": self.hold_activity,
-            "hold": self.hold,
-            "hold_until": self.hold_until,
-            "occupancy_enabled": self.occupancy_enabled,
-            "activities": [activity.__repr__() for activity in self.activities],
-        }
-        if self.hold_activity is not None:
-            builder["hold_activity"] = self.hold_activity.value
-        return builder
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -154,13 +164,17 @@ class Config:
                     ConfigZone(zone_json=zone_json, vacation_json=vacation_json)
                 )
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "temperature_unit": lambda _: self.temperature_unit,
+            "mode": lambda _: self.mode,
+            "heat_source": lambda _: self.heat_source,
+            "zones": lambda sub: [zone.to_dict(sub) for zone in self.zones],
+        })
+
     def __repr__(self):
-        return {
-            "temperature_unit": self.temperature_unit,
-            "mode": self.mode,
-            "heat_source": self.heat_source,
-            "zones": [zone.__repr__() for zone in self.zones],
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -1,5 +1,10 @@
 from enum import Enum
 
+GRAPHQL_NO_AUTH_URL = "https://dataservice.infinity.iot.carrier.com/graphql-no-auth"
+GRAPHQL_URL = "https://dataservice.infinity.iot.carrier.com/graphql"
+TOKEN_URL = "https://sso.carrier.com/oauth2/default/v1/token"
+WEBSOCKET_URL = "wss://realtime.infinity.iot.carrier.com/"
+
 class SystemModes(Enum):
     OFF = "off"
     COOL = "cool"
@@ -1,6 +1,6 @@
 from logging import getLogger
 
-from .util import safely_get_json_value
+from .util import project, safely_get_json_value
 
 _LOGGER = getLogger(__name__)
 
@@ -17,18 +17,22 @@ class EnergyMeasurement:
         self.gas: int = safely_get_json_value(energy_measurement_json, "gasKwh", int)
         self.loop_pump: int = safely_get_json_value(energy_measurement_json, "loopPumpKwh", int)
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "id": lambda _: self.api_id,
+            "cooling": lambda _: self.cooling,
+            "hp_heat": lambda _: self.hp_heat,
+            "fan": lambda _: self.fan,
+            "electric_heat": lambda _: self.electric_heat,
+            "reheat": lambda _: self.reheat,
+            "fan_gas": lambda _: self.fan_gas,
+            "gas": lambda _: self.gas,
+            "loop_pump": lambda _: self.loop_pump,
+        })
+
     def __repr__(self):
-        return {
-            "id": self.api_id,
-            "cooling": self.cooling,
-            "hp_heat": self.hp_heat,
-            "fan": self.fan,
-            "electric_heat": self.electric_heat,
-            "reheat": self.reheat,
-            "fan_gas": self.fan_gas,
-            "gas": self.gas,
-            "loop_pump": self.loop_pump,
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -71,20 +75,24 @@ class Energy:
             if period.api_id == "year1":
                 return period
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "seer": lambda _: self.seer,
+            "hspf": lambda _: self.hspf,
+            "cooling": lambda _: self.cooling,
+            "hp_heat": lambda _: self.hp_heat,
+            "fan": lambda _: self.fan,
+            "electric_heat": lambda _: self.electric_heat,
+            "reheat": lambda _: self.reheat,
+            "fan_gas": lambda _: self.fan_gas,
+            "gas": lambda _: self.gas,
+            "loop_pump": lambda _: self.loop_pump,
+            "periods": lambda sub: [periods.to_dict(sub) for periods in self.periods],
+        })
+
     def __repr__(self):
-        return {
-            "seer": self.seer,
-            "hspf": self.hspf,
-            "cooling": self.cooling,
-            "hp_heat": self.hp_heat,
-            "fan": self.fan,
-            "electric_heat": self.electric_heat,
-            "reheat": self.reheat,
-            "fan_gas": self.fan_gas,
-            "gas": self.gas,
-            "loop_pump": self.loop_pump,
-            "periods": [periods.__repr__() for periods in self.periods],
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
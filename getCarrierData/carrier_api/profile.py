@@ -1,5 +1,5 @@
 from logging import getLogger
-from .util import safely_get_json_value
+from .util import project, safely_get_json_value
 
 _LOGGER = getLogger(__name__)
 
@@ -34,19 +34,23 @@ class Profile:
         self.outdoor_serial = safely_get_json_value(self.raw, "outdoorSerial")
         self.outdoor_unit_type = safely_get_json_value(self.raw, "odutype")
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "model": lambda _: self.model,
+            "brand": lambda _: self.brand,
+            "firmware": lambda _: self.firmware,
+            "indoor_model": lambda _: self.indoor_model,
+            "indoor_serial": lambda _: self.indoor_serial,
+            "indoor_unit_type": lambda _: self.indoor_unit_type,
+            "indoor_unit_source": lambda _: self.indoor_unit_source,
+            "outdoor_model": lambda _: self.outdoor_model,
+            "outdoor_serial": lambda _: self.outdoor_serial,
+            "outdoor_unit_type": lambda _: self.outdoor_unit_type,
+        })
+
     def __repr__(self):
-        return {
-            "model": self.model,
-            "brand": self.brand,
-            "firmware": self.firmware,
-            "indoor_model": self.indoor_model,
-            "indoor_serial": self.indoor_serial,
-            "indoor_unit_type": self.indoor_unit_type,
-            "indoor_unit_source": self.indoor_unit_source,
-            "outdoor_model": self.outdoor_model,
-            "outdoor_serial": self.outdoor_serial,
-            "outdoor_unit_type": self.outdoor_unit_type,
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
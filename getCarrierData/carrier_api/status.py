@@ -1,13 +1,21 @@
 from logging import getLogger
-from dateutil.parser import isoparse
 from datetime import datetime
 
 from .const import SystemModes, TemperatureUnits, FanModes, ActivityTypes
-from .util import safely_get_json_value
+from .util import project, safely_get_json_value
 
 _LOGGER = getLogger(__name__)
 
 
+def parse_time_stamp(value: str) -> datetime:
+    # fromisoformat handles what the api sends, so dateutil is only imported for anything odder
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        from dateutil.parser import isoparse
+        return isoparse(value)
+
+
 class StatusZone:
     def __init__(self, status_zone_json: dict):
         self.api_id = safely_get_json_value(status_zone_json, "id", str)
@@ -35,21 +43,25 @@ class StatusZone:
                 return SystemModes.OFF
         raise ValueError(f"Unknown conditioning: {self.conditioning}")
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "id": lambda _: self.api_id,
+            "name": lambda _: self.name,
+            "current_activity": lambda _: self.current_activity.value,
+            "temperature": lambda _: self.temperature,
+            "humidity": lambda _: self.humidity,
+            "fan": lambda _: self.fan.value,
+            "hold": lambda _: self.hold,
+            "occupancy": lambda _: self.occupancy,
+            "hold_until": lambda _: self.hold_until,
+            "heat_set_point": lambda _: self.heat_set_point,
+            "cool_set_point": lambda _: self.cool_set_point,
+            "conditioning": lambda _: self.conditioning,
+        })
+
     def __repr__(self):
-        return {
-            "id": self.api_id,
-            "name": self.name,
-            "current_activity": self.current_activity.value,
-            "temperature": self.temperature,
-            "humidity": self.humidity,
-            "fan": self.fan.value,
-            "hold": self.hold,
-            "occupancy": self.occupancy,
-            "hold_until": self.hold_until,
-            "heat_set_point": self.heat_set_point,
-            "cool_set_point": self.cool_set_point,
-            "conditioning": self.conditioning,
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -91,7 +103,7 @@ class Status:
         self.static_pressure: int = safely_get_json_value(self.raw, "idu.statpress", float)
         self.outdoor_unit_operational_status: str = safely_get_json_value(self.raw, "odu.opstat")
         self.indoor_unit_operational_status: str = safely_get_json_value(self.raw, "idu.opstat")
-        self.time_stamp = isoparse(safely_get_json_value(self.raw, "utcTime"))
+        self.time_stamp = parse_time_stamp(safely_get_json_value(self.raw, "utcTime"))
         self.zones = []
         for zone_json in self.raw["zones"]:
             if safely_get_json_value(zone_json, "enabled") == "on":
@@ -106,22 +118,26 @@ class Status:
                 return SystemModes.COOL
         raise ValueError(f"Unknown mode: {self.mode}")
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "outdoor_temperature": lambda _: self.outdoor_temperature,
+            "mode": lambda _: self.mode,
+            "temperature_unit": lambda _: self.temperature_unit.value,
+            "filter_used": lambda _: self.filter_used,
+            "is_disconnected": lambda _: self.is_disconnected,
+            "airflow_cfm": lambda _: self.airflow_cfm,
+            "blower_rpm": lambda _: self.blower_rpm,
+            "static_pressure": lambda _: self.static_pressure,
+            "humidity_level": lambda _: self.humidity_level,
+            "humidifier_on": lambda _: self.humidifier_on,
+            "outdoor_unit_operational_status": lambda _: self.outdoor_unit_operational_status,
+            "indoor_unit_operational_status": lambda _: self.indoor_unit_operational_status,
+            "zones": lambda sub: [zone.to_dict(sub) for zone in self.zones],
+        })
+
     def __repr__(self):
-        return {
-            "outdoor_temperature": self.outdoor_temperature,
-            "mode": self.mode,
-            "temperature_unit": self.temperature_unit.value,
-            "filter_used": self.filter_used,
-            "is_disconnected": self.is_disconnected,
-            "airflow_cfm": self.airflow_cfm,
-            "blower_rpm": self.blower_rpm,
-            "static_pressure": self.static_pressure,
-            "humidity_level": self.humidity_level,
-            "humidifier_on": self.humidifier_on,
-            "outdoor_unit_operational_status": self.outdoor_unit_operational_status,
-            "indoor_unit_operational_status": self.indoor_unit_operational_status,
-            "zones": [zone.__repr__() for zone in self.zones],
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -0,0 +1,219 @@
+import os
+from bisect import bisect_right
+from collections.abc import Iterator
+from datetime import datetime, UTC
+from json import dumps, loads
+from logging import getLogger
+from time import time
+from typing import Any
+
+from .api_websocket_data_updater import merge_config, merge_status
+from .system import System
+
+_LOGGER = getLogger(__name__)
+
+SNAPSHOT = "snapshot"
+
+
+class StatusLog:
+    """
+    append-only log of the deltas WebsocketDataUpdater applies, one json record per line:
+        {"t": epoch seconds, "device": serial, "type": "InfinityStatus" | "InfinityConfig", "delta": {...}}
+    with a full snapshot of every system's raw status and config every snapshot_interval seconds:
+        {"t": epoch seconds, "type": "snapshot", "systems": {serial: {"status": {...}, "config": {...}}}}
+    The byte offset of each snapshot is also appended to <path>.idx, so state_at() seeks straight
+    to the last snapshot before the time asked for, and only replays the deltas after it.
+
+    Once a day, compact_status_log() drops the deltas older than retain_deltas, keeping one
+    snapshot per old_snapshot_interval for them, so the log stays bounded.
+    """
+    def __init__(
+            self,
+            path: str,
+            snapshot_interval: float = 3600,
+            retain_deltas: float = 7 * 86400,
+            old_snapshot_interval: float = 86400,
+            compact_interval: float = 86400,
+    ):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.retain_deltas = retain_deltas
+        self.old_snapshot_interval = old_snapshot_interval
+        self.compact_interval = compact_interval
+        self.last_snapshot_at: float | None = None
+        self.last_compacted_at = time()
+        self.delta_count = 0
+        self._open()
+
+    def _open(self) -> None:
+        self.file = open(self.path, "ab")
+        self.index = open(index_path(self.path), "a", encoding="utf-8")
+
+    def append(self, serial: str, message_type: str, delta: dict[str, Any], at: float | None = None) -> None:
+        record = {"t": at or time(), "device": serial, "type": message_type, "delta": delta}
+        self.file.write(dumps(record).encode("utf-8") + b"\n")
+        self.file.flush()
+        self.delta_count += 1
+
+    def snapshot(self, systems: list[System], at: float | None = None) -> None:
+        at = at or time()
+        record = {
+            "t": at,
+            "type": SNAPSHOT,
+            "systems": {
+                system.profile.serial: {"status": system.status.raw, "config": system.config.raw} for system in systems
+            },
+        }
+        offset = self.file.tell()
+        self.file.write(dumps(record).encode("utf-8") + b"\n")
+        self.file.flush()
+        self.index.write(f"{at}\t{offset}\n")
+        self.index.flush()
+        self.last_snapshot_at = at
+
+    def maybe_snapshot(self, systems: list[System]) -> None:
+        now = time()
+        if self.last_snapshot_at is not None and now - self.last_snapshot_at < self.snapshot_interval:
+            return
+        if now - self.last_compacted_at >= self.compact_interval:
+            self.compact(now)
+        self.snapshot(systems, now)
+
+    def compact(self, now: float | None = None) -> None:
+        now = now or time()
+        self.close()
+        compact_status_log(self.path, now - self.retain_deltas, self.old_snapshot_interval)
+        self._open()
+        self.last_compacted_at = now
+
+    def close(self) -> None:
+        self.file.close()
+        self.index.close()
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def _snapshot_offsets(path: str) -> list[tuple[float, int]]:
+    """(t, byte offset) of each snapshot, from the index, or by reading the log when there isn't one"""
+    offsets = []
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as index:
+            for line in index:
+                t, offset = line.split("\t")
+                offsets.append((float(t), int(offset)))
+        return offsets
+    except FileNotFoundError:
+        pass
+    _LOGGER.warning(f"{index_path(path)} is missing, reading all of {path}")
+    offset = 0
+    with open(path, "rb") as file:
+        for line in file:
+            if b'"type": "snapshot"' in line:
+                offsets.append((loads(line)["t"], offset))
+            offset += len(line)
+    return offsets
+
+
+def apply_record(systems: dict[str, dict[str, Any]], record: dict[str, Any]) -> None:
+    """apply a logged delta to the raw {serial: {"status", "config"}} state"""
+    system = systems.get(record["device"])
+    if system is None:
+        return
+    delta = record["delta"]
+    match record["type"]:
+        case "InfinityStatus":
+            merge_status(system["status"], delta)
+            system["status"]["utcTime"] = datetime.fromtimestamp(record["t"], UTC).isoformat()
+        case "InfinityConfig":
+            merge_config(system["config"], delta)
+
+
+def state_at(path: str, at: float) -> dict[str, dict[str, Any]]:
+    """the raw status and config of each system at epoch seconds at, as {serial: {"status", "config"}}"""
+    offsets = _snapshot_offsets(path)
+    found = bisect_right([t for t, _offset in offsets], at)
+    if found == 0:
+        raise ValueError(f"{path} has no snapshot before {datetime.fromtimestamp(at)}")
+    systems = None
+    with open(path, "rb") as file:
+        file.seek(offsets[found - 1][1])
+        for line in file:
+            record = loads(line)
+            if record["t"] > at:
+                break
+            if record["type"] == SNAPSHOT:
+                systems = record["systems"]
+            elif systems is not None:
+                apply_record(systems, record)
+    return systems
+
+
+def read_status_log(path: str, since: float | None = None, until: float | None = None) -> Iterator[dict[str, Any]]:
+    """the records logged between since and until"""
+    offsets = _snapshot_offsets(path)
+    start = 0
+    if since is not None:
+        found = bisect_right([t for t, _offset in offsets], since)
+        if found > 0:
+            start = offsets[found - 1][1]
+    with open(path, "rb") as file:
+        file.seek(start)
+        for line in file:
+            record = loads(line)
+            if since is not None and record["t"] < since:
+                continue
+            if until is not None and record["t"] > until:
+                break
+            yield record
+
+
+def compact_status_log(path: str, keep_after: float, old_snapshot_interval: float = 86400) -> tuple[int, int]:
+    """
+    fold the deltas before keep_after into the snapshots: keep one snapshot per old_snapshot_interval
+    before it, and a fresh snapshot at keep_after, so the deltas kept after it still have a base.
+    Rewrites the log and its index beside them, and renames them over. returns (bytes before, bytes after)
+    """
+    tmp_path = path + ".tmp"
+    tmp_index = index_path(path) + ".tmp"
+    systems = None
+    last_kept = None
+    boundary_written = False
+    with open(path, "rb") as src, open(tmp_path, "wb") as out, open(tmp_index, "w", encoding="utf-8") as index:
+
+        def write(line: bytes, record: dict[str, Any]) -> None:
+            if record["type"] == SNAPSHOT:
+                index.write(f"{record['t']}\t{out.tell()}\n")
+            out.write(line)
+
+        def write_boundary() -> None:
+            record = {"t": keep_after, "type": SNAPSHOT, "systems": systems}
+            write(dumps(record).encode("utf-8") + b"\n", record)
+
+        for line in src:
+            record = loads(line)
+            if record["t"] < keep_after:
+                if record["type"] == SNAPSHOT:
+                    systems = record["systems"]
+                    if last_kept is None or record["t"] - last_kept >= old_snapshot_interval:
+                        write(line, record)
+                        last_kept = record["t"]
+                elif systems is not None:
+                    apply_record(systems, record)
+                continue
+            if not boundary_written:
+                boundary_written = True
+                if record["type"] != SNAPSHOT and systems is not None:
+                    write_boundary()
+            write(line, record)
+        if not boundary_written and systems is not None:
+            write_boundary()
+        out.flush()
+        os.fsync(out.fileno())
+    size_before = os.path.getsize(path)
+    os.replace(tmp_path, path)
+    os.replace(tmp_index, index_path(path))
+    size_after = os.path.getsize(path)
+    _LOGGER.debug(f"compacted {path} from {size_before} to {size_after} bytes")
+    return size_before, size_after
@@ -4,6 +4,7 @@ from .profile import Profile
 from .status import Status
 from .energy import Energy
 from .config import Config
+from .util import project
 
 
 _LOGGER = getLogger(__name__)
@@ -22,15 +23,19 @@ class System:
         self.energy = energy
         self.config = config
 
+    def to_dict(self, fields: list[str] | dict | None = None) -> dict:
+        """the __repr__ dict, building only the fields asked for (see util.project)"""
+        return project(fields, {
+            "serial": lambda _: self.profile.serial,
+            "name": lambda _: self.profile.name,
+            "profile": lambda sub: self.profile.to_dict(sub),
+            "status": lambda sub: self.status.to_dict(sub),
+            "config": lambda sub: self.config.to_dict(sub),
+            "energy": lambda sub: self.energy.to_dict(sub),
+        })
+
     def __repr__(self):
-        return {
-            "serial": self.profile.serial,
-            "name": self.profile.name,
-            "profile": self.profile.__repr__(),
-            "status": self.status.__repr__(),
-            "config": self.config.__repr__(),
-            "energy": self.energy.__repr__(),
-        }
+        return self.to_dict()
 
     def __str__(self):
         return str(self.__repr__())
@@ -0,0 +1,95 @@
+from asyncio import CancelledError, Task, create_task, shield, sleep
+from datetime import datetime, timedelta
+from logging import getLogger
+
+_LOGGER = getLogger(__name__)
+
+
+class TokenManager:
+    """
+    keeps the ApiConnectionGraphql token valid, off the query hot path:
+    - a background task renews it refresh_margin before expires_at (or at half its life, for a token
+      that lives less than twice the margin)
+    - concurrent callers that find it missing or expired all wait on the same single renewal
+    """
+    def __init__(
+            self,
+            api_connection_graphql,
+            refresh_margin: timedelta = timedelta(minutes=5),
+    ):
+        self.api_connection_graphql = api_connection_graphql
+        self.refresh_margin = refresh_margin
+        self.task_renew: Task | None = None
+        self.task_background: Task | None = None
+        self.renew_count = 0
+        # how long the last token renewed here lived, None until one is
+        self.lifetime: float | None = None
+
+    def is_valid(self) -> bool:
+        return self.api_connection_graphql.refresh_token is not None and self.api_connection_graphql.expires_at > datetime.now()
+
+    async def ensure_valid(self) -> None:
+        if not self.is_valid():
+            await self.renew()
+        if self.task_background is None:
+            self.task_background = create_task(self.loop_background(), name="carrier_api_token_refresh")
+
+    async def renew(self) -> None:
+        # single flight: whoever comes first starts the renewal, everyone else waits on it
+        if self.task_renew is None or self.task_renew.done():
+            self.task_renew = create_task(self._renew(), name="carrier_api_token_renew")
+        # shielded, so a cancelled caller doesn't cancel the renewal the others are waiting on
+        await shield(self.task_renew)
+
+    async def _renew(self) -> None:
+        self.renew_count += 1
+        if self.api_connection_graphql.refresh_token is None:
+            await self.api_connection_graphql.login()
+        else:
+            try:
+                await self.api_connection_graphql.refresh_auth_token()
+            except Exception as error:
+                _LOGGER.warning(f"token refresh failed, logging in again: {error}")
+                self.api_connection_graphql.refresh_token = None
+                await self.api_connection_graphql.login()
+        self.lifetime = (self.api_connection_graphql.expires_at - datetime.now()).total_seconds()
+
+    def margin_seconds(self) -> float:
+        margin = self.refresh_margin.total_seconds()
+        # a token that lives less than twice the margin is renewed at half its life, not continuously
+        if self.lifetime is not None:
+            margin = min(margin, self.lifetime / 2)
+        return margin
+
+    def seconds_until_refresh(self) -> float:
+        """ how long until the token is due for renewal; 0 or less when it is due now """
+        remaining = (self.api_connection_graphql.expires_at - datetime.now()).total_seconds()
+        return remaining - self.margin_seconds()
+
+    async def loop_background(self) -> None:
+        try:
+            while True:
+                wait = self.seconds_until_refresh()
+                if wait > 0:
+                    await sleep(wait)
+                    # it may have been renewed on demand while we waited
+                    if self.seconds_until_refresh() > 0:
+                        continue
+                _LOGGER.debug("refreshing token ahead of expiry")
+                try:
+                    await self.renew()
+                except CancelledError:
+                    raise
+                except Exception as error:
+                    _LOGGER.exception("background token refresh error", exc_info=error)
+                    # the next query renews on demand, and restarts this task
+                    break
+        except CancelledError:
+            pass
+        finally:
+            self.task_background = None
+
+    def cancel(self) -> None:
+        for task in [self.task_background, self.task_renew]:
+            if task is not None and not task.done():
+                task.cancel()
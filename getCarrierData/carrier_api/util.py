@@ -21,3 +21,35 @@ def safely_get_json_value(json, key, callable_to_cast=None):
             _LOGGER.exception(error)
             value = None
     return value
+
+
+def projection_tree(fields: list[str]) -> dict:
+    """["serial", "status.blower_rpm", "status.zones.temperature"] -> {"serial": None, "status": {"blower_rpm": None, "zones": {"temperature": None}}}
+    None is the whole value"""
+    tree = {}
+    for path in fields:
+        node = tree
+        *parents, last = path.split(".")
+        for key in parents:
+            if key in node and node[key] is None:
+                # the whole of it was asked for already
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[last] = None
+    return tree
+
+
+def project(fields: list[str] | dict | None, builders: dict) -> dict:
+    """
+    the to_dict of a model: builders maps each key to a function of the fields wanted below it,
+    and only the keys in fields are built, in the order of builders. fields is None for all of them,
+    a list of dotted paths (a path through a list applies to each item), or a projection_tree
+    """
+    if fields is None:
+        return {key: build(None) for key, build in builders.items()}
+    tree = fields if isinstance(fields, dict) else projection_tree(fields)
+    unknown = tree.keys() - builders.keys()
+    if unknown:
+        raise ValueError(f"unknown fields {sorted(unknown)}, expected some of {list(builders)}")
+    return {key: build(tree[key]) for key, build in builders.items() if key in tree}
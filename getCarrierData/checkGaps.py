@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+  find the holes left by missed cron runs, and the rows collected twice,
+  before they are loaded into excel.
+
+  Replaces scrolling through the sheet with NextNonZeroInColB and patching with InsertMissingRow:
+  - (from the CLI) put back the rows a deadband recording held back (see deadband.py), so they aren't taken for gaps
+  - sort the rows by (DATE, TIME)
+  - drop exact duplicates (warn about different rows with the same DATE and TIME)
+  - find the missing slots on the expected cadence (every 30 minutes for RealTime, every day for Daily)
+  - report them, and optionally insert placeholder rows (DATE and TIME only) in their place
+
+  Usage (as library):
+    rows, gaps = checkGaps(rows, cadence=RealTimeCadence, fill=True, previous=last_row_loaded)
+
+  Usage (CLI), check any number of JSON files, or .json.gz segments, in one pass; without files,
+  the archive, the monthly segments and the working file in ../ (see jsonLinesWriter.archiveFiles):
+    python3 checkGaps.py [-d] [--Daily] [--cadence MINUTES] [--report gaps.csv] [file.json ...]
+"""
+import argparse
+import datetime
+import json
+import logging
+from sys import exit
+from typing import Any, Dict, List
+
+from jsonLinesWriter import archiveFiles, readJsonLines
+
+RealTimeCadence = datetime.timedelta(minutes=30)
+DailyCadence = datetime.timedelta(days=1)
+
+def rowTimestamp(row: Dict[str, Any]) -> datetime.datetime:
+    date = datetime.date.fromisoformat(row["DATE"])
+    try:
+        time = datetime.time.fromisoformat(row["TIME"])
+    except (KeyError, ValueError):
+        # Daily rows have TIME "Daily"
+        time = datetime.time()
+    return datetime.datetime.combine(date, time)
+
+def _placeholder(previous: Dict[str, Any], when: datetime.datetime) -> Dict[str, Any]:
+    row = dict.fromkeys(previous)
+    row["DATE"] = str(when.date())
+    if previous.get("TIME") == "Daily":
+        row["TIME"] = "Daily"
+    else:
+        row["TIME"] = when.strftime('%H:%M:%S')
+    return row
+
+def checkGaps(rows, cadence: datetime.timedelta = RealTimeCadence, fill: bool = False, previous: Dict[str, Any] = None):
+    """
+    return the sorted rows without duplicates (and with placeholders for the missing rows, if fill)
+    and a list of [last row before the gap, first row after the gap, number of missing rows].
+    previous is the row before them, e.g. the last one already loaded, so a gap before the first row is found too;
+    it isn't returned. A row without a DATE (or TIME) that can be read is dropped, with a warning
+    """
+    rows = sorted(rows, key=lambda row: (str(row.get("DATE") or ""), str(row.get("TIME") or "")))
+    checked: List[Dict[str, Any]] = []
+    gaps = []
+    duplicates = 0
+    previous_time = None
+    seen = set()
+    if previous is not None:
+        try:
+            previous_time = rowTimestamp(previous)
+            seen = {json.dumps(previous, sort_keys=True)}
+        except (KeyError, TypeError, ValueError):
+            previous = None
+    for row in rows:
+        try:
+            when = rowTimestamp(row)
+        except (KeyError, TypeError, ValueError):
+            logging.warning("dropped a row without a DATE and TIME: %s" % json.dumps(row)[:200])
+            continue
+        if previous is not None and row.get("DATE") == previous.get("DATE") and row.get("TIME") == previous.get("TIME"):
+            key = json.dumps(row, sort_keys=True)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            logging.warning("different rows for %s %s" % (row.get("DATE"), row.get("TIME")))
+        else:
+            seen = {json.dumps(row, sort_keys=True)}
+
+        if previous_time is not None:
+            # the cron job runs at about the same minute each time, so allow some drift
+            missing = round((when - previous_time) / cadence) - 1
+            if missing > 0:
+                gaps.append([previous, row, missing])
+                logging.info("%d missing between %s %s and %s %s" % (missing,
+                    previous.get("DATE"), previous.get("TIME"), row.get("DATE"), row.get("TIME")))
+                if fill:
+                    for n in range(1, missing + 1):
+                        checked.append(_placeholder(previous, previous_time + n * cadence))
+        checked.append(row)
+        previous = row
+        previous_time = when
+
+    logging.info("%d rows, %d duplicates dropped, %d gaps, %d missing rows" % (
+        len(checked), duplicates, len(gaps), sum(gap[2] for gap in gaps)))
+    return checked, gaps
+
+def newerRows(rows):
+    """
+    the rows after the last one passed on, without sorting; where the files read one after the other
+    overlap (e.g. the archive and a segment), the rows at or before a row already seen are dropped
+    """
+    last = None
+    skipped = 0
+    for row in rows:
+        key = (row.get("DATE") or "", row.get("TIME") or "")
+        if last is not None and key <= last:
+            skipped += 1
+            continue
+        last = key
+        yield row
+    if skipped:
+        logging.info("skipped %d rows at or before a row already seen" % skipped)
+
+def writeGapReport(gaps: List, reportFile: str):
+    with open(reportFile, 'w') as f:
+        f.write("after_date,after_time,before_date,before_time,missing\n")
+        for previous, row, missing in gaps:
+            f.write("%s,%s,%s,%s,%d\n" % (previous.get("DATE"), previous.get("TIME"), row.get("DATE"), row.get("TIME"), missing))
+    logging.info("wrote %d gaps to %s" % (len(gaps), reportFile))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find missing and duplicate rows in the collected JSON"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-D", "--Daily", action="store_true", help="the files are Daily data (one row per day)" )
+    parser.add_argument( "-c", "--cadence", type=int, help="minutes between rows (default 30, or a day with --Daily)" )
+    parser.add_argument( "-r", "--report", help="write the gaps to this CSV file" )
+    parser.add_argument( "-f", "--fill", help="write the sorted rows, with placeholders for the gaps, to this JSON file" )
+    parser.add_argument( 'file', nargs='*', help="JSON file(s) to check (default: all of ../Carrier[RealTime|Daily]Data.json)" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.cadence:
+        cadence = datetime.timedelta(minutes=args.cadence)
+    elif args.Daily:
+        cadence = DailyCadence
+    else:
+        cadence = RealTimeCadence
+
+    files = args.file or archiveFiles("../Carrier%sData.json" % ("Daily" if args.Daily else "RealTime"))
+    logging.debug ("checking %s" % files)
+    # deadband imports this module, so only now
+    from deadband import reconstructRows
+    rows = reconstructRows(readJsonLines(files))
+
+    checked, gaps = checkGaps(rows, cadence, fill=bool(args.fill))
+    if args.report:
+        writeGapReport(gaps, args.report)
+    if args.fill:
+        with open(args.fill, 'w') as f:
+            for row in checked:
+                f.write(json.dumps(row) + '\n')
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+  check the startup cost of the cron entry point hasn't regressed.
+
+  Runs "python3 -X importtime -c 'import carrierDataCron'" in a fresh interpreter,
+  adds up the cumulative time of the top level imports, and fails (exit 1) when
+  - the total is over the budget, or
+  - a module that a sampling run never needs was imported (see NotOnStartup)
+
+  Usage:
+    python3 checkImportTime.py [-d] [--budget MS] [--module carrierDataCron]
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+from sys import exit
+from typing import Dict, List
+
+# milliseconds, for the Mac Mini that runs the cron jobs
+BudgetMS = 400
+
+# only needed on paths a sampling run doesn't take
+NotOnStartup = [
+    "sqlite3",
+    "requests",
+    "deepmerge",
+    "dateutil",
+    "carrier_api.api_websocket",
+    "carrier_api.api_websocket_data_updater",
+    "carrier_api.api_websocket_recorder",
+    "carrier_api.status_log",
+]
+
+def importTimes(module: str) -> Dict[str, int]:
+    """ return the cumulative microseconds of each module imported, from -X importtime """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error("import %s failed:\n%s" % (module, result.stderr[-2000:]))
+        exit(2)
+    times = {}
+    top_level = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _self_us, cumulative, package = line[len("import time:"):].split("|")
+        name = package.strip()
+        times[name] = int(cumulative)
+        # nested imports are indented under the module that imported them
+        if package[1:2] != " ":
+            top_level += int(cumulative)
+    times["<total>"] = top_level
+    return times
+
+def checkImportTime(module: str, budget_ms: float, not_on_startup: List[str]) -> bool:
+    times = importTimes(module)
+    total_ms = times["<total>"] / 1000
+    ok = True
+    for name in not_on_startup:
+        if name in times:
+            logging.error("%s imported %s (%.1f ms), which it doesn't need at startup" % (module, name, times[name] / 1000))
+            ok = False
+    slowest = sorted((t, n) for n, t in times.items() if n != "<total>")[-10:]
+    for t, name in reversed(slowest):
+        logging.debug("%8.1f ms %s" % (t / 1000, name))
+    if total_ms > budget_ms:
+        logging.error("import %s took %.1f ms, over the %.1f ms budget" % (module, total_ms, budget_ms))
+        ok = False
+    else:
+        logging.info("import %s took %.1f ms, within the %.1f ms budget" % (module, total_ms, budget_ms))
+    return ok
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fail when the import time of the cron entry point is over budget"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-b", "--budget", type=float, default=BudgetMS, help="milliseconds (default %d)" % BudgetMS )
+    parser.add_argument( "-m", "--module", default="carrierDataCron", help="module to import (default carrierDataCron)" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    exit(0 if checkImportTime(args.module, args.budget, NotOnStartup) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+  deadband (change-only) recording of the realtime rows, and the reader that rebuilds the regular grid.
+
+  Most realtime rows repeat the one before. With carrierDataCron.py -R --deadband, a row is only written when
+  - a field moved by more than its "deadband" in fieldMaps.json, compared to the last row written
+    (fields without one are written on any change, e.g. hp_profile, fan, outdoor_status)
+  - a field appeared or disappeared
+  - or deadband_heartbeat_minutes passed since the last row written
+  and it says how many collections were held back before it, in HELD, and when, in HELD_AGO (the
+  seconds before it of each one, oldest first). The last row written, and the held times, are kept
+  in DeadbandStateFile.
+
+  reconstructRows puts the held rows back, as copies of the row written before them, at the times they
+  were collected, so the loaders see every collection, and checkGaps still sees the missed cron runs.
+  (Rows written before HELD_AGO are spaced evenly between the two rows.) When the rows are loaded a
+  batch at a time, pass it the last row of the batch before, or the held rows before the first row of
+  the batch can't be rebuilt. Rows held after the last row written show up once the next one is (at
+  most a heartbeat later).
+
+  Usage (as library):
+    row = filterRow(collected_data)     # None when it's held back
+    rows = reconstructRows(rows, previous=last_row_loaded)
+
+  Usage (CLI):
+    simulate it on a file collected without it, and report how many rows it would keep
+      python3 deadband.py [-d] --simulate [-o kept.json] ../OldCarrierRealTimeData.json
+    write the rebuilt grid of a deadband recorded file
+      python3 deadband.py [-d] --reconstruct ../CarrierRealTimeData.json > grid.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import time
+from sys import exit, stdout
+from typing import Any, Dict, Iterable, Iterator, List
+
+from checkGaps import rowTimestamp
+from fieldMap import loadFieldMaps, toNumber
+from jsonLinesWriter import readJsonLines
+
+DeadbandStateFile = "../deadband.state"
+HeldField = "HELD"
+HeldAgoField = "HELD_AGO"
+# never compared, they change every row
+TimeFields = ["DATE", "TIME", HeldField, HeldAgoField]
+
+def loadDeadbands(maps: Dict[str, Any]) -> Dict[str, float]:
+    """ the "deadband" of each realtime field in the carrier and arduino maps, by output name """
+    entries = maps["status"] + maps["zone"] + [field for sensor in maps["arduino"] for field in sensor["fields"]]
+    return {entry["to"]: float(entry["deadband"]) for entry in entries if "deadband" in entry}
+
+class Deadband:
+    def __init__ (self, maps: Dict[str, Any] = None):
+        maps = maps if maps is not None else loadFieldMaps()
+        self.deadbands = loadDeadbands(maps)
+        self.heartbeat = maps.get("deadband_heartbeat_minutes", 360) * 60
+
+    def changedFields (self, previous: Dict[str, Any], row: Dict[str, Any], prefix: str = "") -> List[str]:
+        """ the fields of row that moved past their deadband since previous, nested "systems" included """
+        changed = []
+        for field in previous.keys() | row.keys():
+            if field in TimeFields:
+                continue
+            old = previous.get(field)
+            new = row.get(field)
+            if isinstance(old, dict) and isinstance(new, dict):
+                # "systems" by serial, and "zones" by id, are compared by their field names
+                changed += self.changedFields(old, new, prefix + field + "/")
+                continue
+            if field not in previous or field not in row:
+                changed.append(prefix + field)
+                continue
+            old_number = toNumber(old)
+            new_number = toNumber(new)
+            if old_number is not None and new_number is not None:
+                if abs(new_number - old_number) > self.deadbands.get(field, 0.0):
+                    changed.append(prefix + field)
+            elif old != new:
+                changed.append(prefix + field)
+        return changed
+
+    def filter (self, row: Dict[str, Any], state: Dict[str, Any], now: float) -> Dict[str, Any] | None:
+        """ the row to write, with HELD, or None to hold it back. updates state """
+        previous = state.get("row")
+        if previous is not None and now - state["recorded_at"] < self.heartbeat:
+            changed = self.changedFields(previous, row)
+            if not changed:
+                state["held"] = state.get("held", 0) + 1
+                state.setdefault("held_at", []).append(now)
+                return None
+            logging.debug("deadband: %s changed" % changed)
+        row = dict(row)
+        row[HeldField] = state.get("held", 0)
+        held_at = state.get("held_at", [])
+        if row[HeldField] and len(held_at) == row[HeldField]:
+            row[HeldAgoField] = [round(now - when) for when in held_at]
+        state["row"] = row
+        state["recorded_at"] = now
+        state["held"] = 0
+        state["held_at"] = []
+        return row
+
+def filterRow(row: Dict[str, Any], stateFile: str = DeadbandStateFile, deadband: Deadband = None) -> Dict[str, Any] | None:
+    """ filter one collected row through the deadband, keeping the state in stateFile """
+    try:
+        with open(stateFile, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    row = (deadband or Deadband()).filter(row, state, time.time())
+    with open(stateFile, 'w') as f:
+        json.dump(state, f)
+    if row is None:
+        logging.info("deadband: nothing moved, held back %d row(s) so far" % state["held"])
+    return row
+
+def _heldRow(previous: Dict[str, Any], when: datetime.datetime) -> Dict[str, Any]:
+    filled = dict(previous)
+    filled["DATE"] = str(when.date())
+    filled["TIME"] = when.strftime('%H:%M:%S')
+    return filled
+
+def reconstructRows(rows: Iterable[Dict[str, Any]], previous: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+    """
+    put back the rows held back before each row with a HELD count; rows without one pass through.
+    previous is the row before the first of rows, e.g. the last row of the batch loaded before
+    """
+    if previous is not None:
+        previous = {k: v for k, v in previous.items() if k not in (HeldField, HeldAgoField)}
+    for row in rows:
+        held = row.get(HeldField)
+        if held is None:
+            yield row
+            previous = row
+            continue
+        held_ago = row.get(HeldAgoField)
+        row = {k: v for k, v in row.items() if k not in (HeldField, HeldAgoField)}
+        if held and previous is not None:
+            if held_ago:
+                end = rowTimestamp(row)
+                times = [end - datetime.timedelta(seconds=seconds) for seconds in held_ago]
+            else:
+                # written before HELD_AGO, so the times are a guess
+                start = rowTimestamp(previous)
+                step = (rowTimestamp(row) - start) / (held + 1)
+                times = [start + step * n for n in range(1, held + 1)]
+            for when in times:
+                yield _heldRow(previous, when)
+        elif held:
+            logging.warning("%s %s: %d held rows before the first row, can't be rebuilt without the row before it" % (
+                row.get("DATE"), row.get("TIME"), held))
+        yield row
+        previous = row
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate deadband recording on a file, or rebuild the grid of a deadband recorded file"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-s", "--simulate", action="store_true", help="report how many rows the deadband would keep" )
+    parser.add_argument( "-r", "--reconstruct", action="store_true", help="write the rebuilt grid to stdout" )
+    parser.add_argument( "-o", "--output", help="with --simulate, write the rows it keeps to this file" )
+    parser.add_argument( 'file', help="realtime JSON file" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.simulate == args.reconstruct:
+        logging.error ("You must specify either --simulate or --reconstruct")
+        exit(1)
+
+    if args.reconstruct:
+        for row in reconstructRows(readJsonLines([args.file])):
+            stdout.write(json.dumps(row) + "\n")
+        exit(0)
+
+    deadband = Deadband()
+    state = {}
+    total = kept = kept_bytes = total_bytes = 0
+    out = open(args.output, 'w') if args.output else None
+    for row in readJsonLines([args.file]):
+        total += 1
+        total_bytes += len(json.dumps(row)) + 1
+        recorded = deadband.filter(row, state, rowTimestamp(row).timestamp())
+        if recorded is not None:
+            kept += 1
+            line = json.dumps(recorded) + "\n"
+            kept_bytes += len(line)
+            if out is not None:
+                out.write(line)
+    if out is not None:
+        out.close()
+    print("kept %d of %d rows (%.1f%%), %d of %d bytes (%.1f%%)" % (
+        kept, total, 100 * kept / total if total else 0, kept_bytes, total_bytes, 100 * kept_bytes / total_bytes if total_bytes else 0))
+    exit(0)
+
+if __name__ == "__main__":
+    main()
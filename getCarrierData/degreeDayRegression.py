@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+  the heating and cooling load model: each day's heat_kWh, furnace_gal (heating) and cool_btu (cooling)
+  regressed on the heating or cooling degree days of its outdoor temperature, y = intercept + slope * dd.
+
+  The degree days depend on the balance point, the outdoor temperature below which the house needs heat
+  (or above which it needs cooling), so the regression is kept for every candidate balance point in
+  BalancePoints. For each target and candidate, only the sufficient statistics are kept:
+      n, sum(dd), sum(y), sum(dd*dd), sum(dd*y), sum(y*y)
+  in StateFile, so adding a day, and reading the coefficients and the balance point (the candidate that
+  fits best), both cost the same whatever the history. carrierDataCron.py -D --stats adds each Daily row.
+
+  The outdoor temperature of a day is the mean of its RealTime out_temp readings, from runningStats.py,
+  or the LGR sensor's LOtempAvg without them (as in energyAnalytics.py).
+  With more than one system, their energy is added up.
+
+  Usage (as library):
+    updateRegression(daily_row)
+
+  Usage (CLI):
+    the model, per target
+      python3 degreeDayRegression.py [-d]
+    build the state from Daily files, or the sqlite database, replacing it
+      python3 degreeDayRegression.py [-d] --rebuild -D ../OldCarrierDailyData.json ../CarrierDailyData.json [-R realtime files]
+    refit everything from scratch with NumPy, and compare it to the state (needs numpy)
+      python3 degreeDayRegression.py [-d] --refit -D ../CarrierDailyData.json [-R realtime files]
+"""
+import argparse
+import json
+import logging
+import os
+from sys import exit, stdout
+from typing import Any, Dict, Iterable, List
+
+from fieldMap import toNumber
+
+StateFile = "../degreeDayRegression.state"
+StateVersion = 1
+# degrees F
+BalancePoints = list(range(45, 76))
+HeatingTargets = ["heat_kWh", "furnace_gal"]
+CoolingTargets = ["cool_btu"]
+# fewer days than this, or degree days that hardly vary, and there's no fit
+MinDays = 5
+
+def degreeDays(target: str, outdoor: float, balance: float) -> float:
+    if target in CoolingTargets:
+        return max(0.0, outdoor - balance)
+    return max(0.0, balance - outdoor)
+
+def targetValue(row: Dict[str, Any], target: str) -> float | None:
+    """ the target of the row, added up over the systems when there is more than one """
+    systems = row.get("systems")
+    sources = list(systems.values()) if isinstance(systems, dict) else [row]
+    values = [toNumber(source.get(target)) for source in sources]
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+def dailyOutdoor(row: Dict[str, Any], stats: Dict[str, Any] | None) -> float | None:
+    """ the mean RealTime out_temp of the row's DATE, from the runningStats state, or LOtempAvg """
+    if stats is not None:
+        acc = stats["day"].get(row.get("DATE"), {}).get("out_temp")
+        if acc and acc["n"]:
+            return acc["mean"]
+    return toNumber(row.get("LOtempAvg"))
+
+##### the sufficient statistics
+def newSums() -> Dict[str, float]:
+    return { "n": 0, "sx": 0.0, "sy": 0.0, "sxx": 0.0, "sxy": 0.0, "syy": 0.0 }
+
+def addPoint(sums: Dict[str, float], x: float, y: float):
+    sums["n"] += 1
+    sums["sx"] += x
+    sums["sy"] += y
+    sums["sxx"] += x * x
+    sums["sxy"] += x * y
+    sums["syy"] += y * y
+
+def fit(sums: Dict[str, float]) -> Dict[str, Any] | None:
+    """ intercept, slope, r2 and the residual sum of squares, from the sums alone; None when it can't be fit """
+    n = sums["n"]
+    if n < MinDays:
+        return None
+    sxx = sums["sxx"] - sums["sx"] * sums["sx"] / n
+    syy = sums["syy"] - sums["sy"] * sums["sy"] / n
+    # e.g. furnace_gal without a furnace
+    if sxx <= 1e-9 * max(1.0, sums["sxx"]) or syy <= 1e-9 * max(1.0, sums["syy"]):
+        return None
+    sxy = sums["sxy"] - sums["sx"] * sums["sy"] / n
+    slope = sxy / sxx
+    intercept = (sums["sy"] - slope * sums["sx"]) / n
+    sse = max(0.0, syy - slope * sxy)
+    return { "n": n, "intercept": intercept, "slope": slope, "sse": sse, "r2": 1 - sse / syy }
+
+##### the state
+def newState() -> Dict[str, Any]:
+    return { "version": StateVersion, "last_date": "",
+             "targets": {target: {str(b): newSums() for b in BalancePoints} for target in HeatingTargets + CoolingTargets} }
+
+def loadState(stateFile: str = StateFile) -> Dict[str, Any]:
+    try:
+        with open(stateFile, 'r') as f:
+            state = json.load(f)
+        if state.get("version") == StateVersion:
+            return state
+        logging.info("%s is from an older version, starting over" % stateFile)
+    except (OSError, ValueError):
+        pass
+    return newState()
+
+def saveState(state: Dict[str, Any], stateFile: str = StateFile):
+    with open(stateFile + ".tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(stateFile + ".tmp", stateFile)
+
+def addDay(state: Dict[str, Any], row: Dict[str, Any], stats: Dict[str, Any] | None) -> bool:
+    """ add a Daily row to the sums of every target and balance point; a DATE already added is skipped """
+    date = row.get("DATE")
+    if date is None or date <= state["last_date"]:
+        return False
+    outdoor = dailyOutdoor(row, stats)
+    if outdoor is None:
+        logging.info("%s: no outdoor temperature, not added to the regression" % date)
+        return False
+    for target, candidates in state["targets"].items():
+        y = targetValue(row, target)
+        if y is None:
+            continue
+        for balance, sums in candidates.items():
+            addPoint(sums, degreeDays(target, outdoor, float(balance)), y)
+    state["last_date"] = date
+    return True
+
+def model(state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """ for each target, the fit at its balance point, the candidate with the least residual """
+    result = {}
+    for target, candidates in state["targets"].items():
+        fits = [(float(balance), fit(sums)) for balance, sums in candidates.items()]
+        fits = [(balance, f) for balance, f in fits if f is not None]
+        if fits:
+            balance, best = min(fits, key=lambda pair: pair[1]["sse"])
+            result[target] = { "balance_point": balance, **best }
+    return result
+
+def updateRegression(row: Dict[str, Any], stateFile: str = StateFile):
+    """ add one collected Daily row to StateFile """
+    from runningStats import StatsFile, loadStats
+    state = loadState(stateFile)
+    stats = loadStats(StatsFile) if os.path.exists(StatsFile) else None
+    if addDay(state, row, stats):
+        saveState(state, stateFile)
+        for target, m in model(state).items():
+            logging.debug("%s = %.3f + %.4f * dd(%g), r2 %.3f" % (target, m["intercept"], m["slope"], m["balance_point"], m["r2"]))
+
+##### the full refit
+def outdoorFromRealtime(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """ a runningStats-like {"day": {DATE: {"out_temp": {n, mean}}}} from RealTime rows """
+    from runningStats import addRow, newState as newStats
+    stats = newStats()
+    for row in rows:
+        if toNumber(row.get("out_temp")) is not None:
+            addRow(stats, { "DATE": row.get("DATE"), "out_temp": row["out_temp"] })
+    return stats
+
+def refit(rows: List[Dict[str, Any]], stats: Dict[str, Any] | None) -> Dict[str, Dict[str, Any]]:
+    """ the model fit from scratch, all the balance points at once with NumPy least squares """
+    import numpy as np
+    rows = sorted({row["DATE"]: row for row in rows if row.get("DATE")}.values(), key=lambda row: row["DATE"])
+    outdoor = np.array([dailyOutdoor(row, stats) for row in rows], dtype=float)
+    balances = np.array(BalancePoints, dtype=float)
+    result = {}
+    for target in HeatingTargets + CoolingTargets:
+        y = np.array([targetValue(row, target) for row in rows], dtype=float)
+        keep = ~np.isnan(y) & ~np.isnan(outdoor)
+        if keep.sum() < MinDays:
+            continue
+        y_kept = y[keep]
+        syy = float(((y_kept - y_kept.mean()) ** 2).sum())
+        if syy == 0:
+            continue
+        # one column of degree days per balance point
+        if target in CoolingTargets:
+            dd = np.maximum(0.0, outdoor[keep, None] - balances[None, :])
+        else:
+            dd = np.maximum(0.0, balances[None, :] - outdoor[keep, None])
+        best = None
+        for column, balance in enumerate(balances):
+            x = dd[:, column]
+            if np.ptp(x) == 0:
+                continue
+            design = np.column_stack((np.ones_like(x), x))
+            (intercept, slope), residual, _rank, _sv = np.linalg.lstsq(design, y_kept, rcond=None)
+            sse = float(residual[0]) if len(residual) else float(((design @ (intercept, slope) - y_kept) ** 2).sum())
+            if best is None or sse < best["sse"]:
+                syy = float(((y_kept - y_kept.mean()) ** 2).sum())
+                best = { "balance_point": float(balance), "n": int(keep.sum()), "intercept": float(intercept),
+                         "slope": float(slope), "sse": sse, "r2": 1 - sse / syy }
+        if best is not None:
+            result[target] = best
+    return result
+
+def writeModel(result: Dict[str, Dict[str, Any]], label: str):
+    for target, m in result.items():
+        stdout.write("%s\t%-12s balance %4.1fF  %s = %.4f + %.5f * dd   r2 %.3f  (%d days)\n" % (
+            label, target, m["balance_point"], target, m["intercept"], m["slope"], m["r2"], m["n"]))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Heating and cooling energy regressed on degree days, with the balance point"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "--rebuild", action="store_true", help="replace the state with the Daily rows given" )
+    parser.add_argument( "--refit", action="store_true", help="fit the Daily rows given from scratch, and compare with the state" )
+    parser.add_argument( "-D", "--daily", nargs='*', default=[], help="Daily JSON files" )
+    parser.add_argument( "-R", "--realtime", nargs='*', default=[], help="RealTime JSON files, for the outdoor temperature" )
+    parser.add_argument( "-s", "--sqlite", nargs="?", const=True, default=None,
+        help="read the Daily and RealTime rows from the sqlite database instead (default ../CarrierData.sqlite)" )
+    parser.add_argument( "--state", default=StateFile, help="state file (default %s)" % StateFile )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if not (args.rebuild or args.refit):
+        writeModel(model(loadState(args.state)), "state")
+        exit(0)
+
+    if args.sqlite:
+        from carrierDataSQLite import DBFile, openDB, readRows
+        db = openDB(DBFile if args.sqlite is True else args.sqlite)
+        daily = list(readRows(db, "Daily"))
+        stats = outdoorFromRealtime(readRows(db, "RealTime"))
+        db.close()
+    elif args.daily:
+        from jsonLinesWriter import readJsonLines
+        daily = list(readJsonLines(args.daily))
+        stats = outdoorFromRealtime(readJsonLines(args.realtime)) if args.realtime else None
+    else:
+        logging.error ("You must specify --sqlite, or --daily files")
+        exit(1)
+
+    if args.rebuild:
+        state = newState()
+        added = sum(addDay(state, row, stats) for row in sorted(daily, key=lambda row: row.get("DATE") or ""))
+        saveState(state, args.state)
+        logging.info("added %d days to %s" % (added, args.state))
+        writeModel(model(state), "state")
+    else:
+        writeModel(model(loadState(args.state)), "state")
+        writeModel(refit(daily, stats), "refit")
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+  how the variable capacity heat pump actually runs, from the realtime history:
+    duty_by_hour.csv            the fraction of the samples the outdoor unit was running, by hour of the day
+    duty_by_month.csv           the same by month
+    rpm_by_conditioning.csv     blower_rpm histogram for each conditioning state (idle, active_heat, ...)
+    cfm_by_conditioning.csv     airflow_cfm histogram for each conditioning state
+    cycles_by_month.csv         the number of running cycles, and of short ones, by month
+  A cycle is a run of consecutive samples with the outdoor unit running (outdoor_status not in --off);
+  it's short when it lasted --short minutes or less. A hole in the samples (a missed cron run) ends a cycle.
+  With more than one system (rows with "systems", see getCarrierData.selectAllRealTimeData), each system
+  is analyzed on its own, from its own outdoor_status, blower_rpm and airflow_cfm, and the conditioning
+  of its first zone, and its tables are in a subdirectory named by its serial. The rows from before
+  there was more than one system are the tables in the directory itself.
+
+  The samples are only every 30 minutes (RealTimeCadence), so a cycle's length is only known to the
+  cadence, a single sample counts as one cadence, and cycles that start and stop between two samples
+  aren't seen at all. Real short cycling (runs of a few minutes) can't be seen at this cadence; the
+  short count is only the cycles seen in a few samples, so --short has to be more than the cadence
+  (the default, 60, is cycles seen in one or two samples).
+
+  The rows are read once into NumPy arrays, and every table is a few vectorized passes over them,
+  so years of history take seconds. Needs numpy (pip3 install numpy).
+
+  Usage:
+    python3 dutyCycle.py [-d] [-o DIR] [--short 60] [--off off,idle] ../OldCarrierRealTimeData.json ../CarrierRealTimeData.json
+    python3 dutyCycle.py [-d] [-o DIR] -s [../CarrierData.sqlite] [--since 2025-01-01] [--until 2025-12-31]
+"""
+import argparse
+import csv
+import logging
+import os
+from sys import exit
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from checkGaps import RealTimeCadence
+from deadband import reconstructRows
+from fieldMap import flattenSystems, toNumber
+from jsonLinesWriter import readJsonLines
+
+OutputDir = "../dutyCycle"
+RpmBin = 100
+CfmBin = 100
+# two samples; every cycle lasts at least one
+ShortMinutes = 60
+
+def systemSamples(row: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    the serial, and the fields, of each system of the row. A row from more than one system or zone
+    (see fieldMap.flattenSystems) has each system's fields as field@serial, and the zone fields as
+    field@serial/zone, of which the first zone's conditioning is the system's; its plain fields are
+    only the first system's first zone, so they aren't used. Any other row is the one system, serial ""
+    """
+    if not isinstance(row.get("systems"), dict):
+        yield "", row
+        return
+    flat = flattenSystems(row)
+    for serial, system in row["systems"].items():
+        zones = list(system.get("zones") or {})
+        yield serial, {
+            "blower_rpm": flat.get("blower_rpm@%s" % serial),
+            "airflow_cfm": flat.get("airflow_cfm@%s" % serial),
+            "outdoor_status": flat.get("outdoor_status@%s" % serial),
+            "conditioning": flat.get("conditioning@%s/%s" % (serial, zones[0])) if zones else None,
+        }
+
+def loadColumns(rows: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, np.ndarray]]:
+    """ by system serial, the columns the analysis needs, sorted by time, one sample per timestamp """
+    samples = {}
+    for row in rows:
+        time = row.get("TIME")
+        if row.get("DATE") is None or time is None or time == "Daily":
+            continue
+        stamp = "%sT%s" % (row["DATE"], time)
+        for serial, fields in systemSamples(row):
+            stamps, rpm, cfm, outdoor, conditioning = samples.setdefault(serial, ([], [], [], [], []))
+            stamps.append(stamp)
+            # None is NaN in the float arrays
+            rpm.append(toNumber(fields.get("blower_rpm")))
+            cfm.append(toNumber(fields.get("airflow_cfm")))
+            outdoor.append(str(fields.get("outdoor_status") or ""))
+            conditioning.append(str(fields.get("conditioning") or ""))
+    columns = {}
+    for serial, (stamps, rpm, cfm, outdoor, conditioning) in samples.items():
+        ts = np.array(stamps, dtype="datetime64[s]")
+        # sorted, and the rows collected twice dropped
+        ts, first = np.unique(ts, return_index=True)
+        columns[serial] = {
+            "ts": ts,
+            "rpm": np.array(rpm, dtype=float)[first],
+            "cfm": np.array(cfm, dtype=float)[first],
+            "outdoor": np.array(outdoor, dtype=str)[first],
+            "conditioning": np.array(conditioning, dtype=str)[first],
+        }
+    return columns
+
+def dutyByHour(ts: np.ndarray, running: np.ndarray) -> List[List]:
+    hour = (ts.astype("datetime64[h]") - ts.astype("datetime64[D]")).astype(int)
+    samples = np.bincount(hour, minlength=24)
+    on = np.bincount(hour, weights=running, minlength=24)
+    duty = np.divide(on, samples, out=np.zeros(24), where=samples > 0)
+    return [[h, int(samples[h]), int(on[h]), round(float(duty[h]), 4)] for h in range(24)]
+
+def dutyByMonth(ts: np.ndarray, running: np.ndarray) -> List[List]:
+    months, index = np.unique(ts.astype("datetime64[M]"), return_inverse=True)
+    samples = np.bincount(index, minlength=len(months))
+    on = np.bincount(index, weights=running, minlength=len(months))
+    return [[str(m), int(s), int(o), round(float(o / s), 4)] for m, s, o in zip(months, samples, on)]
+
+def histogramByState(values: np.ndarray, states: np.ndarray, bin_width: float) -> List[List]:
+    """ rows of [state, count in bin 0, bin 1, ...], and a header of the bin lower edges """
+    keep = ~np.isnan(values)
+    values = values[keep]
+    names, state_index = np.unique(states[keep], return_inverse=True)
+    if len(values) == 0:
+        return [["conditioning"]]
+    bins = (np.maximum(values, 0) // bin_width).astype(int)
+    bin_count = int(bins.max()) + 1
+    counts = np.bincount(state_index * bin_count + bins, minlength=len(names) * bin_count).reshape(len(names), bin_count)
+    table = [["conditioning"] + [int(b * bin_width) for b in range(bin_count)]]
+    for name, row in zip(names, counts):
+        table.append([name or "(none)"] + row.tolist())
+    return table
+
+def cycles(ts: np.ndarray, running: np.ndarray, cadence_s: float):
+    """ the start index, and the seconds, of each running cycle """
+    on = running.astype(bool)
+    # a hole in the samples ends the cycle before it, and starts a new one after it
+    hole = np.diff(ts).astype("timedelta64[s]").astype(float) > cadence_s * 1.5
+    previous_on = np.concatenate(([False], on[:-1] & ~hole))
+    next_on = np.concatenate((on[1:] & ~hole, [False]))
+    starts = np.flatnonzero(on & ~previous_on)
+    ends = np.flatnonzero(on & ~next_on)
+    # a sample stands for the cadence after it
+    seconds = (ts[ends] - ts[starts]).astype("timedelta64[s]").astype(float) + cadence_s
+    return starts, seconds
+
+def cyclesByMonth(ts: np.ndarray, starts: np.ndarray, seconds: np.ndarray, short_s: float) -> List[List]:
+    months, index = np.unique(ts[starts].astype("datetime64[M]"), return_inverse=True)
+    count = np.bincount(index, minlength=len(months))
+    short = np.bincount(index, weights=seconds <= short_s, minlength=len(months))
+    minutes = np.bincount(index, weights=seconds, minlength=len(months)) / 60
+    return [[str(m), int(c), int(s), round(float(t / c), 1)] for m, c, s, t in zip(months, count, short, minutes)]
+
+def writeTable(outputDir: str, name: str, header: List | None, rows: List[List]):
+    with open(os.path.join(outputDir, name), 'w', newline='') as f:
+        writer = csv.writer(f)
+        if header is not None:
+            writer.writerow(header)
+        writer.writerows(rows)
+    logging.debug("wrote %s" % name)
+
+def analyze(columns: Dict[str, np.ndarray], off: List[str], cadence_s: float, short_minutes: float, outputDir: str, serial: str):
+    """ write the tables of one system """
+    ts = columns["ts"]
+    running = ~np.isin(np.char.lower(columns["outdoor"]), off)
+    os.makedirs(outputDir, exist_ok=True)
+
+    writeTable(outputDir, "duty_by_hour.csv", ["hour", "samples", "running", "duty"], dutyByHour(ts, running))
+    writeTable(outputDir, "duty_by_month.csv", ["month", "samples", "running", "duty"], dutyByMonth(ts, running))
+    writeTable(outputDir, "rpm_by_conditioning.csv", None, histogramByState(columns["rpm"], columns["conditioning"], RpmBin))
+    writeTable(outputDir, "cfm_by_conditioning.csv", None, histogramByState(columns["cfm"], columns["conditioning"], CfmBin))
+    starts, seconds = cycles(ts, running, cadence_s)
+    writeTable(outputDir, "cycles_by_month.csv", ["month", "cycles", "short", "mean_minutes"],
+        cyclesByMonth(ts, starts, seconds, short_minutes * 60))
+
+    logging.info("%s%d samples from %s to %s: running %.1f%% of the time, %d cycles, %d of them %d minutes or less. tables in %s" % (
+        "system %s: " % serial if serial else "", len(ts), ts[0], ts[-1], 100 * running.mean(), len(starts),
+        int((seconds <= short_minutes * 60).sum()), short_minutes, outputDir))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Duty cycle, blower distributions and short cycling from the realtime history"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-o", "--output", default=OutputDir, help="directory for the CSV tables (default %s)" % OutputDir )
+    parser.add_argument( "-s", "--sqlite", nargs="?", const=True, default=None,
+        help="read the RealTime table of the sqlite database (default ../CarrierData.sqlite)" )
+    parser.add_argument( "--since", help="with --sqlite, first DATE (yyyy-mm-dd)" )
+    parser.add_argument( "--until", help="with --sqlite, last DATE (yyyy-mm-dd)" )
+    parser.add_argument( "--short", type=float, default=ShortMinutes,
+        help="a cycle of this many minutes or less is short, more than the 30 minute cadence (default %d)" % ShortMinutes )
+    parser.add_argument( "--off", default="off,idle,", help="outdoor_status values that mean not running (default off,idle and empty)" )
+    parser.add_argument( 'files', nargs='*', help="RealTime JSON files" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    cadence_s = RealTimeCadence.total_seconds()
+    if args.short * 60 <= cadence_s:
+        logging.error ("--short must be more than the %d minutes between samples, every cycle lasts at least that" % (cadence_s / 60))
+        exit(1)
+
+    if args.sqlite:
+        from carrierDataSQLite import DBFile, openDB, previousRow, readRows
+        db = openDB(DBFile if args.sqlite is True else args.sqlite)
+        previous = previousRow(db, "RealTime", args.since) if args.since else None
+        columns = loadColumns(reconstructRows(readRows(db, "RealTime", args.since, args.until), previous))
+        db.close()
+    elif args.files:
+        columns = loadColumns(reconstructRows(readJsonLines(args.files)))
+    else:
+        logging.error ("You must specify --sqlite, or RealTime JSON files")
+        exit(1)
+    if not columns:
+        logging.error ("no realtime rows")
+        exit(1)
+    off = args.off.lower().split(",")
+    for serial, system_columns in sorted(columns.items()):
+        outputDir = os.path.join(args.output, serial) if serial else args.output
+        analyze(system_columns, off, cadence_s, args.short, outputDir, serial)
+    exit(0)
+
+if __name__ == "__main__":
+    main()
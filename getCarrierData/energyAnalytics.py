@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+  daily energy use by category, joined with the outdoor temperature, and the heating and cooling
+  efficiency trends that come out of it.
+
+  The Daily rows hold Carrier's "day1" energy period (see daily_energy in fieldMaps.json), i.e. the
+  kWh of each category for the DATE of the row, so each row is already the delta for its day
+  (with more than one system, the systems are added up). The outdoor temperature of the day is the
+  mean of the RealTime out_temp readings for that DATE, or the LGR sensor's LOtempAvg without them.
+  From those:
+    total_kWh             the electricity of the day, the categories in KWhFields; cool_btu and
+                          furnace_gal are in other units, so they aren't in it
+    hdd, cdd              heating and cooling degree days, from BaseTemperature
+    heat_kWh_per_hdd      heat pump heating kWh per heating degree day, the lower the better
+    furnace_gal_per_hdd   furnace gallons per heating degree day
+    cool_btu_per_cdd      cooling BTU per cooling degree day
+  and the same over the last --window days, which evens out the days with few degree days.
+  The heating is the heat pump and the furnace (as in degreeDayRegression.py), kept apart since kWh
+  and gallons don't add up: on a dual fuel system a cold day the furnace took over shows up as
+  fewer kWh and more gallons per degree day, so the two are read together.
+
+  The per-day results, and the running sums of the RealTime temperatures, are cached in CacheFile,
+  so adding a day only computes that day. Feeding the same rows again changes nothing.
+
+  Usage:
+    python3 energyAnalytics.py [-d] [--window 7] [-o report.csv] -D ../CarrierDailyData.json -R ../CarrierRealTimeData.json
+    python3 energyAnalytics.py [-d] [--window 7] [-o report.csv] -s [../CarrierData.sqlite]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+from itertools import chain
+from sys import exit, stdout
+from typing import Any, Dict, Iterable, List
+
+from fieldMap import loadFieldMaps, toNumber
+from jsonLinesWriter import readJsonLines
+
+CacheFile = "../energyAnalytics.cache"
+CacheVersion = 2
+# degrees F
+BaseTemperature = 65.0
+# the categories in kWh, that add up to the total
+KWhFields = ["heat_kWh", "hp_fan", "furnace_fan", "loop_pump"]
+
+def energyFields() -> List[str]:
+    """ the category fields of the Daily rows """
+    return [entry["to"] for entry in loadFieldMaps()["daily_energy"] if entry["to"] != "id"]
+
+def _rowEnergy(row: Dict[str, Any], fields: List[str]) -> Dict[str, float]:
+    """ the energy of each category, added up over the systems when there is more than one """
+    systems = row.get("systems")
+    sources = list(systems.values()) if isinstance(systems, dict) else [row]
+    return {field: sum(toNumber(source.get(field)) or 0.0 for source in sources) for field in fields}
+
+##### the cache
+def loadCache(cacheFile: str = CacheFile) -> Dict[str, Any]:
+    try:
+        with open(cacheFile, 'r') as f:
+            cache = json.load(f)
+        if cache.get("version") == CacheVersion:
+            return cache
+        logging.info("%s is from an older version, starting over" % cacheFile)
+    except (OSError, ValueError):
+        pass
+    return { "version": CacheVersion, "days": {}, "inputs": {}, "outdoor": {} }
+
+def saveCache(cache: Dict[str, Any], cacheFile: str = CacheFile):
+    with open(cacheFile + ".tmp", 'w') as f:
+        json.dump(cache, f)
+    os.replace(cacheFile + ".tmp", cacheFile)
+
+##### updating it
+def addOutdoorReadings(cache: Dict[str, Any], realtime_rows: Iterable[Dict[str, Any]]) -> set:
+    """ add the out_temp readings to the running sums of their DATE; returns the dates that changed.
+        a reading at or before the last TIME already added for its DATE was seen before, and is skipped """
+    outdoor = cache["outdoor"]
+    changed = set()
+    for row in realtime_rows:
+        date = row.get("DATE")
+        value = toNumber(row.get("out_temp"))
+        if date is None or value is None:
+            continue
+        sums = outdoor.setdefault(date, { "sum": 0.0, "count": 0, "last_time": "" })
+        time = str(row.get("TIME", ""))
+        if time <= sums["last_time"]:
+            continue
+        sums["sum"] += value
+        sums["count"] += 1
+        sums["last_time"] = time
+        changed.add(date)
+    return changed
+
+def dayRecord(date: str, energy: Dict[str, float], outdoor: float | None) -> Dict[str, Any]:
+    record = { "DATE": date, **energy, "total_kWh": sum(energy.get(field, 0.0) for field in KWhFields), "outdoor": outdoor }
+    if outdoor is None:
+        record["hdd"] = record["cdd"] = None
+        record["heat_kWh_per_hdd"] = record["furnace_gal_per_hdd"] = record["cool_btu_per_cdd"] = None
+        return record
+    hdd = record["hdd"] = max(0.0, BaseTemperature - outdoor)
+    cdd = record["cdd"] = max(0.0, outdoor - BaseTemperature)
+    record["heat_kWh_per_hdd"] = energy.get("heat_kWh", 0.0) / hdd if hdd > 0 else None
+    record["furnace_gal_per_hdd"] = energy.get("furnace_gal", 0.0) / hdd if hdd > 0 else None
+    record["cool_btu_per_cdd"] = energy.get("cool_btu", 0.0) / cdd if cdd > 0 else None
+    return record
+
+def updateAnalytics(cache: Dict[str, Any], daily_rows: Iterable[Dict[str, Any]], realtime_rows: Iterable[Dict[str, Any]],
+                    fields: List[str]) -> List[str]:
+    """ compute the days that are new, or whose inputs changed; returns their dates """
+    changed_outdoor = addOutdoorReadings(cache, realtime_rows)
+    daily = {}
+    for row in daily_rows:
+        if row.get("DATE") is not None:
+            daily[row["DATE"]] = row
+    # a day whose temperatures changed, but isn't in these Daily rows, is recomputed from its cached inputs
+    recompute = [date for date in changed_outdoor if date not in daily and date in cache["inputs"]]
+
+    computed = []
+    for date in chain(sorted(daily), recompute):
+        if date in daily:
+            row = daily[date]
+            energy = _rowEnergy(row, fields)
+            lgr = toNumber(row.get("LOtempAvg"))
+            inputs = { "energy": energy, "lgr": lgr }
+            digest = hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+            cached = cache["inputs"].get(date)
+            if cached is not None and cached["digest"] == digest and date not in changed_outdoor:
+                continue
+            cache["inputs"][date] = { "digest": digest, **inputs }
+        inputs = cache["inputs"][date]
+        sums = cache["outdoor"].get(date)
+        outdoor = sums["sum"] / sums["count"] if sums and sums["count"] else inputs["lgr"]
+        cache["days"][date] = dayRecord(date, inputs["energy"], outdoor)
+        computed.append(date)
+    return computed
+
+def trends(days: Dict[str, Dict[str, Any]], window: int) -> List[Dict[str, Any]]:
+    """ the day records in order, each with the heating and cooling efficiency over the last window days """
+    ordered = [days[date] for date in sorted(days)]
+    sums = { "heat_kWh": 0.0, "furnace_gal": 0.0, "hdd": 0.0, "cool_btu": 0.0, "cdd": 0.0 }
+    result = []
+    for index, record in enumerate(ordered):
+        for key in sums:
+            sums[key] += record.get(key) or 0.0
+            if index >= window:
+                sums[key] -= ordered[index - window].get(key) or 0.0
+        result.append({ **record,
+            "heat_kWh_per_hdd_%dd" % window: sums["heat_kWh"] / sums["hdd"] if sums["hdd"] > 0.5 else None,
+            "furnace_gal_per_hdd_%dd" % window: sums["furnace_gal"] / sums["hdd"] if sums["hdd"] > 0.5 else None,
+            "cool_btu_per_cdd_%dd" % window: sums["cool_btu"] / sums["cdd"] if sums["cdd"] > 0.5 else None,
+        })
+    return result
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Daily energy use by category, against the outdoor temperature, with efficiency trends"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-D", "--daily", nargs='*', default=[], help="Daily JSON files" )
+    parser.add_argument( "-R", "--realtime", nargs='*', default=[], help="RealTime JSON files, for the outdoor temperature" )
+    parser.add_argument( "-s", "--sqlite", nargs="?", const=True, default=None,
+        help="read the rows added since the last run from the sqlite database (default ../CarrierData.sqlite)" )
+    parser.add_argument( "-w", "--window", type=int, default=7, help="days in the efficiency trend (default 7)" )
+    parser.add_argument( "-o", "--output", help="write the report to this CSV file, instead of stdout" )
+    parser.add_argument( "--cache", default=CacheFile, help="cache file (default %s)" % CacheFile )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    cache = loadCache(args.cache)
+    fields = energyFields()
+    if args.sqlite:
+        from carrierDataSQLite import DBFile, openDB, readRows
+        db = openDB(DBFile if args.sqlite is True else args.sqlite)
+        # the last cached day may have been partial
+        since = max(cache["days"]) if cache["days"] else None
+        computed = updateAnalytics(cache, readRows(db, "Daily", since), readRows(db, "RealTime", since), fields)
+        db.close()
+    elif args.daily or args.realtime:
+        computed = updateAnalytics(cache, readJsonLines(args.daily), readJsonLines(args.realtime), fields)
+    else:
+        logging.error ("You must specify --sqlite, or --daily and --realtime files")
+        exit(1)
+    saveCache(cache, args.cache)
+    logging.info("computed %d day(s), %d in the cache" % (len(computed), len(cache["days"])))
+
+    report = trends(cache["days"], args.window)
+    if not report:
+        exit(0)
+    out = open(args.output, 'w', newline='') if args.output else stdout
+    writer = csv.DictWriter(out, fieldnames=list(report[-1].keys()))
+    writer.writeheader()
+    for record in report:
+        writer.writerow({k: round(v, 3) if isinstance(v, float) else v for k, v in record.items()})
+    if args.output:
+        out.close()
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+  export the collected rows as columns, for pandas, polars, DuckDB, R, ... without going through excel.
+
+  The rows are read in order from the JSON archive (the Old file, the monthly segments, then the working
+  file, see jsonLinesWriter.archiveFiles), or from the sqlite database, and written --chunk rows at a time:
+    csv       a header, then the rows (to stdout without -o)
+    arrow     an Arrow IPC file (a.k.a. Feather v2), one record batch per chunk
+    parquet   a Parquet file, one row group per chunk
+  arrow and parquet need pyarrow (pip3 install pyarrow). The format is taken from the -o extension without -f.
+
+  Only the --columns asked for are written (DATE and TIME always come first); without it, every column
+  in the rows, in the order they first appear. Rows from more than one system have field@serial columns
+  (see fieldMap.flattenSystems). For arrow and parquet, a column whose values are all numbers (or numbers
+  as strings) is a float64 column, otherwise a string column. The columns and their types come from a
+  first pass over the rows, so that pass is skipped only for csv with --columns.
+  The rows a deadband recording held back are put back (see deadband.py), from sqlite too.
+
+  Usage:
+    python3 exportData.py [-d] -R [--since 2025-01-01] [--until 2025-06-30] [-c in_temp,out_temp,blower_rpm] -o realtime.parquet
+    python3 exportData.py [-d] -D -s [../CarrierData.sqlite] -o daily.csv
+    python3 exportData.py [-d] -R -c in_temp,out_temp > realtime.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+from itertools import islice
+from sys import exit, stdout
+from typing import Any, Dict, Iterable, Iterator, List
+
+from checkGaps import newerRows
+from deadband import reconstructRows
+from fieldMap import flattenSystems, toNumber
+from jsonLinesWriter import archiveFiles, readJsonLines
+
+DataDir = "../"
+ArchiveFiles = {
+    'RealTime': 'CarrierRealTimeData.json',
+    'Daily': 'CarrierDailyData.json',
+}
+Formats = ["csv", "arrow", "parquet"]
+FormatExtensions = { ".csv": "csv", ".arrow": "arrow", ".feather": "arrow", ".parquet": "parquet" }
+ChunkRows = 50000
+TimeColumns = ["DATE", "TIME"]
+segmentRe = re.compile(r'\.(\d{4}-\d{2})\.json\.gz$')
+
+##### the rows
+def _inRange(fileName: str, since: str | None, until: str | None) -> bool:
+    """ False for a monthly segment entirely outside since .. until """
+    match = segmentRe.search(fileName)
+    if match is None:
+        return True
+    month = match.group(1)
+    return (since is None or month >= since[:7]) and (until is None or month <= until[:7])
+
+def jsonRows(path: str, since: str | None, until: str | None) -> Iterator[Dict[str, Any]]:
+    """ the rows of the archive of path, oldest first, from since to until """
+    files = [f for f in archiveFiles(path) if _inRange(f, since, until)]
+    logging.debug("reading %s" % files)
+
+    for row in newerRows(reconstructRows(readJsonLines(files))):
+        date = row.get("DATE") or ""
+        if since is not None and date < since:
+            continue
+        if until is not None and date > until:
+            # the rows are in order, so there's no more
+            break
+        yield row
+
+def chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while True:
+        chunk = [flattenSystems(row) for row in islice(rows, size)]
+        if not chunk:
+            return
+        yield chunk
+
+##### csv
+def writeCsv(chunks: Iterator[List[Dict[str, Any]]], columns: List[str], out) -> int:
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for chunk in chunks:
+        writer.writerows([[row.get(column) for column in columns] for row in chunk])
+        count += len(chunk)
+        logging.debug("%d rows" % count)
+    return count
+
+##### arrow and parquet
+def _toStr(value) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value) if isinstance(value, (dict, list, bool)) else str(value)
+
+def scanColumns(rows: Iterable[Dict[str, Any]]):
+    """ every column of the rows, in the order they first appear, DATE and TIME first, and those only ever numbers """
+    columns = dict.fromkeys(TimeColumns)
+    valued = set()
+    not_numeric = set(TimeColumns)
+    for row in rows:
+        for column, value in flattenSystems(row).items():
+            columns[column] = None
+            if value is not None:
+                valued.add(column)
+                if column not in not_numeric and toNumber(value) is None:
+                    not_numeric.add(column)
+    return list(columns), valued - not_numeric
+
+def arrowSchema(pa, columns: List[str], numeric: set):
+    """ the schema, and the converter of each column """
+    fields = []
+    converters = []
+    for column in columns:
+        if column in numeric:
+            fields.append(pa.field(column, pa.float64()))
+            converters.append(toNumber)
+        else:
+            fields.append(pa.field(column, pa.string()))
+            converters.append(_toStr)
+    return pa.schema(fields), converters
+
+def writeArrow(chunks: Iterator[List[Dict[str, Any]]], columns: List[str], numeric: set, output: str, parquet: bool) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logging.error("arrow and parquet need pyarrow: pip3 install pyarrow")
+        exit(1)
+    schema, converters = arrowSchema(pa, columns, numeric)
+    writer = None
+    count = 0
+    # only when the rows changed since they were scanned, e.g. the collector appended one
+    lost = set()
+    tmp_name = output + ".tmp"
+    try:
+        for chunk in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_name, schema) if parquet else pa.ipc.new_file(tmp_name, schema)
+            arrays = []
+            for column, convert, field in zip(columns, converters, schema):
+                values = [convert(row.get(column)) for row in chunk]
+                if column in numeric and column not in lost and any(
+                        value is None and row.get(column) is not None for value, row in zip(values, chunk)):
+                    logging.warning("%s has values that aren't numbers, written as empty" % column)
+                    lost.add(column)
+                arrays.append(pa.array(values, type=field.type))
+            batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            if parquet:
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            count += len(chunk)
+            logging.debug("%d rows" % count)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(tmp_name, output)
+    return count
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the collected rows to CSV, Arrow or Parquet, in chunks"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-R", "--RealTime", action="store_true", help="export the RealTime rows" )
+    parser.add_argument( "-D", "--Daily", action="store_true", help="export the Daily rows" )
+    parser.add_argument( "-s", "--sqlite", nargs="?", const=True, default=None,
+        help="read from the sqlite database instead of the JSON archive (default ../CarrierData.sqlite)" )
+    parser.add_argument( "--since", help="first DATE to export (yyyy-mm-dd)" )
+    parser.add_argument( "--until", help="last DATE to export (yyyy-mm-dd)" )
+    parser.add_argument( "-c", "--columns", help="comma separated columns to export (default: all of them)" )
+    parser.add_argument( "-f", "--format", choices=Formats, help="output format (default: from the -o extension, or csv)" )
+    parser.add_argument( "-o", "--output", help="output file (csv goes to stdout without it)" )
+    parser.add_argument( "--dir", default=DataDir, help="directory of the JSON archive (default %s)" % DataDir )
+    parser.add_argument( "--chunk", type=int, default=ChunkRows, help="rows per chunk (default %d)" % ChunkRows )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.RealTime == args.Daily:
+        logging.error ("You must specify either --RealTime or --Daily")
+        exit(1)
+    sheet_name = 'RealTime' if args.RealTime else 'Daily'
+    output_format = args.format or FormatExtensions.get(os.path.splitext(args.output or "")[1].lower(), "csv")
+    if output_format != "csv" and not args.output:
+        logging.error ("%s needs an output file, -o" % output_format)
+        exit(1)
+
+    db = None
+    if args.sqlite:
+        from carrierDataSQLite import DBFile, openDB, previousRow, readRows
+        db = openDB(DBFile if args.sqlite is True else args.sqlite)
+        previous = previousRow(db, sheet_name, args.since) if args.since else None
+        def openRows():
+            return newerRows(reconstructRows(readRows(db, sheet_name, args.since, args.until), previous))
+    else:
+        def openRows():
+            return jsonRows(os.path.join(args.dir, ArchiveFiles[sheet_name]), args.since, args.until)
+
+    numeric = set()
+    if args.columns:
+        columns = TimeColumns + [c for c in args.columns.split(",") if c and c not in TimeColumns]
+    if output_format != "csv" or not args.columns:
+        logging.debug ("scanning the columns")
+        all_columns, numeric = scanColumns(openRows())
+        if not args.columns:
+            columns = all_columns
+    if len(columns) == len(TimeColumns) and not args.columns:
+        logging.info ("no rows to export")
+        exit(0)
+
+    chunks = chunked(openRows(), args.chunk)
+    if output_format == "csv":
+        out = open(args.output, 'w', newline='') if args.output else stdout
+        count = writeCsv(chunks, columns, out)
+        if args.output:
+            out.close()
+    else:
+        count = writeArrow(chunks, columns, numeric, args.output, output_format == "parquet")
+    if db is not None:
+        db.close()
+    logging.info ("exported %d rows, %d columns, to %s" % (count, len(columns), args.output or "stdout"))
+    exit(0)
+
+if __name__ == "__main__":
+    main()
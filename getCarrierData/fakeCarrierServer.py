@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+  a local stand-in for the Carrier Infinity services, so ApiConnectionGraphql and ApiWebsocket
+  can be load tested without hitting Carrier's production endpoints with real credentials.
+
+  It answers
+    POST /graphql-no-auth            assistedLogin
+    POST /oauth2/default/v1/token    the token refresh
+    POST /graphql                    getInfinitySystems, getInfinityEnergy, getUser, the update mutations,
+                                     and the batched getInfinitySystemsAndEnergy and getInfinityEnergies
+    GET  /?Token=...                 the websocket, which pushes InfinityStatus frames every --push seconds,
+                                     and an InfinityConfig frame after each update mutation or reconcile
+  with synthetic payloads (like the ones in Test-run-Formatted.txt) for --systems systems of --zones zones,
+  or with recorded raw API responses from --payload, a JSON file of
+    { "infinitySystems": [ ... ], "infinityEnergy": { serial: { ... } } }
+  Every response waits --latency ms (+/- --jitter), and fails with a 500 at --error-rate.
+
+  Usage:
+    python3 fakeCarrierServer.py [-d] [--port 8080] [--latency MS] [--jitter MS] [--error-rate 0.01] [--systems N] [--zones N]
+    CARRIER_API_BASE_URL=http://127.0.0.1:8080 python3 getCarrierData.py -R
+
+  Load test, with the server in the same process:
+    python3 fakeCarrierServer.py --bench 500 --concurrency 20 --latency 50 --jitter 20 [--batched]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import random
+import time
+import uuid
+from copy import deepcopy
+from sys import exit
+from typing import Any, Dict, List
+
+from aiohttp import web, WSMsgType
+
+class FakeSettings:
+    latency: float = 0.0 # ms
+    jitter: float = 0.0 # ms
+    error_rate: float = 0.0
+    expires_in: int = 3600 # seconds
+    push_interval: float = 10.0 # seconds
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.UTC).isoformat()
+
+def syntheticZone(zone_id: int) -> Dict[str, Any]:
+    return {
+        "id": str(zone_id), "rt": "74.0", "rh": "54", "fan": "off", "htsp": "69.0", "clsp": "77.0",
+        "hold": "off", "enabled": "on", "currentActivity": "home", "zoneconditioning": "idle",
+    }
+
+def syntheticConfigZone(zone_id: int) -> Dict[str, Any]:
+    activities = []
+    for activity, htsp, clsp in [ ["away", 62, 79], ["home", 69, 77], ["manual", 69, 75], ["sleep", 67, 76], ["wake", 69, 76] ]:
+        activities.append({ "id": activity, "zoneId": str(zone_id), "type": activity, "fan": "off", "htsp": str(htsp), "clsp": str(clsp) })
+    periods = [
+        { "id": n, "zoneId": str(zone_id), "activity": activity, "time": time_of_day, "enabled": "on" }
+        for n, (activity, time_of_day) in enumerate([ ["wake", "06:00"], ["home", "08:00"], ["sleep", "22:00"] ])
+    ]
+    return {
+        "id": str(zone_id), "name": "Zone %d" % zone_id, "enabled": "on", "hold": "off", "holdActivity": None,
+        "otmr": None, "occEnabled": "off", "activities": activities,
+        "program": { "id": str(zone_id), "day": [ { "id": day, "zoneId": str(zone_id), "period": periods } for day in range(7) ] },
+    }
+
+def syntheticSystem(n: int, zones: int) -> Dict[str, Any]:
+    serial = "FAKE%07d" % n
+    return {
+        "profile": {
+            "serial": serial, "name": "Fake System %d" % n, "firmware": "CESR131755-02.00", "model": "SYSTXCCITC01-C",
+            "brand": "Carrier", "indoorModel": "59MN7C060C171114", "indoorSerial": "4924A43590", "idutype": "furnace",
+            "idusource": "gas", "outdoorModel": "27VNA336A00301", "outdoorSerial": "2725E03722", "odutype": "varcaphp",
+        },
+        "status": {
+            "localTime": _now(), "utcTime": _now(), "isDisconnected": False, "cfgem": "F", "mode": "auto",
+            "vacatrunning": "off", "oat": "74.0", "filtrlvl": "40", "humid": "off", "humlvl": "13", "uvlvl": "0",
+            "odu": { "type": "varcaphp", "opstat": "off" },
+            "idu": { "type": "furnace", "opstat": "off", "cfm": "0", "statpress": "0.0", "blwrpm": "0" },
+            "zones": [ syntheticZone(z + 1) for z in range(zones) ],
+        },
+        "config": {
+            "etag": uuid.uuid4().hex, "mode": "auto", "cfgem": "F", "cfghumid": "on", "cfguv": "off",
+            "heatsource": "system", "fueltype": "gas", "gasunit": "therms",
+            "vacmint": "60.0", "vacmaxt": "82.0", "vacfan": "off",
+            "zones": [ syntheticConfigZone(z + 1) for z in range(zones) ],
+        },
+    }
+
+def syntheticEnergy() -> Dict[str, Any]:
+    categories = [ "cooling", "eheat", "fan", "fangas", "gas", "hpheat", "looppump", "reheat" ]
+    config = { category: { "display": True, "enabled": category not in ("eheat", "reheat", "looppump") } for category in categories }
+    config.update({ "hspf": 8.80078125, "seer": 15.0 })
+    periods = []
+    for period in [ "day1", "day2", "month1", "month2", "year1", "year2" ]:
+        periods.append({
+            "energyPeriodType": period, "eHeatKwh": 0, "coolingKwh": random.randint(0, 40), "fanGasKwh": 0,
+            "fanKwh": random.randint(0, 5), "hPHeatKwh": random.randint(0, 40), "loopPumpKwh": 0, "gasKwh": 0, "reheatKwh": 0,
+        })
+    return { "energyConfig": config, "energyPeriods": periods }
+
+class FakeCarrier:
+    def __init__(self, settings: FakeSettings, systems: List[Dict[str, Any]], energy: Dict[str, Dict[str, Any]]):
+        self.settings = settings
+        self.systems = systems
+        self.energy = energy
+        self.access_tokens = set()
+        self.refresh_tokens = set()
+        self.websockets = set()
+        self.request_count = 0
+
+    def _newToken(self) -> Dict[str, Any]:
+        access_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+        self.access_tokens.add(access_token)
+        self.refresh_tokens.add(refresh_token)
+        return { "token_type": "Bearer", "expires_in": self.settings.expires_in, "access_token": access_token,
+                 "scope": "offline_access", "refresh_token": refresh_token }
+
+    async def _delay(self):
+        self.request_count += 1
+        delay = self.settings.latency + random.uniform(-self.settings.jitter, self.settings.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < self.settings.error_rate:
+            raise web.HTTPInternalServerError(text="fake error")
+
+    async def graphqlNoAuth(self, request: web.Request) -> web.Response:
+        await self._delay()
+        body = await request.json()
+        if body.get("operationName") != "assistedLogin":
+            return web.json_response({ "errors": [ { "message": "unknown operation %s" % body.get("operationName") } ] })
+        login = { "success": True, "status": 200, "errorMessage": None, "data": self._newToken() }
+        return web.json_response({ "data": { "assistedLogin": login } })
+
+    async def token(self, request: web.Request) -> web.Response:
+        await self._delay()
+        form = await request.post()
+        if form.get("refresh_token") not in self.refresh_tokens:
+            raise web.HTTPUnauthorized(text="bad refresh token")
+        self.refresh_tokens.discard(form.get("refresh_token"))
+        return web.json_response(self._newToken())
+
+    def _findSystem(self, serial: str) -> Dict[str, Any]:
+        for system in self.systems:
+            if system["profile"]["serial"] == serial:
+                return system
+        raise KeyError(serial)
+
+    def _resolveQuery(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """ answer each top level field of the query, under its alias, e.g. "energy0: infinityEnergy(serial: $serial0)" """
+        from graphql import parse # a gql dependency, only needed for the batched queries
+        variables = body.get("variables") or {}
+        data = {}
+        for definition in parse(body["query"]).definitions:
+            for selection in definition.selection_set.selections:
+                arguments = { argument.name.value: variables.get(argument.value.name.value) if argument.value.kind == "variable"
+                              else argument.value.value for argument in selection.arguments }
+                key = selection.alias.value if selection.alias else selection.name.value
+                match selection.name.value:
+                    case "infinitySystems":
+                        data[key] = self.systems
+                    case "infinityEnergy":
+                        data[key] = self.energy.get(arguments.get("serial"))
+                    case name:
+                        raise KeyError(name)
+        return data
+
+    async def _operation(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        operation = body.get("operationName")
+        variables = body.get("variables") or {}
+        match operation:
+            case "getInfinitySystems":
+                return { "data": { "infinitySystems": self.systems } }
+            case "getInfinityEnergy":
+                return { "data": { "infinityEnergy": self.energy.get(variables.get("serial")) } }
+            case "getInfinitySystemsAndEnergy" | "getInfinityEnergies":
+                try:
+                    return { "data": self._resolveQuery(body) }
+                except KeyError as error:
+                    return { "errors": [ { "message": "unknown field %s" % error } ] }
+            case "getUser":
+                systems = [ { "profile": { "serial": s["profile"]["serial"], "name": s["profile"]["name"] },
+                              "config": { "zones": [ { "id": z["id"], "enabled": z["enabled"] } for z in s["config"]["zones"] ] },
+                              "status": { "isDisconnected": False } } for s in self.systems ]
+                user = { "username": variables.get("userName"), "locations": [ { "locationId": "1", "name": "Fake", "systems": systems, "devices": [] } ] }
+                return { "data": { "user": user } }
+            case "updateInfinityConfig" | "updateInfinityZoneActivity" | "updateInfinityZoneConfig":
+                serial = variables.get("input", {}).get("serial")
+                try:
+                    system = self._findSystem(serial)
+                except KeyError:
+                    return { "errors": [ { "message": "unknown serial %s" % serial } ] }
+                system["config"]["etag"] = uuid.uuid4().hex
+                await self._pushConfig(system)
+                return { "data": { operation: { "etag": system["config"]["etag"] } } }
+        return { "errors": [ { "message": "unknown operation %s" % operation } ] }
+
+    async def graphql(self, request: web.Request) -> web.Response:
+        await self._delay()
+        token_type, _, access_token = request.headers.get("Authorization", "").partition(" ")
+        if access_token not in self.access_tokens:
+            raise web.HTTPUnauthorized(text="bad access token")
+        body = await request.json()
+        if isinstance(body, list):
+            # a batched request
+            return web.json_response([ await self._operation(one) for one in body ])
+        return web.json_response(await self._operation(body))
+
+    def _statusFrame(self, system: Dict[str, Any]) -> Dict[str, Any]:
+        status = system["status"]
+        status["oat"] = "%.1f" % (float(status["oat"]) + random.uniform(-0.5, 0.5))
+        zones = []
+        for zone in status["zones"]:
+            zone["rt"] = "%.1f" % (float(zone["rt"]) + random.uniform(-0.2, 0.2))
+            zones.append({ "id": zone["id"], "rt": zone["rt"], "timestamp": _now() })
+        return { "messageType": "InfinityStatus", "deviceId": system["profile"]["serial"], "timestamp": _now(),
+                 "updatedTime": _now(), "oat": status["oat"], "zones": zones }
+
+    def _configFrame(self, system: Dict[str, Any]) -> Dict[str, Any]:
+        return { "messageType": "InfinityConfig", "deviceId": system["profile"]["serial"], "timestamp": _now(),
+                 "updatedTime": _now(), "id": uuid.uuid4().hex, "etag": system["config"]["etag"] }
+
+    async def _pushConfig(self, system: Dict[str, Any]):
+        frame = json.dumps(self._configFrame(system))
+        for ws in list(self.websockets):
+            await ws.send_str(frame)
+
+    async def _pushStatus(self, ws: web.WebSocketResponse):
+        while not ws.closed:
+            await asyncio.sleep(self.settings.push_interval)
+            for system in self.systems:
+                await ws.send_str(json.dumps(self._statusFrame(system)))
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        if request.query.get("Token") not in self.access_tokens:
+            raise web.HTTPUnauthorized(text="bad access token")
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.websockets.add(ws)
+        pusher = asyncio.create_task(self._pushStatus(ws))
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    action = json.loads(msg.data).get("action")
+                    logging.debug("ws action %s" % action)
+                    if action == "reconcile":
+                        for system in self.systems:
+                            await ws.send_str(json.dumps(self._configFrame(system)))
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            pusher.cancel()
+            self.websockets.discard(ws)
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/graphql-no-auth", self.graphqlNoAuth)
+        app.router.add_post("/oauth2/default/v1/token", self.token)
+        app.router.add_post("/graphql", self.graphql)
+        app.router.add_get("/", self.websocket)
+        return app
+
+def loadPayload(args) -> FakeCarrier:
+    settings = FakeSettings()
+    settings.latency = args.latency
+    settings.jitter = args.jitter
+    settings.error_rate = args.error_rate
+    settings.expires_in = args.expires_in
+    settings.push_interval = args.push
+    if args.payload:
+        with open(args.payload, 'r') as f:
+            payload = json.load(f)
+        systems = payload["infinitySystems"]
+        energy = payload["infinityEnergy"]
+    else:
+        systems = [ syntheticSystem(n + 1, args.zones) for n in range(args.systems) ]
+        energy = { system["profile"]["serial"]: syntheticEnergy() for system in systems }
+    return FakeCarrier(settings, deepcopy(systems), energy)
+
+async def startServer(fake: FakeCarrier, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info("fake carrier service on http://%s:%d" % (host, port))
+    return runner
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+async def bench(fake: FakeCarrier, host: str, port: int, count: int, concurrency: int, batched: bool = False):
+    from carrier_api.api_connection_graphql import ApiConnectionGraphql
+    runner = await startServer(fake, host, port)
+    api_connection = ApiConnectionGraphql(username="bench", password="bench", base_url="http://%s:%d" % (host, port))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await api_connection.load_data(batched=batched)
+                latencies.append(time.perf_counter() - start)
+            except Exception as error:
+                logging.debug("load_data failed: %s" % error)
+                errors += 1
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(count)])
+        elapsed = time.perf_counter() - start
+    finally:
+        await api_connection.cleanup()
+        await runner.cleanup()
+
+    latencies.sort()
+    print("%d load_data calls (%d errors) in %.2fs = %.1f/s, %d server requests" % (
+        count, errors, elapsed, count / elapsed, fake.request_count))
+    print("latency ms: p50 %.1f  p90 %.1f  p99 %.1f  max %.1f" % tuple(
+        1000 * v for v in [ percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99), latencies[-1] if latencies else 0 ]))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Carrier Infinity GraphQL and websocket services"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "--host", default="127.0.0.1" )
+    parser.add_argument( "--port", type=int, default=8080 )
+    parser.add_argument( "--latency", type=float, default=0.0, help="ms added to every response" )
+    parser.add_argument( "--jitter", type=float, default=0.0, help="+/- ms of random variation in the latency" )
+    parser.add_argument( "--error-rate", type=float, default=0.0, help="fraction of requests that fail with a 500" )
+    parser.add_argument( "--expires-in", type=int, default=3600, help="token lifetime in seconds" )
+    parser.add_argument( "--push", type=float, default=10.0, help="seconds between websocket status frames" )
+    parser.add_argument( "--systems", type=int, default=1, help="number of synthetic systems" )
+    parser.add_argument( "--zones", type=int, default=1, help="number of zones per synthetic system" )
+    parser.add_argument( "--payload", help="JSON file of recorded infinitySystems and infinityEnergy responses" )
+    parser.add_argument( "--bench", type=int, help="run this many load_data calls against the server, and report" )
+    parser.add_argument( "--concurrency", type=int, default=10, help="concurrent load_data calls for --bench" )
+    parser.add_argument( "--batched", action="store_true", help="--bench load_data(batched=True), one request per call" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    fake = loadPayload(args)
+    if args.bench:
+        asyncio.run(bench(fake, args.host, args.port, args.bench, args.concurrency, args.batched))
+    else:
+        web.run_app(fake.app(), host=args.host, port=args.port)
+    exit(0)
+
+if __name__ == "__main__":
+    main()
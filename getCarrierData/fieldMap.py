@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+  compile the declarative field maps in fieldMaps.json into extractor functions.
+
+  Each entry in a map looks like
+    { "from": "outdoor_temperature", "to": "out_temp", "transform": "onoff", "missing": "warn", "default": 0 }
+  - from: the key in the source dict, or a dotted path for nested values ("idu.cfm", "periods.0.cooling")
+  - to: the name in the output dict
+  - transform: optional, one of the names in Transforms
+  - missing: what to do when the value is missing (or the transform fails)
+      warn (the default): log a warning and leave it out
+      skip: leave it out quietly
+      null: output None
+      default: output the entry's "default" value
+  - deadband: optional, for realtime fields, how far the value may move before
+      carrierDataCron.py --deadband writes a new row (see deadband.py)
+
+  The accessors, transforms and policies are all looked up once, when the map is compiled,
+  so extracting is one pass over a list of tuples. A new field only needs a new entry in fieldMaps.json
+
+  Usage (as library):
+    maps = loadFieldMaps()
+    extractStatus = compileFieldMap(maps["status"], "carrier status")
+    selected_data = extractStatus(collected_data["status"])
+
+  Usage (CLI), check the map file compiles:
+    python3 fieldMap.py [-d] [fieldMaps.json]
+"""
+import argparse
+import json
+import logging
+import os
+from operator import itemgetter
+from sys import exit
+from typing import Any, Callable, Dict, List
+
+FieldMapFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fieldMaps.json")
+
+def _onOff(value):
+    # json doesnt like python's True/False
+    if value is True:
+        return "on"
+    elif value is False:
+        return "off"
+    raise ValueError("%s is not True/False" % value)
+
+def _minMax(row):
+    return "%s-%s" % (row['MIN'], row['MAX'])
+
+Transforms = {
+    "onoff": _onOff,
+    "minmax": _minMax,
+    "int": int,
+    "float": float,
+    "str": str,
+}
+MissingPolicies = [ "warn", "skip", "null", "default" ]
+
+def _accessor(keys: List) -> Callable[[Any], Any]:
+    if len(keys) == 1:
+        return itemgetter(keys[0])
+    getters = [itemgetter(key) for key in keys]
+    def get(value):
+        for getter in getters:
+            value = getter(value)
+        return value
+    return get
+
+def _pathKeys(path) -> List:
+    if isinstance(path, list):
+        return path
+    # numeric parts are list indexes
+    return [int(key) if key.isdigit() else key for key in path.split(".")]
+
+def compileFieldMap(entries: List[Dict[str, Any]], source: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """ entries are as in fieldMaps.json, except "from" may already be a list of keys """
+    compiled = []
+    for entry in entries:
+        transform = entry.get("transform")
+        if transform is not None:
+            if transform not in Transforms:
+                raise ValueError("%s: unknown transform %s for %s" % (source, transform, entry["to"]))
+            transform = Transforms[transform]
+        missing = entry.get("missing", "warn")
+        if missing not in MissingPolicies:
+            raise ValueError("%s: unknown missing policy %s for %s" % (source, missing, entry["to"]))
+        keys = _pathKeys(entry["from"])
+        compiled.append((entry["to"], _accessor(keys), transform, missing, entry.get("default"), entry["from"]))
+
+    def extract(source_dict: Dict[str, Any]) -> Dict[str, Any]:
+        selected_data = {}
+        for to, get, transform, missing, default, from_name in compiled:
+            try:
+                value = get(source_dict)
+                if transform is not None:
+                    value = transform(value)
+            except (KeyError, IndexError, TypeError, ValueError):
+                if missing == "warn":
+                    logging.warning("%s is missing %s" % (source, from_name))
+                    continue
+                elif missing == "skip":
+                    continue
+                value = None if missing == "null" else default
+            selected_data[to] = value
+        return selected_data
+
+    extract.fields = [entry["to"] for entry in entries]
+    return extract
+
+def compileArduinoMap(fields: List[Dict[str, Any]], source: str, isRealTime: bool) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    each field names a row of the sensor CSV (see parseArduinoToDict)
+    realtime takes the LAST value, daily takes the AVG and the MIN-MAX
+    """
+    entries = []
+    for field in fields:
+        base = {k: v for k, v in field.items() if k not in ("from", "to", "transform")}
+        if isRealTime:
+            entries.append({**base, "from": [field["from"], "LAST"], "to": field["to"]})
+        else:
+            entries.append({**base, "from": [field["from"], "AVG"], "to": field["to"] + "Avg"})
+            entries.append({**base, "from": [field["from"]], "to": field["to"] + "MinMax", "transform": "minmax"})
+    return compileFieldMap(entries, source)
+
+def toNumber(value) -> float | None:
+    """ the value as a float, or None for a missing, boolean or non-numeric value """
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def flattenSystems(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    rows from more than one system or zone (see getCarrierData.selectAllRealTimeData) have
+      "systems": { serial: { field: value, ..., "zones": { zone id: { field: value, ... } } } }
+    which are flattened into the columns field@serial for the system fields, and field@serial/zone for the zone fields
+    """
+    systems = row.get("systems")
+    if not isinstance(systems, dict):
+        return row
+    flat = {k: v for k, v in row.items() if k != "systems"}
+    for serial, system in systems.items():
+        for field, value in system.items():
+            if field == "zones":
+                for zone_id, zone in value.items():
+                    for zone_field, zone_value in zone.items():
+                        flat[f"{zone_field}@{serial}/{zone_id}"] = zone_value
+            else:
+                flat[f"{field}@{serial}"] = value
+    return flat
+
+def loadFieldMaps(fileName: str = FieldMapFile) -> Dict[str, Any]:
+    with open(fileName, 'r') as f:
+        maps = json.load(f)
+    logging.debug("loaded field maps %s from %s" % ([k for k in maps if not k.startswith("#")], fileName))
+    return maps
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the field map file compiles"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( 'file', nargs='?', default=FieldMapFile, help="field map file (default %s)" % FieldMapFile )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    maps = loadFieldMaps(args.file)
+    for name in [ "status", "zone", "daily_status", "daily_energy" ]:
+        logging.info("%s: %s" % (name, compileFieldMap(maps[name], name).fields))
+    for sensor in maps["arduino"]:
+        for isRealTime in [ True, False ]:
+            logging.info("%s %s: %s" % (sensor["name"], "realtime" if isRealTime else "daily",
+                compileArduinoMap(sensor["fields"], sensor["address"], isRealTime).fields))
+    exit(0)
+
+if __name__ == "__main__":
+    main()
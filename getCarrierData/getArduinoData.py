@@ -1,14 +1,15 @@
 #!python3
 import argparse
 import datetime
-import io
 import json
 import logging
 import re
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sys import exit, stdout, exc_info
-from typing import Dict, IO
+from typing import Dict, Iterable, List
 from parseArduinoToDict import parseArduinoToDict
+from fieldMap import compileArduinoMap, loadFieldMaps
 
 """
   get data from an arduino temp_sensor that looks like this:
@@ -21,10 +22,26 @@ from parseArduinoToDict import parseArduinoToDict
   extract temp and humidity data and return it reformatted as in CarrierDataSchema.txt:
 
 """
-def getWebFileObj(url, params=None, headers=None, timeout=10) -> IO[str]:
-  r = requests.get(url, params=params, headers=headers, timeout=timeout)
+# one pooled session for all the sensors, so each device keeps its connection open
+MaxParallel = 8
+_session = None
+
+def getSession():
+  global _session
+  if _session is None:
+    # requests is only needed when reading the sensors over the network
+    import requests
+    _session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=MaxParallel, pool_maxsize=MaxParallel)
+    _session.mount('http://', adapter)
+  return _session
+
+def getWebFileObj(url, params=None, headers=None, timeout=10) -> Iterable[str]:
+  r = getSession().get(url, params=params, headers=headers, timeout=timeout)
   r.raise_for_status()         # raises on HTTP error codes
-  return io.TextIOWrapper(io.BytesIO(r.content), encoding="utf-8", newline="")
+  # csv.reader only needs the lines, so no need to wrap the body in a file object
+  r.encoding = "utf-8"
+  return r.text.splitlines()
 
 pattern = re.compile(r'^(?:(?:25[0-5]|2[0-4]\d|1\d{2}|[1-9]?\d).){3}(?:25[0-5]|2[0-4]\d|1\d{2}|[1-9]?\d)$')
 def isIPaddr(arg):
@@ -33,32 +50,70 @@ def isIPaddr(arg):
   else:
     raise ValueError
 
-# these are the field-name mappings from each arduino to the combined output dictionary
-# note each map represents a row on the input -- and always selects the LAST value
-map98 = [
-  [ 'test2', 'TItemp' ],
-  [ '%Humidity', 'Thumidity' ],
-]
-map100 = [
-  [ 'Inside', 'LItemp' ],
-  [ 'Outside', 'LOtemp' ],
-  [ '%Humidity', 'Lhumidity' ],
-]
-
-def remapFields (isRealTime: bool, map: list, ip: str, sensor_dict: Dict) -> Dict:
-    temp_data = {}
-    for field in map:
-      # logging.debug("field = %s a (%s)" % (field, type(field)))
-      try:
-        logging.debug ("Map field %s to %s = %s" % (field[0], field[1], sensor_dict[field[0]]['LAST']))
-        if isRealTime:
-          temp_data.__setitem__(field[1], sensor_dict[field[0]]['LAST'])
-        else:
-          temp_data.__setitem__(field[1]+"Avg", sensor_dict[field[0]]['AVG'])
-          temp_data.__setitem__(field[1]+"MinMax", sensor_dict[field[0]]['MIN'] + '-' + sensor_dict[field[0]]['MAX'])
-      except:
-        logging.warning("device %s is missing %s" % (ip, field[0]))
-    return temp_data
+# the sensor registry, and the field-name mappings from each arduino to the combined output dictionary
+# are in the "arduino" list in fieldMaps.json. Each sensor has
+#   name, address, fields, and optionally
+#   timeout: seconds to wait for the sensor (default 10)
+#   poll_interval: minimum seconds between realtime reads of the sensor (default 0, every run)
+# note each field represents a row on the input -- realtime selects the LAST value, daily the AVG and MIN-MAX
+sensors = loadFieldMaps()["arduino"]
+for sensor in sensors:
+    sensor.setdefault("timeout", 10)
+    sensor.setdefault("poll_interval", 0)
+    source = "device %s" % sensor["address"]
+    sensor["realtime"] = compileArduinoMap(sensor["fields"], source, isRealTime=True)
+    sensor["daily"] = compileArduinoMap(sensor["fields"], source, isRealTime=False)
+
+def findSensor(key: str, value: str) -> Dict | None:
+    for sensor in sensors:
+        if sensor[key] == value:
+            return sensor
+    return None
+
+def remapFields (isRealTime: bool, sensor: Dict, sensor_dict: Dict) -> Dict:
+    return sensor["realtime" if isRealTime else "daily"](sensor_dict)
+
+# when each sensor was last read, for the poll_interval
+PollStateFile = "../arduinoPoll.state"
+
+def dueSensors(sensor_list: List[Dict], isRealTime: bool) -> List[Dict]:
+    if not isRealTime or not any(sensor["poll_interval"] for sensor in sensor_list):
+        return sensor_list
+    try:
+        with open(PollStateFile, 'r') as f:
+            last_poll = json.load(f)
+    except (OSError, ValueError):
+        last_poll = {}
+    now = time.time()
+    due = [sensor for sensor in sensor_list if now - last_poll.get(sensor["address"], 0) >= sensor["poll_interval"]]
+    for sensor in due:
+        last_poll[sensor["address"]] = now
+    with open(PollStateFile, 'w') as f:
+        json.dump(last_poll, f)
+    return due
+
+def fetchSensor(sensor: Dict, forceNumbers: bool) -> Dict:
+    url = 'http://' + sensor["address"] + '/getRawData'
+    logging.debug (url)
+    sensor_dict = parseArduinoToDict (getWebFileObj(url, timeout=sensor["timeout"]), forceNumbers=forceNumbers)
+    logging.debug (json.dumps (sensor_dict, indent=2, ensure_ascii=False))
+    return sensor_dict
+
+def fetchSensors(sensor_list: List[Dict], forceNumbers: bool) -> List:
+    """ read all the sensors at once, at most MaxParallel at a time; returns [sensor, sensor_dict or None] """
+    results = []
+    if not sensor_list:
+        return results
+    with ThreadPoolExecutor(max_workers=min(MaxParallel, len(sensor_list))) as executor:
+        futures = [[sensor, executor.submit(fetchSensor, sensor, forceNumbers)] for sensor in sensor_list]
+        for sensor, future in futures:
+            try:
+                results.append([sensor, future.result()])
+            except:
+                excType, excValue, excTraceback = exc_info()
+                logging.error ("device %s EXCEPTION: excType=%s, excValue=%s" % (sensor["address"], excType, excValue))
+                results.append([sensor, None])
+    return results
 
 def getArduinoData(args) -> Dict:
     collected_data = {}
@@ -75,38 +130,27 @@ def getArduinoData(args) -> Dict:
         infile = open(args.file, newline="")
         sensor_dict = parseArduinoToDict (infile, forceNumbers=args.numeric)
         # don't know which map to use so assume LGR
-        collected_data.update(remapFields(args.realtime, map100, "file", sensor_dict))
+        collected_data.update(remapFields(args.realtime, findSensor("name", "LGR"), sensor_dict))
     else:
         # no file means read the live data from arduino
         logging.debug("reading CSV data from the sensors on the netqork")
         if "ipaddr" in args and args.ipaddr:
           sensor_ips = args.ipaddr # its a list of one
         else:
-          sensor_ips = [ '192.168.0.98', '192.168.0.100' ]
-
-        try:
-            for ip in sensor_ips:
-                url = 'http://' + ip + '/getRawData'
-                logging.debug (url)
-                sensor_dict = parseArduinoToDict (getWebFileObj(url), forceNumbers=args.numeric)
-                logging.debug (json.dumps (sensor_dict, indent=2, ensure_ascii=False))
-
-                # logging.debug("got sensor_dict: %s a (%s)" % (sensor_dict, type(sensor_dict)))
-
+          sensor_ips = [ sensor["address"] for sensor in sensors ]
+
+        sensor_list = []
+        for ip in sensor_ips:
+            sensor = findSensor("address", ip)
+            if sensor is None:
+                logging.error( "no field map exists for %s" % ip)
+            else:
+                sensor_list.append(sensor)
+
+        for sensor, sensor_dict in fetchSensors(dueSensors(sensor_list, args.realtime), args.numeric):
+            if sensor_dict is not None:
                 # now extract the current (LAST) values for selected NAMEs
-                # yes these are hard-coded IP addresses. This is only intended for, and will only work in one place.
-                if ip == '192.168.0.98':
-                    map = map98
-                elif ip == '192.168.0.100':
-                    map = map100
-                else:
-                    log.error( "no field map exists for %" % ip)
-                    map = []
-                collected_data.update(remapFields(args.realtime, map, ip, sensor_dict))
-        except:
-            excType, excValue, excTraceback = exc_info()
-            logging.error ("EXCEPTION: excType=%s, excValue=%s, excTraceback=%s" % (excType, excValue, excTraceback))
-
+                collected_data.update(remapFields(args.realtime, sensor, sensor_dict))
 
     return collected_data
 
@@ -5,13 +5,14 @@ import argparse
 import datetime
 import json
 import logging
+import os
 from sys import exit, stdout, exc_info
 from PRIVATE import UserName, PassWord
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from carrier_api.api_connection_graphql import ApiConnectionGraphql
-from carrier_api.api_websocket_data_updater import WebsocketDataUpdater
-from carrier_api.const import FanModes
+from carrier_api.util import projection_tree
+from fieldMap import compileFieldMap, loadFieldMaps
 
 def traceBack():
     import traceback
@@ -22,6 +23,27 @@ def traceBack():
     lines = traceback.format_exception(excType, excValue, excTraceback)
     logging.debug( "".join( lines ))
 
+# the system serials from the last run, so load_data can fetch the systems and their energy in one request
+SerialCacheFile = "../carrierSerials.state"
+
+def loadSerials() -> List[str]:
+    try:
+        with open(SerialCacheFile, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def saveSerials(serials: List[str]):
+    if serials != loadSerials():
+        with open(SerialCacheFile, 'w') as f:
+            json.dump(serials, f)
+
+def clearSerials():
+    try:
+        os.remove(SerialCacheFile)
+    except FileNotFoundError:
+        pass
+
 async def getCarrierData(args) -> Dict[str, Any]:
     username = UserName
     password = PassWord
@@ -33,8 +55,20 @@ async def getCarrierData(args) -> Dict[str, Any]:
     #logger.setLevel("DEBUG") # the gql.transport.aiohttp logs a lot at INFO
 
     try:
-        api_connection = ApiConnectionGraphql(username=username, password=password)
-        systems = await api_connection.load_data()
+        # CARRIER_API_BASE_URL points the collector at a stand-in service, e.g. fakeCarrierServer.py
+        api_connection = ApiConnectionGraphql(username=username, password=password,
+                                              base_url=os.environ.get("CARRIER_API_BASE_URL"),
+                                              serials=loadSerials())
+        try:
+            systems = await api_connection.load_data(batched=True)
+        except Exception as error:
+            # e.g. a cached serial that's no longer valid: forget them, so a failed retry doesn't leave them behind
+            logging.warning("batched load with the cached serials %s failed (%s), loading them one by one" % (
+                api_connection.known_serials, error))
+            clearSerials()
+            api_connection.known_serials = []
+            systems = await api_connection.load_data()
+        saveSerials(api_connection.known_serials)
         logging.debug("API connected. %d systems\n" % (len(systems)))
         if args.debug:
             for system in systems:
@@ -49,21 +83,34 @@ async def getCarrierData(args) -> Dict[str, Any]:
         return systems
 
 # select the fields we want to record on an hourly (RealTime) basis from the larger carrier dictionary
-status_fields = [
-  [ 'outdoor_temperature', 'out_temp' ],
-  [ 'airflow_cfm', 'airflow_cfm' ],
-  [ 'blower_rpm', 'blower_rpm' ],
-  [ 'humidifier_on', 'humidifier' ],
-  [ 'outdoor_unit_operational_status', 'outdoor_status' ],
-  [ 'indoor_unit_operational_status', 'indoor_status' ],
-]
-zone_fields = [
-  [ 'current_activity', 'hp_profile' ],
-  [ 'conditioning', 'conditioning' ],
-  [ 'temperature', 'in_temp' ],
-  [ 'humidity', 'humidity' ],
-  [ 'fan', 'fan' ],
-]
+# the mappings are in fieldMaps.json
+fieldMaps = loadFieldMaps()
+extractStatus = compileFieldMap(fieldMaps["status"], "carrier status")
+extractZone = compileFieldMap(fieldMaps["zone"], "carrier status-zone")
+
+def _mapPaths(entries: List[Dict[str, Any]], prefix: str) -> List[str]:
+    """ the System.to_dict paths a field map reads from, e.g. status.outdoor_temperature """
+    paths = []
+    for entry in entries:
+        source = entry["from"]
+        first = source.split(".")[0] if isinstance(source, str) else str(source[0])
+        paths.append(prefix + first)
+    return paths
+
+# only these are built from each System (see carrier_api.util.project), not the whole of its __repr__,
+# so e.g. the config and its zone schedules aren't evaluated for a realtime sample
+RealTimeFields = projection_tree(["serial", "status.zones.id"] + _mapPaths(fieldMaps["status"], "status.")
+                                 + _mapPaths(fieldMaps["zone"], "status.zones."))
+
+def systemDicts(systems: List[Any], fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """ the systems as dicts of only fields; dicts (e.g. a whole __repr__) are passed through """
+    return [system if isinstance(system, dict) else system.to_dict(fields) for system in systems]
+
+def selectStatusFields(status : Dict[str, Any]) -> Dict[str, Any]:
+    return extractStatus(status)
+
+def selectZoneFields(zone : Dict[str, Any]) -> Dict[str, Any]:
+    return extractZone(zone)
 
 def selectRealTimeData(collected_data : Dict[str, Any]) -> Dict[str, Any]:
     selected_data = {}
@@ -73,45 +120,43 @@ def selectRealTimeData(collected_data : Dict[str, Any]) -> Dict[str, Any]:
     selected_data.__setitem__ ("TIME", now)
 
     status = collected_data['status']
-    for field in status_fields:
-        try:
-          if field[1] == "humidifier_on" :
-            # json doesnt like python's True/False
-            if status[field[0]] == True:
-              selected_data.__setitem__ (field[1], "on")
-            elif status[field[0]] == False:
-              selected_data.__setitem__ (field[1], "off")
-            else:
-              raise ValueError("humidifier_on is not True/False")
-          else:
-            selected_data.__setitem__ (field[1], status[field[0]])
-        except:
-          logging.warning("carrier status is missing %s" % (field[0]))
-
-    zone = status['zones'][0]
-    for field in zone_fields:
-        try:
-          selected_data.__setitem__ (field[1], zone[field[0]])
-        except:
-          logging.warning("carrier status-zone is missing %s" % (field[0]))
+    selected_data.update(selectStatusFields(status))
+    selected_data.update(selectZoneFields(status['zones'][0]))
 
     return selected_data
 
+def selectSystemRealTimeData(collected_data : Dict[str, Any]) -> Dict[str, Any]:
+    status = collected_data['status']
+    system_data = selectStatusFields(status)
+    # Status only keeps the enabled zones
+    system_data["zones"] = {zone['id']: selectZoneFields(zone) for zone in status['zones']}
+    return system_data
+
+def selectAllRealTimeData(collected_data : List[Any]) -> Dict[str, Any]:
+    """
+    the first system's first zone is recorded with the plain field names, as it always has been.
+    When there is more than one system or zone, all of them are also recorded under
+    "systems": { serial: { status fields, "zones": { zone id: { zone fields } } } }
+    collected_data is the System objects, or their dicts
+    """
+    collected_data = systemDicts(collected_data, RealTimeFields)
+    selected_data = selectRealTimeData(collected_data[0])
+    if len(collected_data) > 1 or len(collected_data[0]['status']['zones']) > 1:
+        selected_data["systems"] = {system['serial']: selectSystemRealTimeData(system) for system in collected_data}
+    return selected_data
+
 # select the data that only is available on a Daily basis
-daily_status_fields = [
-  [ 'filter_used', 'hp_filter%' ],
-  [ 'humidity_level', 'humid_filter%' ],
-]
+extractDailyStatus = compileFieldMap(fieldMaps["daily_status"], "carrier status")
 # ['energy']['periods'][0]
-daily_energy_fields = [
-  [ 'id', 'id' ],
-  [ 'cooling', 'cool_btu' ],
-  [ 'hp_heat', 'heat_kWh' ],
-  [ 'fan', 'hp_fan' ],
-  [ 'gas', 'furnace_gal' ],
-  [ 'fan_gas', 'furnace_fan' ],
-  [ 'loop_pump', 'loop_pump' ],
-]
+extractDailyEnergy = compileFieldMap(fieldMaps["daily_energy"], "carrier energy")
+DailyFields = projection_tree(["serial"] + _mapPaths(fieldMaps["daily_status"], "status.")
+                              + _mapPaths(fieldMaps["daily_energy"], "energy.periods."))
+
+def selectDailyFields(collected_data : Dict[str, Any]) -> Dict[str, Any]:
+    selected_data = extractDailyStatus(collected_data['status'])
+    selected_data.update(extractDailyEnergy(collected_data['energy']['periods'][0]))
+    return selected_data
+
 def selectDailyData(collected_data : Dict[str, Any]) -> Dict[str, Any]:
     selected_data = {}
     today = str(datetime.date.today())
@@ -119,20 +164,15 @@ def selectDailyData(collected_data : Dict[str, Any]) -> Dict[str, Any]:
     now = datetime.datetime.now().strftime('%H:%M:%S')
     selected_data.__setitem__ ("TIME", "Daily")
 
-    status = collected_data['status']
-    for field in daily_status_fields:
-        try:
-          selected_data.__setitem__ (field[1], status[field[0]])
-        except:
-          logging.warning("carrier status is missing %s" % (field))
-
-    energy = collected_data['energy']['periods'][0]
-    for field in daily_energy_fields:
-        try:
-          selected_data.__setitem__ (field[1], energy[field[0]])
-        except:
-          logging.warning("carrier energy is missing %s" % (field))
+    selected_data.update(selectDailyFields(collected_data))
+    return selected_data
 
+def selectAllDailyData(collected_data : List[Any]) -> Dict[str, Any]:
+    """ like selectAllRealTimeData, but the daily fields are per system, not per zone """
+    collected_data = systemDicts(collected_data, DailyFields)
+    selected_data = selectDailyData(collected_data[0])
+    if len(collected_data) > 1:
+        selected_data["systems"] = {system['serial']: selectDailyFields(system) for system in collected_data}
     return selected_data
 
 ##########
@@ -162,12 +202,9 @@ async def main():
     getDataTask = asyncio.create_task (getCarrierData(args))
     # can do other stuff here . . .
     collected_data = await getDataTask
-    if len(collected_data) != 1:
-        logging.error("\nresulted in %d systems\n" % len(collected_data))
+    if len(collected_data) == 0:
+        logging.error("\nresulted in no systems\n")
         exit(1)
-    else:
-        # just want the data. I only have one system
-        collected_data = collected_data[0] #.__repr__()
 
     if args.debug:
         # write the raw collected data to a file for comparison
@@ -178,14 +215,14 @@ async def main():
     if args.raw:
         #print (str(collected_data) + '\n')
         # selected_data = collected_data[0]
-        selected_data = collected_data.__repr__()
+        selected_data = [system.__repr__() for system in collected_data]
     elif args.realtime and args.daily:
         logging.error ("You must specify only ONE of realtime and daily")
         exit(1)
     elif args.realtime:
-        selected_data = selectRealTimeData(collected_data.__repr__())
+        selected_data = selectAllRealTimeData(collected_data)
     elif args.daily:
-        selected_data = selectDailyData(collected_data.__repr__())
+        selected_data = selectAllDailyData(collected_data)
     else:
         logging.error ("You must specify either --raw, --realtime or --daily")
         exit(1)
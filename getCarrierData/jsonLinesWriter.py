@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+  append the collected rows to CarrierRealTimeData.json / CarrierDailyData.json safely:
+  - an advisory lock (fcntl.flock on FILE.lock), so the -R and -D cron jobs can overlap near midnight
+  - the rows are buffered, and written with a single O_APPEND write, so a reader only ever sees whole lines
+  - fsync after every flush, on close, or never (see FsyncPolicies)
+  - monthly rotation: the first write in a new month moves what was written last month into
+    a compressed segment beside it, e.g. CarrierRealTimeData.json -> CarrierRealTimeData.2025-09.json.gz
+    so the working file stays small, and Dropbox syncs a small delta
+
+  Usage, to rotate by hand (e.g. before copying the files somewhere):
+    python3 jsonLinesWriter.py [-d] [--force] ../CarrierRealTimeData.json ../CarrierDailyData.json
+"""
+import argparse
+import datetime
+import fcntl
+import json
+import logging
+import os
+from sys import exit
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+# "flush": fsync after each write, "close": once, when the writer is closed, "none": leave it to the OS
+FsyncPolicies = ["flush", "close", "none"]
+
+def segmentFileName(path: str, month: str) -> str:
+    """ CarrierRealTimeData.json, 2025-09 -> CarrierRealTimeData.2025-09.json.gz """
+    stem, ext = os.path.splitext(path)
+    return "%s.%s%s.gz" % (stem, month, ext)
+
+def archiveFiles(path: str) -> List[str]:
+    """ the files holding what was ever written to path, oldest first: the Old archive (see syncCronData.py),
+        the compressed monthly segments, then path itself. only the ones that exist """
+    directory, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    segments = sorted(os.path.join(directory, f) for f in os.listdir(directory or ".")
+                      if f.startswith(stem + ".") and f.endswith(ext + ".gz"))
+    files = [os.path.join(directory, "Old" + name)] + segments + [path]
+    return [f for f in files if os.path.exists(f)]
+
+def openJsonLines(path: str) -> TextIO:
+    """ open a working file or a compressed segment for reading """
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def readJsonLines(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """ the rows of each working file or compressed segment, in order, skipping blank lines """
+    for path in paths:
+        with openJsonLines(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class JsonLinesWriter:
+    """ a locked, buffered, monthly rotating writer of one json document per line; use it as a context manager """
+    def __init__ (self, path: str, fsync: str = "close", buffer_lines: int = 100):
+        if fsync not in FsyncPolicies:
+            raise ValueError("fsync must be one of %s, not %s" % (FsyncPolicies, fsync))
+        self.path = path
+        self.fsync = fsync
+        self.buffer_lines = buffer_lines
+        self.buffer: List[str] = []
+        self.line_count = 0
+        self.lock_fd = None
+        self.fd = None
+
+    def __enter__ (self):
+        self.open()
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open (self):
+        self.lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        # blocks until the other job is done with the file
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        self.rotate()
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write (self, row: Dict[str, Any]):
+        self.buffer.append(json.dumps(row) + "\n")
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush (self):
+        if not self.buffer:
+            return
+        data = "".join(self.buffer).encode("utf-8")
+        written = 0
+        while written < len(data):
+            # one write for the whole buffer, unless the OS takes less of it
+            written += os.write(self.fd, data[written:])
+        self.line_count += len(self.buffer)
+        self.buffer = []
+        if self.fsync == "flush":
+            os.fsync(self.fd)
+
+    def close (self):
+        try:
+            if self.fd is not None:
+                self.flush()
+                if self.fsync == "close":
+                    os.fsync(self.fd)
+                os.close(self.fd)
+                self.fd = None
+                logging.debug("wrote %d lines to %s" % (self.line_count, self.path))
+        finally:
+            if self.lock_fd is not None:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+    def rotate (self, force: bool = False) -> str | None:
+        """ move the working file into the segment for the month it was last written, if that was before this month.
+            must hold the lock. returns the segment name, or None """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        if stat.st_size == 0:
+            return None
+        month = datetime.date.fromtimestamp(stat.st_mtime).strftime("%Y-%m")
+        if not force and month == datetime.date.today().strftime("%Y-%m"):
+            return None
+
+        import gzip
+        import shutil
+        segment = segmentFileName(self.path, month)
+        tmp_name = segment + ".tmp"
+        with open(tmp_name, "wb") as out:
+            if os.path.exists(segment):
+                # already rotated this month (--force); a gzip file may hold several members
+                with open(segment, "rb") as old:
+                    shutil.copyfileobj(old, out)
+            with open(self.path, "rb") as src, gzip.GzipFile(fileobj=out, mode="wb", mtime=stat.st_mtime) as gz:
+                shutil.copyfileobj(src, gz)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_name, segment)
+        # the segment is safely in place, so the working file can start over
+        os.truncate(self.path, 0)
+        _fsync(os.path.dirname(os.path.abspath(segment)))
+        logging.info("rotated %d bytes of %s into %s" % (stat.st_size, self.path, segment))
+        return segment
+
+def appendRows(path: str, rows: List[Dict[str, Any]], fsync: str = "close") -> int:
+    with JsonLinesWriter(path, fsync=fsync) as writer:
+        for row in rows:
+            writer.write(row)
+    return writer.line_count
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rotate collected JSON files into monthly compressed segments"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-f", "--force", action="store_true", help="rotate even if the file was written this month" )
+    parser.add_argument( 'files', nargs='+', help="working files, e.g. ../CarrierRealTimeData.json" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    for path in args.files:
+        writer = JsonLinesWriter(path)
+        # open() rotates anything from an earlier month
+        writer.open()
+        try:
+            if args.force:
+                writer.rotate(force=True)
+        finally:
+            writer.close()
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 import argparse
 import datetime
+from itertools import chain, islice, zip_longest
 import json
 import logging
+import os
 import re
-from openpyxl import load_workbook
+from openpyxl import load_workbook, Workbook
+from openpyxl.formula.translate import Translator
 from sys import exit, stdout, exc_info
 import traceback
+from carrierDataSQLite import openDB, previousRow, readRows
+from checkGaps import checkGaps, newerRows, writeGapReport, DailyCadence, RealTimeCadence
+from deadband import reconstructRows
+from fieldMap import flattenSystems
+from jsonLinesWriter import archiveFiles, readJsonLines
 
 # DataDir = '/Users/jburgess/Library/CloudStorage/Dropbox/CarrierDataCollection/'
 # on MY mac, this is an symlink to the above; on the MacMini, this is IT
@@ -25,6 +33,9 @@ timeRe = re.compile (timePattern)
 
 # fast efficient way to turn numbers as strings into int or float or date or time
 def str2num(s):
+  if isinstance(s, (int, float)):
+    # already a number (carrier values, or rows from sqlite). int() would truncate a float
+    return s
   try:
       return int(s)
   except:
@@ -50,8 +61,115 @@ def str2num(s):
         logging.debug( "".join( lines ))
         return s
 
-def loadJsonToExcel (jsonFile: str, sheet_name: str):
+# str2num is the generic path, and costs several exceptions per cell for anything that isn't an int.
+# Most columns always hold the same type, so pick a converter per column once, from the first
+# SampleRows rows, and fall back to str2num only when a cell doesn't match its column's converter.
+SampleRows = 20
+
+# each converter raises ValueError or TypeError when the value isn't its type
+def _toInt(s):
+  if isinstance(s, float):
+    raise ValueError(s)
+  return int(s)
+
+def _toFloat(s):
+  if isinstance(s, (int, float)):
+    return s
+  return float(s)
+
+def _toDate(s):
+  return datetime.date.fromisoformat(s)
+
+def _toTime(s):
+  return datetime.time.fromisoformat(s)
+
+_numericStart = set('0123456789+-. "')
+def _toStr(s):
+  if not isinstance(s, str) or s[:1] in _numericStart:
+    # might be something str2num would convert, so let it
+    raise ValueError(s)
+  return s
+
+# in the order to try them
+converters = [ _toInt, _toFloat, _toDate, _toTime, _toStr ]
+
+def inferConverter (field: str, samples: list):
+  for converter in converters:
+    try:
+      for value in samples:
+        converter(value)
+      return converter
+    except (ValueError, TypeError):
+      continue
+  return str2num
+
+def compileConverters (field_list: list, sample_rows: list) -> list:
+  """ return [column index, field name, converter] for each field loaded from the input """
+  compiled = []
+  sample_rows = [flattenSystems(row) for row in sample_rows]
+  for i, field in enumerate(field_list):
+    if (field == None) or (field == "") or (field[0] == '*'):
+      continue
+    samples = [row[field] for row in sample_rows if field in row]
+    converter = inferConverter(field, samples) if samples else str2num
+    logging.debug(f"column {i} {field} uses {converter.__name__}")
+    compiled.append([i, field, converter])
+  return compiled
+
+def convertRow (compiled: list, input_dict: dict, num_fields: int, line_count: int) -> list:
+  new_row = [None] * num_fields
+  if "systems" in input_dict:
+    input_dict = flattenSystems(input_dict)
+  for i, field, converter in compiled:
+    try:
+      value = input_dict[field]
+    except KeyError:
+      logging.error(f"line {line_count} in the input is missing field {field}")
+      continue
+    if value is None:
+      # a placeholder for a missing row
+      continue
+    try:
+      new_row[i] = converter(value)
+    except (ValueError, TypeError):
+      new_row[i] = str2num(value)
+  return new_row
+
+def iterJsonFile (jsonFile: str):
   logging.debug (f"Read Json file {DataDir}{jsonFile}")
+  # a working file, or a compressed monthly segment
+  return readJsonLines([DataDir + jsonFile])
+
+def loadJsonToExcel (jsonFile: str, sheet_name: str, partition: str = None, gaps: str = None, previous: dict = None,
+                     gap_report: str = None):
+  loadRowsToExcel (iterJsonFile(jsonFile), sheet_name, partition, gaps, previous, gap_report)
+
+def loadSqliteToExcel (dbFile: str, sheet_name: str, since: str, until: str = None, partition: str = None, gaps: str = None,
+                       gap_report: str = None):
+  # the sheet names are the same as the table names
+  db = openDB(dbFile)
+  loadRowsToExcel (readRows(db, sheet_name, since, until), sheet_name, partition, gaps, previousRow(db, sheet_name, since), gap_report)
+  db.close()
+
+def gapReportFileName (sheet_name: str) -> str:
+  return DataDir + ExcelFile.replace('.xlsx', f" {sheet_name} gaps.csv")
+
+def loadRowsToExcel (rows, sheet_name: str, partition: str = None, gaps: str = None, previous: dict = None,
+                     gap_report: str = None):
+  # put back the rows a deadband recording held back, so they aren't taken for gaps.
+  # previous is the last row already loaded, the one the held rows before the first new row copy
+  rows = reconstructRows(rows, previous)
+  if gaps:
+    # sort, drop the duplicates, and report (or fill) the missed cron runs before loading
+    cadence = DailyCadence if sheet_name == 'Daily' else RealTimeCadence
+    rows, found = checkGaps(rows, cadence, fill=(gaps == 'fill'), previous=previous)
+    if found:
+      # next to the workbook, unless --gap-report says where
+      writeGapReport(found, gap_report or gapReportFileName(sheet_name))
+
+  if partition:
+    streamRowsToExcel (rows, sheet_name, partition)
+    return
 
   wb = load_workbook(DataDir + ExcelFile)
   logging.debug (f"worksheets in {ExcelFile} are: {wb.sheetnames}")
@@ -64,29 +182,162 @@ def loadJsonToExcel (jsonFile: str, sheet_name: str):
   num_fields = len(field_list)
   logging.debug(f"{num_fields} field names in row 1: {field_list}")
 
-  # now load all the saved data into excel, one row at a time, arranged by the field_list columns
-  with open(DataDir + jsonFile, 'r') as jf:
-    new_line_count = 0
-    for line in jf:
-      new_row = [None] * num_fields
-      input_dict = json.loads(line)
-      new_line_count +=1
-      i = -1 # because of the PRE-increment
-      for field in field_list:
-        i+=1
-        if (field == None) or (field == "") or (field[0] == '*'):
-          continue
-        if field in input_dict:
-          new_row[i] = str2num ( input_dict[field] )
-        else:
-          logging.error(f"line {new_line_count} in the input is missing field {field}")
+  # infer the column converters from the first rows, then put them back in front of the rest
+  rows = iter(rows)
+  sample_rows = list(islice(rows, SampleRows))
+  compiled = compileConverters(field_list, sample_rows)
 
-      logging.debug(f"new row #{new_line_count}: {new_row}")
-      ws.append(new_row)
+  # now load all the saved data into excel, one row at a time, arranged by the field_list columns
+  new_line_count = 0
+  for input_dict in chain(sample_rows, rows):
+    new_line_count +=1
+    new_row = convertRow(compiled, input_dict, num_fields, new_line_count)
+    logging.debug(f"new row #{new_line_count}: {new_row}")
+    ws.append(new_row)
 
   wb.save(DataDir + ExcelFile)
   logging.info (f"appended {new_line_count} rows")
 
+##########
+# Streaming export.
+# load_workbook() reads and rewrites every row ever loaded, so the time and memory of a load
+# grow forever. Instead, read only the layout (row 1 header, and the row 2 formulas for the
+# '*' columns) from the main workbook in read-only mode, and stream the rows through write-only
+# workbooks, one per month or year, e.g. "carrier infinity usage stats RealTime 2025-12.xlsx"
+# Each load then only touches the partitions the new rows fall in.
+PartitionKeys = {
+  'month': lambda date: str(date)[:7],
+  'year': lambda date: str(date)[:4],
+}
+
+def readSheetLayout (sheet_name: str):
+  """ return the row 1 field list, and the row 2 formula (or None) for each column """
+  wb = load_workbook(DataDir + ExcelFile, read_only=True)
+  ws = wb[sheet_name]
+  field_list = []
+  formulas = []
+  layout_rows = list(ws.iter_rows(values_only=True, min_row=1, max_row=2))
+  if len(layout_rows) < 2:
+    # no data rows yet, so no formulas to copy
+    layout_rows.append(())
+  for header, template in zip_longest(*layout_rows):
+    field_list.append(header)
+    if isinstance(header, str) and header.startswith('*') and isinstance(template, str) and template.startswith('='):
+      formulas.append(template)
+    else:
+      formulas.append(None)
+  wb.close()
+  logging.debug(f"{len(field_list)} field names in row 1: {field_list}")
+  return field_list, formulas
+
+def partitionFileName (sheet_name: str, key: str) -> str:
+  return DataDir + ExcelFile.replace('.xlsx', f" {sheet_name} {key}.xlsx")
+
+class SheetWriter:
+  """ appends rows to a write-only sheet, filling in the '*' columns from their row 2 formula """
+  def __init__ (self, ws, formulas: list):
+    self.ws = ws
+    # parsing the formula is the slow part, so parse each once, and only move it to each row
+    self.translators = [[i, Translator(formula, origin="A2")] for i, formula in enumerate(formulas) if formula is not None]
+    self.row_count = 0
+
+  def appendAsIs (self, row):
+    self.row_count += 1
+    self.ws.append(row)
+
+  def append (self, new_row: list):
+    self.row_count += 1
+    for i, translator in self.translators:
+      new_row[i] = translator.translate_formula(f"A{self.row_count}")
+    self.ws.append(new_row)
+
+class PartitionWriter (SheetWriter):
+  """ a write-only workbook for one partition, seeded with the rows already in that partition's file """
+  def __init__ (self, file_name: str, sheet_name: str, field_list: list, formulas: list):
+    self.file_name = file_name
+    self.wb = Workbook(write_only=True)
+    super().__init__(self.wb.create_sheet(sheet_name), formulas)
+    if os.path.exists(file_name):
+      old_wb = load_workbook(file_name, read_only=True)
+      # the first row is the header, so this copies it, too
+      for row in old_wb[sheet_name].iter_rows(values_only=True):
+        self.appendAsIs(row)
+      old_wb.close()
+      logging.debug(f"{file_name} had {self.row_count} rows")
+    else:
+      self.appendAsIs(field_list)
+
+  def save (self):
+    # write beside the original and rename, so an interrupted save doesn't lose the partition
+    tmp_name = self.file_name + ".tmp"
+    self.wb.save(tmp_name)
+    os.replace(tmp_name, self.file_name)
+    logging.info (f"{self.file_name} now has {self.row_count} rows")
+
+def streamRowsToExcel (rows, sheet_name: str, partition: str):
+  field_list, formulas = readSheetLayout(sheet_name)
+  num_fields = len(field_list)
+  partition_key = PartitionKeys[partition]
+
+  rows = iter(rows)
+  sample_rows = list(islice(rows, SampleRows))
+  compiled = compileConverters(field_list, sample_rows)
+
+  writers = {}
+  new_line_count = 0
+  for input_dict in chain(sample_rows, rows):
+    new_line_count +=1
+    key = partition_key(input_dict.get("DATE"))
+    writer = writers.get(key)
+    if writer is None:
+      writer = PartitionWriter(partitionFileName(sheet_name, key), sheet_name, field_list, formulas)
+      writers[key] = writer
+    writer.append(convertRow(compiled, input_dict, num_fields, new_line_count))
+
+  for writer in writers.values():
+    writer.save()
+  logging.info (f"streamed {new_line_count} rows into {len(writers)} {partition} partition(s)")
+
+##########
+# Full rebuild.
+# Regenerate the RealTime and Daily sheets straight from the JSON archives, with the layout of the
+# main workbook. The rows go through a write-only workbook, which writes each row to a temporary
+# file as it's appended, so memory stays the same however many years are rebuilt. Only the
+# RealTime and Daily sheets are written; the other sheets of the main workbook aren't copied.
+ArchiveStems = {
+  'RealTime': 'CarrierRealTimeData',
+  'Daily': 'CarrierDailyData',
+}
+RebuiltFile = ExcelFile.replace('.xlsx', ' rebuilt.xlsx')
+
+def sheetArchiveFiles (sheet_name: str) -> list:
+  """ the archive, the compressed monthly segments, then the working file, oldest first """
+  return [os.path.basename(name) for name in archiveFiles(DataDir + ArchiveStems[sheet_name] + ".json")]
+
+def rebuildWorkbook (output: str, sheet_names: list):
+  layouts = {sheet_name: readSheetLayout(sheet_name) for sheet_name in sheet_names}
+  if output == ExcelFile:
+    logging.warning (f"replacing {ExcelFile}: only its {sheet_names} sheets will be in it")
+  wb = Workbook(write_only=True)
+  for sheet_name, (field_list, formulas) in layouts.items():
+    files = sheetArchiveFiles(sheet_name)
+    logging.info (f"rebuilding {sheet_name} from {files}")
+    rows = newerRows(reconstructRows(chain.from_iterable(iterJsonFile(name) for name in files)))
+    sample_rows = list(islice(rows, SampleRows))
+    compiled = compileConverters(field_list, sample_rows)
+    num_fields = len(field_list)
+
+    writer = SheetWriter(wb.create_sheet(sheet_name), formulas)
+    writer.appendAsIs(field_list)
+    for input_dict in chain(sample_rows, rows):
+      writer.append(convertRow(compiled, input_dict, num_fields, writer.row_count))
+    logging.info (f"{sheet_name} has {writer.row_count - 1} rows")
+
+  tmp_name = DataDir + output + ".tmp"
+  wb.save(tmp_name)
+  os.replace(tmp_name, DataDir + output)
+  logging.info (f"wrote {DataDir + output}")
+
 ##########
 def main():
   parser = argparse.ArgumentParser(
@@ -96,6 +347,19 @@ def main():
   parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
   parser.add_argument( "-R", "--RealTime", action="store_true", help="Load JSON RealTime data" )
   parser.add_argument( "-D", "--Daily", action="store_true", help="Load JSON Daily Fields" )
+  parser.add_argument( "-s", "--sqlite", help="read from this sqlite database instead of the JSON file" )
+  parser.add_argument( "--since", help="with --sqlite, first DATE to load (yyyy-mm-dd)" )
+  parser.add_argument( "--until", help="with --sqlite, last DATE to load (yyyy-mm-dd)" )
+  parser.add_argument( "--previous",
+    help="the last row already loaded, as JSON, to rebuild the rows a deadband recording held back before the first new one" )
+  parser.add_argument( "-g", "--gaps", choices=['report', 'fill'],
+    help="sort and de-duplicate the rows, and report the missing rows, or fill them with empty rows" )
+  parser.add_argument( "--gap-report",
+    help="with --gaps, write the gaps found to this CSV file (default 'carrier infinity usage stats <sheet> gaps.csv')" )
+  parser.add_argument( "-p", "--partition", choices=PartitionKeys.keys(),
+    help="stream into per-month or per-year workbooks instead of loading the whole workbook" )
+  parser.add_argument( "--rebuild", nargs="?", const=RebuiltFile,
+    help=f"regenerate the RealTime and Daily sheets (or only -R or -D) from the JSON archives into this workbook (default '{RebuiltFile}')" )
   args = parser.parse_args()
 
   if args.debug:
@@ -104,14 +368,29 @@ def main():
   else:
     logging.basicConfig(level=logging.INFO)
   logging.debug ("Args=[ %s ]" % args)
+  previous = json.loads(args.previous) if args.previous else None
+
+  if args.rebuild:
+    if args.RealTime == args.Daily:
+      sheet_names = list(ArchiveStems)
+    else:
+      sheet_names = ['RealTime' if args.RealTime else 'Daily']
+    rebuildWorkbook (args.rebuild, sheet_names)
+    exit(0)
+
+  if args.sqlite and not args.since:
+    logging.error ("--sqlite requires --since, or rows already in the sheet would be loaded again")
+    exit(1)
 
   if args.RealTime and args.Daily:
     logging.error ("You must specify only ONE of RealTime and Daily")
     exit(1)
+  elif args.sqlite and (args.RealTime or args.Daily):
+    loadSqliteToExcel ( args.sqlite, 'RealTime' if args.RealTime else 'Daily', args.since, args.until, args.partition, args.gaps, args.gap_report )
   elif args.RealTime:
-    loadJsonToExcel ( 'CarrierRealTimeData.json', 'RealTime' )
+    loadJsonToExcel ( 'CarrierRealTimeData.json', 'RealTime', args.partition, args.gaps, previous, args.gap_report )
   elif args.Daily:
-    loadJsonToExcel ( 'CarrierDailyData.json', 'Daily' )
+    loadJsonToExcel ( 'CarrierDailyData.json', 'Daily', args.partition, args.gaps, previous, args.gap_report )
   else:
     logging.error ("You must specify either --RealTime or --Daily")
     exit(1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+  running count, min, max, mean and variance of every numeric realtime field (in_temp, out_temp, humidity,
+  each Arduino field, ...) by day, ISO week, month and all-time, kept in StatsFile so no summary ever
+  rescans the JSON files.
+
+  Each field of each period is an accumulator {n, mean, m2, min, max}, updated with Welford's method, so
+  adding a sample and reading a summary both cost the same whatever the history. Two accumulators merge
+  exactly (Chan et al.), so the state files of two collectors, or of two stretches of files, add up.
+  --rebuild puts back the rows a deadband recording held back (see deadband.py) before adding them.
+  Fields of more than one system, or zone, are kept as serial/field and serial/zone/field.
+
+  Usage (as library, carrierDataCron.py -R --stats does this):
+    updateStats(row)
+
+  Usage (CLI):
+    the summaries of a period, all of its keys or one (e.g. 2025-10, 2025-W42), optionally one field
+      python3 runningStats.py [-d] [-p day|week|month|all] [-k KEY] [-f FIELD]
+    build a state file from JSON files, or merge state files, into -o (default StatsFile)
+      python3 runningStats.py [-d] --rebuild ../OldCarrierRealTimeData.json ../CarrierRealTimeData.json
+      python3 runningStats.py [-d] --merge -o merged.state ../runningStats.state mini.state
+"""
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+from sys import exit, stdout
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+StatsFile = "../runningStats.state"
+StatsVersion = 1
+Periods = ["day", "week", "month", "all"]
+# days older than this are dropped from the state, weeks and months are kept
+RetainDays = 400
+# never summarized
+SkipFields = ["DATE", "TIME", "HELD"]
+
+##### one accumulator
+def newAccumulator() -> Dict[str, float]:
+    return { "n": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None }
+
+def addSample(acc: Dict[str, float], value: float):
+    """ Welford's update """
+    n = acc["n"] + 1
+    delta = value - acc["mean"]
+    acc["mean"] += delta / n
+    acc["m2"] += delta * (value - acc["mean"])
+    acc["n"] = n
+    acc["min"] = value if acc["min"] is None else min(acc["min"], value)
+    acc["max"] = value if acc["max"] is None else max(acc["max"], value)
+
+def mergeAccumulators(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    """ the accumulator of both sets of samples """
+    if a["n"] == 0:
+        return dict(b)
+    if b["n"] == 0:
+        return dict(a)
+    n = a["n"] + b["n"]
+    delta = b["mean"] - a["mean"]
+    return {
+        "n": n,
+        "mean": a["mean"] + delta * b["n"] / n,
+        "m2": a["m2"] + b["m2"] + delta * delta * a["n"] * b["n"] / n,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+    }
+
+def summary(acc: Dict[str, float]) -> Dict[str, Any]:
+    n = acc["n"]
+    variance = acc["m2"] / (n - 1) if n > 1 else 0.0
+    return { "n": n, "min": acc["min"], "max": acc["max"], "mean": acc["mean"],
+             "variance": variance, "stddev": math.sqrt(variance) }
+
+##### the state
+def newState() -> Dict[str, Any]:
+    return { "version": StatsVersion, **{period: {} for period in Periods} }
+
+def loadStats(statsFile: str = StatsFile) -> Dict[str, Any]:
+    try:
+        with open(statsFile, 'r') as f:
+            state = json.load(f)
+        if state.get("version") == StatsVersion:
+            return state
+        logging.info("%s is from an older version, starting over" % statsFile)
+    except (OSError, ValueError):
+        pass
+    return newState()
+
+def saveStats(state: Dict[str, Any], statsFile: str = StatsFile):
+    with open(statsFile + ".tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(statsFile + ".tmp", statsFile)
+
+def periodKeys(date: datetime.date) -> Dict[str, str]:
+    year, week, _weekday = date.isocalendar()
+    return { "day": date.isoformat(), "week": "%04d-W%02d" % (year, week), "month": date.strftime("%Y-%m"), "all": "all" }
+
+def numericFields(row: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    """
+    (name, value) of the numeric fields of the row, serial/field for those of each system,
+    and serial/zone/field for those of each of its zones
+    """
+    for field, value in row.items():
+        if field in SkipFields:
+            continue
+        if field in ("systems", "zones") and isinstance(value, dict):
+            for key, fields in value.items():
+                if isinstance(fields, dict):
+                    for name, number in numericFields(fields):
+                        yield "%s/%s" % (key, name), number
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            continue
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        if math.isfinite(number):
+            yield field, number
+
+def addRow(state: Dict[str, Any], row: Dict[str, Any]) -> bool:
+    """ add the row to the accumulators of its day, week, month and all-time; False when it has no DATE """
+    try:
+        date = datetime.date.fromisoformat(row["DATE"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    for period, key in periodKeys(date).items():
+        fields = state[period].setdefault(key, {})
+        for field, value in numericFields(row):
+            addSample(fields.setdefault(field, newAccumulator()), value)
+    return True
+
+def pruneDays(state: Dict[str, Any], today: datetime.date):
+    oldest = (today - datetime.timedelta(days=RetainDays)).isoformat()
+    for day in [day for day in state["day"] if day < oldest]:
+        del state["day"][day]
+
+def mergeStates(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """ the state of the samples of both """
+    merged = newState()
+    for period in Periods:
+        for source in (a, b):
+            for key, fields in source[period].items():
+                target = merged[period].setdefault(key, {})
+                for field, acc in fields.items():
+                    target[field] = mergeAccumulators(target.get(field, newAccumulator()), acc)
+    return merged
+
+def updateStats(row: Dict[str, Any], statsFile: str = StatsFile):
+    """ add one collected row to StatsFile """
+    state = loadStats(statsFile)
+    if addRow(state, row):
+        pruneDays(state, datetime.date.fromisoformat(row["DATE"]))
+        saveStats(state, statsFile)
+
+def _readJson(fileNames: List[str]) -> Iterable[Dict[str, Any]]:
+    from deadband import reconstructRows
+    from jsonLinesWriter import readJsonLines
+    return reconstructRows(readJsonLines(fileNames))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Running min/max/mean/variance of the realtime fields by day, week, month and all-time"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-p", "--period", choices=Periods, default="all", help="period to summarize (default all)" )
+    parser.add_argument( "-k", "--key", help="only this day, week or month, e.g. 2025-10-19, 2025-W42, 2025-10" )
+    parser.add_argument( "-f", "--field", help="only this field" )
+    parser.add_argument( "--rebuild", action="store_true", help="build the state from the JSON files given" )
+    parser.add_argument( "--merge", action="store_true", help="merge the state files given" )
+    parser.add_argument( "-o", "--output", default=StatsFile, help="with --rebuild or --merge, the state file to write (default %s)" % StatsFile )
+    parser.add_argument( "--state", default=StatsFile, help="state file to summarize (default %s)" % StatsFile )
+    parser.add_argument( 'files', nargs='*', help="JSON files for --rebuild, state files for --merge" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.rebuild or args.merge:
+        if not args.files:
+            logging.error ("--rebuild and --merge need files")
+            exit(1)
+        if args.rebuild:
+            state = newState()
+            rows = sum(addRow(state, row) for row in _readJson(args.files))
+            logging.info("added %d rows" % rows)
+        else:
+            state = newState()
+            for fileName in args.files:
+                state = mergeStates(state, loadStats(fileName))
+        saveStats(state, args.output)
+        logging.info("wrote %s" % args.output)
+        exit(0)
+
+    state = loadStats(args.state)
+    keys = [args.key] if args.key else sorted(state[args.period])
+    out = stdout
+    out.write("%s\tfield\tn\tmin\tmax\tmean\tstddev\n" % args.period)
+    for key in keys:
+        for field, acc in sorted(state[args.period].get(key, {}).items()):
+            if args.field and field != args.field:
+                continue
+            s = summary(acc)
+            out.write("%s\t%s\t%d\t%g\t%g\t%.3f\t%.3f\n" % (key, field, s["n"], s["min"], s["max"], s["mean"], s["stddev"]))
+    exit(0)
+
+if __name__ == "__main__":
+    main()
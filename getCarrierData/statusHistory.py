@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+  keep, and look back through, the second by second history of the systems' status,
+  from the websocket deltas WebsocketDataUpdater applies (see carrier_api/status_log.py)
+
+  Listen (logs in with PRIVATE, or CARRIER_API_BASE_URL), logging every delta, with a snapshot every hour:
+    python3 statusHistory.py [-d] --listen ../CarrierStatus.log
+  The raw status of each system at a moment (add --config for the config too):
+    python3 statusHistory.py [-d] --at "2025-12-24 18:30:00" ../CarrierStatus.log
+  The deltas between two moments, one json record per line:
+    python3 statusHistory.py [-d] --changes --since "2025-12-24 18:00" --until "2025-12-24 19:00" ../CarrierStatus.log
+  Fold the deltas older than --keep-days into daily snapshots (not while --listen is running; it compacts itself):
+    python3 statusHistory.py [-d] --compact [--keep-days 7] ../CarrierStatus.log
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+from sys import exit, stdout
+
+from carrier_api.status_log import StatusLog, compact_status_log, read_status_log, state_at
+
+def epoch(when: str | None) -> float | None:
+    return None if when is None else datetime.datetime.fromisoformat(when).timestamp()
+
+async def listen(path: str):
+    from PRIVATE import UserName, PassWord
+    from carrier_api.api_connection_graphql import ApiConnectionGraphql
+    from carrier_api.api_websocket_data_updater import WebsocketDataUpdater
+    api_connection = ApiConnectionGraphql(username=UserName, password=PassWord,
+                                          base_url=os.environ.get("CARRIER_API_BASE_URL"))
+    status_log = StatusLog(path)
+    try:
+        systems = await api_connection.load_data()
+        status_log.snapshot(systems)
+        updater = WebsocketDataUpdater(systems=systems, status_log=status_log)
+        api_connection.api_websocket.callback_add(updater.message_handler)
+        await api_connection.api_websocket.create_task_listener()
+        logging.info("logging %d systems to %s" % (len(systems), path))
+        await api_connection.api_websocket.task_listener
+    finally:
+        status_log.close()
+        logging.info("logged %d deltas" % status_log.delta_count)
+        await api_connection.cleanup()
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Log the websocket status deltas, or look back through them"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-l", "--listen", action="store_true", help="listen to the websocket and log the deltas" )
+    parser.add_argument( "-a", "--at", help="print the raw status of each system at this time (yyyy-mm-dd hh:mm:ss)" )
+    parser.add_argument( "--config", action="store_true", help="with --at, print the config too" )
+    parser.add_argument( "-c", "--changes", action="store_true", help="print the deltas between --since and --until" )
+    parser.add_argument( "--since", help="first time for --changes" )
+    parser.add_argument( "--until", help="last time for --changes" )
+    parser.add_argument( "--compact", action="store_true", help="fold the old deltas into daily snapshots" )
+    parser.add_argument( "--keep-days", type=float, default=7, help="with --compact, days of deltas to keep (default 7)" )
+    parser.add_argument( 'file', help="status log file" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.listen:
+        try:
+            asyncio.run(listen(args.file))
+        except KeyboardInterrupt:
+            pass
+    elif args.at:
+        systems = state_at(args.file, epoch(args.at))
+        if not args.config:
+            systems = {serial: system["status"] for serial, system in systems.items()}
+        json.dump(systems, stdout, indent=2, ensure_ascii=False)
+        stdout.write("\n")
+    elif args.changes:
+        for record in read_status_log(args.file, epoch(args.since), epoch(args.until)):
+            if record["type"] != "snapshot":
+                stdout.write(json.dumps(record) + "\n")
+    elif args.compact:
+        keep_after = datetime.datetime.now().timestamp() - args.keep_days * 86400
+        size_before, size_after = compact_status_log(args.file, keep_after)
+        logging.info("compacted %s from %d to %d bytes" % (args.file, size_before, size_after))
+    else:
+        logging.error ("You must specify one of --listen, --at, --changes or --compact")
+        exit(1)
+    exit(0)
+
+if __name__ == "__main__":
+    main()
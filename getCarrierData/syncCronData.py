@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+  pull the newly collected data from the Mac Mini, load it into Excel, and archive it,
+  copying only the bytes appended since the last sync (this replaces the cp's in loadNewCronData.sh)
+
+  For each of CarrierRealTimeData.json and CarrierDailyData.json in SOURCE (the Mac Mini's copy):
+  - the manifest (DEST/.syncManifest.json) has the byte offset synced so far, and a checksum of each
+    ChunkSize chunk before it. The last chunk is checked (all of them with --verify) to make sure
+    the source still starts with what was synced; then only the bytes after the offset are read.
+  - if the source was rotated (see jsonLinesWriter.py), the rest of the month is read from the
+    new compressed segment, after checking it starts with what was synced.
+  - the new lines are appended to DEST/Carrier*Data.json, which only holds what isn't in Excel yet
+  then loadJSONtoExcel.py loads them (any extra arguments are passed on to it), and they are appended
+  to DEST/OldCarrier*Data.json, the archive, and the pending file is emptied.
+  The last row archived is kept in the manifest, and passed to the next load, so the rows a deadband
+  recording held back before the first new row can be rebuilt (see deadband.py).
+  SOURCE is only ever read, so this can't race with the cron jobs writing it.
+
+  Each step is journaled in the manifest first, so an interrupted sync is finished, or undone,
+  by the next one, and never loses or duplicates a line.
+
+  Usage:
+    python3 syncCronData.py [-d] [--verify] [--no-load] SOURCE DEST [loadJSONtoExcel arguments]
+  e.g. between two local directories:
+    python3 syncCronData.py --no-load /tmp/mini /tmp/laptop
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+from sys import exit
+from typing import Any, Dict, List, Tuple
+
+Types = ["RealTime", "Daily"]
+ChunkSize = 64 * 1024
+ManifestName = ".syncManifest.json"
+
+class SyncError(Exception):
+    pass
+
+def workingName(data_type: str) -> str:
+    return "Carrier%sData.json" % data_type
+
+def archiveName(data_type: str) -> str:
+    return "OldCarrier%sData.json" % data_type
+
+def chunkHashes(data: bytes) -> List[str]:
+    return [hashlib.sha256(data[i:i + ChunkSize]).hexdigest() for i in range(0, len(data), ChunkSize)]
+
+def _fileSize(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+def _readRange(path: str, start: int, end: int | None = None) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read() if end is None else f.read(end - start)
+
+def _append(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _truncate(path: str, size: int):
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.truncate(size)
+        os.fsync(f.fileno())
+
+def _lastLine(data: bytes) -> str | None:
+    lines = data.rstrip(b"\n").rsplit(b"\n", 1)
+    return lines[-1].decode() if lines[-1].strip() else None
+
+def _wholeLines(data: bytes) -> bytes:
+    """ drop a partly written last line, it will be synced next time """
+    return data[:data.rfind(b"\n") + 1]
+
+##### the manifest
+def loadManifest(dest: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(dest, ManifestName), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return { "files": {}, "journal": None, "last_rows": {} }
+
+def saveManifest(dest: str, manifest: Dict[str, Any]):
+    path = os.path.join(dest, ManifestName)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def recover(dest: str, manifest: Dict[str, Any]):
+    """ finish, or undo, the step an earlier sync was interrupted in """
+    journal = manifest.get("journal")
+    if journal is None:
+        return
+    pending = os.path.join(dest, journal["file"])
+    if journal["step"] == "pull":
+        if _fileSize(pending) == journal["pending_size"] + journal["length"]:
+            manifest["files"][journal["file"]] = journal["entry"]
+            logging.info("recovered the interrupted pull of %s" % journal["file"])
+        else:
+            # not all of it was written, so pull it again
+            _truncate(pending, journal["pending_size"])
+            logging.info("undid the interrupted pull of %s" % journal["file"])
+    elif journal["step"] == "archive":
+        archive = os.path.join(dest, journal["archive"])
+        if _fileSize(pending) == journal["length"]:
+            _truncate(archive, journal["archive_size"])
+            _archive(dest, manifest, journal["file"], journal["archive"])
+            logging.info("redid the interrupted archive of %s" % journal["file"])
+    manifest["journal"] = None
+    saveManifest(dest, manifest)
+
+##### pulling the new lines
+def _prefixMatches(path: str, entry: Dict[str, Any], verify_all: bool) -> bool:
+    offset = entry["offset"]
+    if _fileSize(path) < offset:
+        return False
+    chunks = entry["chunks"]
+    for index in (range(len(chunks)) if verify_all else [len(chunks) - 1]):
+        start = index * ChunkSize
+        if hashlib.sha256(_readRange(path, start, min(start + ChunkSize, offset))).hexdigest() != chunks[index]:
+            return False
+    return True
+
+def _segments(source: str, name: str) -> List[str]:
+    stem, ext = os.path.splitext(name)
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(source, "%s.*%s.gz" % (stem, ext))))
+
+def _readRotated(source: str, name: str, entry: Dict[str, Any]) -> Tuple[bytes, List[str]]:
+    """ the rest of the lines, from the segments the source was rotated into since the last sync """
+    import gzip
+    new_segments = [segment for segment in _segments(source, name) if segment not in entry["segments"]]
+    for index, segment in enumerate(new_segments):
+        with gzip.open(os.path.join(source, segment), "rb") as f:
+            data = f.read()
+        if chunkHashes(data[:entry["offset"]]) != entry["chunks"]:
+            continue
+        logging.info("%s was rotated into %s since the last sync" % (name, segment))
+        delta = data[entry["offset"]:]
+        # and any whole months after it
+        for later in new_segments[index + 1:]:
+            with gzip.open(os.path.join(source, later), "rb") as f:
+                delta += f.read()
+        return delta, new_segments
+    raise SyncError("%s no longer starts with what was synced, and no new segment does either; check it by hand" % name)
+
+def pull(source: str, dest: str, manifest: Dict[str, Any], name: str, verify_all: bool) -> int:
+    """ append the lines added to SOURCE/name since the last sync to DEST/name; returns the bytes copied """
+    src = os.path.join(source, name)
+    pending = os.path.join(dest, name)
+    entry = manifest["files"].get(name)
+    if entry is None:
+        if _fileSize(pending) > 0:
+            raise SyncError("first sync, but %s isn't empty: load and archive it first" % pending)
+        # the segments rotated before the first sync were archived by hand
+        entry = { "offset": 0, "chunks": [], "segments": _segments(source, name) }
+    entry = dict(entry)
+
+    delta = b""
+    if entry["offset"] > 0 and not _prefixMatches(src, entry, verify_all):
+        delta, segments = _readRotated(source, name, entry)
+        entry = { "offset": 0, "chunks": [], "segments": entry["segments"] + segments }
+
+    offset = entry["offset"]
+    full_chunks = offset // ChunkSize
+    tail = _readRange(src, full_chunks * ChunkSize, offset) if offset > 0 else b""
+    new = _wholeLines(_readRange(src, offset)) if os.path.exists(src) else b""
+    entry["chunks"] = entry["chunks"][:full_chunks] + chunkHashes(tail + new)
+    entry["offset"] = offset + len(new)
+    delta += new
+    if not delta:
+        manifest["files"][name] = entry
+        saveManifest(dest, manifest)
+        return 0
+
+    pending_size = _fileSize(pending)
+    manifest["journal"] = { "step": "pull", "file": name, "pending_size": pending_size, "length": len(delta), "entry": entry }
+    saveManifest(dest, manifest)
+    _append(pending, delta)
+    if hashlib.sha256(_readRange(pending, pending_size)).digest() != hashlib.sha256(delta).digest():
+        _truncate(pending, pending_size)
+        raise SyncError("%s didn't read back what was written" % pending)
+    manifest["files"][name] = entry
+    manifest["journal"] = None
+    saveManifest(dest, manifest)
+    logging.info("pulled %d bytes of %s" % (len(delta), name))
+    return len(delta)
+
+##### archiving what was loaded
+def _archive(dest: str, manifest: Dict[str, Any], name: str, archive_name: str):
+    pending = os.path.join(dest, name)
+    archive = os.path.join(dest, archive_name)
+    data = _readRange(pending, 0) if os.path.exists(pending) else b""
+    if not data:
+        return
+    manifest["journal"] = { "step": "archive", "file": name, "archive": archive_name,
+                            "archive_size": _fileSize(archive), "length": len(data) }
+    saveManifest(dest, manifest)
+    _append(archive, data)
+    _truncate(pending, 0)
+    manifest.setdefault("last_rows", {})[name] = _lastLine(data)
+    manifest["journal"] = None
+    saveManifest(dest, manifest)
+    logging.info("archived %d bytes of %s into %s" % (len(data), name, archive_name))
+
+def lastLoadedRow(dest: str, manifest: Dict[str, Any], data_type: str) -> str | None:
+    """ the last row archived, from the manifest, or the end of the archive before there was one """
+    last_row = manifest.get("last_rows", {}).get(workingName(data_type))
+    if last_row is None:
+        archive = os.path.join(dest, archiveName(data_type))
+        size = _fileSize(archive)
+        if size > 0:
+            last_row = _lastLine(_readRange(archive, max(0, size - ChunkSize)))
+    return last_row
+
+def load(dest: str, data_type: str, loader_args: List[str], last_row: str | None = None):
+    loader = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadJSONtoExcel.py")
+    previous = ["--previous", last_row] if last_row else []
+    # loadJSONtoExcel reads and writes the current directory
+    subprocess.run([sys.executable, loader, *loader_args, *previous, "--%s" % data_type], cwd=dest, check=True)
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pull the new collected data, load it into Excel, and archive it"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "--verify", action="store_true", help="check every chunk synced so far, not just the last" )
+    parser.add_argument( "--no-load", action="store_true", help="only pull the new data, don't load or archive it" )
+    parser.add_argument( 'source', help="the Mac Mini's CarrierDataCollection directory" )
+    parser.add_argument( 'dest', help="this machine's CarrierDataCollection directory" )
+    args, loader_args = parser.parse_known_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+        loader_args = ["-d"] + loader_args
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ] loader args=%s" % (args, loader_args))
+
+    for directory in [args.source, args.dest]:
+        if not os.path.isdir(directory):
+            logging.error ("%s is missing (is the Mac Mini mounted?)" % directory)
+            exit(1)
+
+    manifest = loadManifest(args.dest)
+    try:
+        recover(args.dest, manifest)
+        for data_type in Types:
+            pull(args.source, args.dest, manifest, workingName(data_type), args.verify)
+        if args.no_load:
+            exit(0)
+        for data_type in Types:
+            if _fileSize(os.path.join(args.dest, workingName(data_type))) > 0:
+                load(args.dest, data_type, loader_args, lastLoadedRow(args.dest, manifest, data_type))
+        # only once both loaded
+        for data_type in Types:
+            _archive(args.dest, manifest, workingName(data_type), archiveName(data_type))
+    except (SyncError, subprocess.CalledProcessError) as error:
+        logging.error (str(error))
+        exit(1)
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+  record what ApiWebsocket.listener receives, and replay it later through
+  WebsocketDataUpdater.message_handler, to compare changes to the update path on real traffic.
+
+  Record (logs in with PRIVATE, or CARRIER_API_BASE_URL, and listens for --seconds):
+    python3 websocketReplay.py [-d] --record --seconds 3600 frames.log.gz
+
+  Replay at the recorded pace (1), N times faster, or as fast as possible (0):
+    python3 websocketReplay.py [-d] [--speed 0] [--tracemalloc] frames.log.gz
+
+  The replay reports messages/sec, the per-message handling latency percentiles,
+  and how much the memory grew.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from sys import exit
+from typing import Any, Dict, List
+
+from carrier_api.api_websocket_data_updater import WebsocketDataUpdater
+from carrier_api.api_websocket_recorder import WebsocketRecorder, read_recording
+from carrier_api.config import Config
+from carrier_api.energy import Energy
+from carrier_api.profile import Profile
+from carrier_api.status import Status
+from carrier_api.system import System
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def buildSystems(raw_systems: List[Dict[str, Any]]) -> List[System]:
+    return [System(profile=Profile(raw=raw["profile"]), status=Status(raw=raw["status"]),
+                   config=Config(raw=raw["config"]), energy=Energy(raw=raw["energy"])) for raw in raw_systems]
+
+async def record(path: str, seconds: float):
+    from PRIVATE import UserName, PassWord
+    from carrier_api.api_connection_graphql import ApiConnectionGraphql
+    api_connection = ApiConnectionGraphql(username=UserName, password=PassWord,
+                                          base_url=os.environ.get("CARRIER_API_BASE_URL"))
+    recorder = None
+    try:
+        systems = await api_connection.load_data()
+        recorder = WebsocketRecorder(path, systems)
+        updater = WebsocketDataUpdater(systems=systems)
+        api_connection.api_websocket.callback_add(recorder)
+        api_connection.api_websocket.callback_add(updater.message_handler)
+        await api_connection.api_websocket.create_task_listener()
+        logging.info("recording to %s for %d seconds" % (path, seconds))
+        await asyncio.sleep(seconds)
+        api_connection.api_websocket.task_listener.cancel()
+    finally:
+        if recorder is not None:
+            recorder.close()
+            logging.info("recorded %d frames" % recorder.frame_count)
+        await api_connection.cleanup()
+
+async def replay(path: str, speed: float, callbacks: List = None):
+    raw_systems, frames = read_recording(path)
+    if raw_systems is None:
+        logging.error("%s has no systems line, so it can't be replayed through WebsocketDataUpdater" % path)
+        exit(1)
+    systems = buildSystems(raw_systems)
+    updater = WebsocketDataUpdater(systems=systems)
+    async_callbacks = [updater.message_handler] + (callbacks or [])
+
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    errors = 0
+    first_timestamp = None
+    start = time.perf_counter()
+    for timestamp, frame in frames:
+        if speed > 0:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        frame_start = time.perf_counter()
+        try:
+            for async_callback in async_callbacks:
+                await async_callback(frame)
+        except Exception as error:
+            logging.debug("frame failed: %s" % error)
+            errors += 1
+        latencies.append(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    count = len(latencies)
+    print("%d messages (%d errors) in %.2fs = %.1f messages/s" % (count, errors, elapsed, count / elapsed if elapsed else 0))
+    print("latency us: p50 %.1f  p90 %.1f  p99 %.1f  max %.1f" % tuple(
+        1e6 * v for v in [ percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99), latencies[-1] if latencies else 0 ]))
+    # ru_maxrss is bytes on macOS, KB on linux
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_start
+    print("max rss grew by %d %s" % (rss_growth, "bytes" if os.uname().sysname == "Darwin" else "KB"))
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        print("traced memory: %d bytes now, %d bytes peak" % (current, peak))
+
+##########
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record websocket frames, or replay them through WebsocketDataUpdater"
+    )
+    parser.add_argument( "-d", "--debug", action="store_true", help="Enable debug output" )
+    parser.add_argument( "-r", "--record", action="store_true", help="record to the file, instead of replaying it" )
+    parser.add_argument( "--seconds", type=float, default=600, help="how long to record (default 600)" )
+    parser.add_argument( "-s", "--speed", type=float, default=1.0, help="replay speed: 1 as recorded, N times faster, 0 as fast as possible" )
+    parser.add_argument( "--tracemalloc", action="store_true", help="trace python memory allocations (slows the replay)" )
+    parser.add_argument( 'file', help="recording file, gzipped if it ends in .gz" )
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.debug("Debug mode enabled.")
+    else:
+        logging.basicConfig(level=logging.INFO)
+    logging.debug ("Args=[ %s ]" % args)
+
+    if args.record:
+        asyncio.run(record(args.file, args.seconds))
+    else:
+        if args.tracemalloc:
+            tracemalloc.start()
+        asyncio.run(replay(args.file, args.speed))
+    exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,7 @@
 # copy recent data from the Mac Mini
 # load it into Excel
 # append the data to the archive, and empty the new data files
-# and copy it back to the Mac Mini
-
-# function to import data from json to excel, and then copy that data to the archive
-# one parapmeter: $1 = Daily or RealTime
+# any arguments are passed on to loadJSONtoExcel.py
 
 # shell debug options
 # e exit on any error
@@ -28,26 +25,9 @@ then
     exit 2
 fi
 
-# first copy the lastest data from Mac Mini
-cp -p $Mini/Carrier*.json $Me
-
-# load it into Excel
+# pull only what was appended since the last sync, load it into Excel,
+# and append it to the archive (see getCarrierData/syncCronData.py)
 cd $Me
-python3 getCarrierData/loadJSONtoExcel.py "$@" --RealTime
-python3 getCarrierData/loadJSONtoExcel.py "$@" --Daily
-
-echo continue? ; read x
-
-# append the data to the archive, and empty the new data files
-for type in Daily RealTime
-do
-    file=Carrier${type}Data.json
-    cat $file >> Old$file
-    > $file
-done
-
-echo continue? ; read x
+python3 getCarrierData/syncCronData.py $Mini $Me "$@"
 
-# and copy it back to the Mac Mini
-cp -p Carrier*.json OldCarrier*.json $Mini
 exit 0